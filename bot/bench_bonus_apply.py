@@ -0,0 +1,183 @@
+"""
+Benchmark : application des bonus d'une période d'examen (BonusSystem.apply_bonuses_for_period)
+Compare l'ancienne version (une requête Utilisateur par votant puis par résultat,
+tous les résultats de la fenêtre horaire) avec la version groupée (deux requêtes,
+un passage en mémoire, un UPDATE groupé)
+
+Utilise une base SQLite temporaire (DATABASE_URL est surchargée). Le faux serveur
+Discord n'a aucun membre (aucun MP) : seul le travail base de données est mesuré.
+Usage: python bench_bonus_apply.py [--participants 5000]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+workdir = tempfile.mkdtemp(prefix='bench-bonus-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+os.environ.setdefault('DB_PROFILE', 'bot')
+
+from db_connection import SessionLocal, engine  # noqa: E402
+from models import Base, Utilisateur, Vote, ExamPeriod, ExamResult  # noqa: E402
+from bonus_system import BonusSystem  # noqa: E402
+
+NIVEAU = 2
+PERIOD_ID = 'bench_period'
+
+
+class FakeRole:
+    def __init__(self, name):
+        self.name = name
+        self.members = []
+
+
+class FakeGuild:
+    """Serveur minimal : rôles de groupe existants, aucun membre (pas de MP)"""
+
+    def __init__(self):
+        self.id = 1
+        self.roles = [FakeRole(f"Groupe {NIVEAU + 1}-{letter}") for letter in 'ABCDEFGHIJ']
+        self.channels = []
+
+    def get_member(self, user_id):
+        return None
+
+
+def seed(participants: int):
+    """Période de niveau 2 : participants, votes, résultats (+ résultats d'un autre niveau)"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    random.seed(42)
+
+    start = datetime(2025, 1, 10, 8, 0)
+    db = SessionLocal()
+    try:
+        db.add(ExamPeriod(
+            id=PERIOD_ID, group_number=NIVEAU, vote_start_time=start - timedelta(days=1),
+            start_time=start, end_time=start + timedelta(hours=6)
+        ))
+        db.add_all(
+            Utilisateur(
+                user_id=user_id, username=f"user{user_id}", niveau_actuel=NIVEAU, groupe=f"{NIVEAU}-A",
+                bonus_points=random.choice([0.0] * 9 + [5.0])  # Quelques bonus encore en attente
+            ) for user_id in range(1, participants + 1)
+        )
+        db.flush()
+
+        votes = []
+        for voter in range(1, participants + 1):
+            for voted_for in random.sample(range(1, participants + 1), 3):
+                if voted_for != voter:
+                    votes.append({'voter_id': voter, 'voted_for_id': voted_for, 'exam_period_id': PERIOD_ID})
+        db.bulk_insert_mappings(Vote, votes)
+
+        results = []
+        for user_id in range(1, participants + 1):
+            percentage = float(random.randint(40, 100))
+            results.append({
+                'user_id': user_id, 'exam_id': NIVEAU, 'exam_title': 'Examen', 'score': int(percentage),
+                'total': 100, 'percentage': percentage, 'passed': percentage >= 70, 'passing_score': 70,
+                'date': start + timedelta(minutes=random.randint(0, 359))
+            })
+        db.bulk_insert_mappings(ExamResult, results)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def legacy_apply(bonus_system, exam_period, guild):
+    """Ancien apply_bonuses_for_period (partie base de données, même logique)"""
+    db = SessionLocal()
+    try:
+        vote_counts = bonus_system.vote_system.get_vote_counts(exam_period.id)
+        sorted_votes = sorted(vote_counts.items(), key=lambda x: x[1], reverse=True)
+        for rank, (user_id, vote_count) in enumerate(sorted_votes, start=1):
+            bonus_points, bonus_level = bonus_system.vote_system.calculate_bonus(vote_count)
+            user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+            if user:
+                user.bonus_points = bonus_points
+                user.bonus_level = bonus_level
+        db.commit()
+
+        exam_results = db.query(ExamResult).filter(
+            ExamResult.date >= exam_period.start_time,
+            ExamResult.date <= exam_period.end_time
+        ).all()
+
+        for result in exam_results:
+            user = db.query(Utilisateur).filter(Utilisateur.user_id == result.user_id).first()
+            if not user or user.bonus_points == 0:
+                continue
+            bonus_percentage = min(result.percentage + user.bonus_points, 100.0)
+            if result.percentage < result.passing_score <= bonus_percentage:
+                new_groupe = await bonus_system._find_available_group(guild, user.niveau_actuel + 1)
+                user.niveau_actuel += 1
+                user.groupe = new_groupe
+                user.examens_reussis += 1
+            user.bonus_points = 0.0
+            user.bonus_level = None
+            user.has_voted = False
+            user.current_exam_period = None
+        db.commit()
+    finally:
+        db.close()
+
+
+def snapshot():
+    db = SessionLocal()
+    try:
+        return sorted(
+            (u.user_id, u.niveau_actuel, u.groupe, u.examens_reussis, u.bonus_points, u.bonus_level, u.has_voted)
+            for u in db.query(Utilisateur)
+        )
+    finally:
+        db.close()
+
+
+def run(label, apply, participants):
+    seed(participants)
+    bonus_system = BonusSystem(bot=None)
+
+    db = SessionLocal()
+    period = db.query(ExamPeriod).filter(ExamPeriod.id == PERIOD_ID).first()
+    db.close()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(apply(bonus_system, period, FakeGuild()))
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<22} {elapsed * 1000:8.1f} ms")
+    return elapsed, snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--participants', type=int, default=5000)
+    args = parser.parse_args()
+
+    try:
+        print(f"📦 {args.participants} participants, ~3 votes chacun")
+        print("\n⏱️ Application des bonus (base de données seulement)")
+        legacy, legacy_state = run("ancienne version", legacy_apply, args.participants)
+        new, new_state = run(
+            "version groupée",
+            lambda bonus_system, period, guild: bonus_system.apply_bonuses_for_period(period, guild),
+            args.participants
+        )
+        print(f"   → ×{legacy / new:.1f}")
+
+        same = legacy_state == new_state
+        print(f"{'✅' if same else '❌'} État des utilisateurs identique à l'ancienne version")
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
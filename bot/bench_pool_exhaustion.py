@@ -0,0 +1,145 @@
+"""
+Benchmark : épuisement du pool de connexions à l'ouverture d'un examen
+
+Au début d'une période d'examen, tous les élèves d'un niveau ouvrent /exams en
+même temps. Chaque requête emprunte une connexion, fait quelques requêtes SQL
+et la garde pendant le rendu de la page. Quand toutes les connexions du pool
+(pool_size + max_overflow) sont prises, les suivantes attendent (jusqu'à
+pool_timeout, puis erreur).
+
+Compare l'ancienne configuration (5 + 10 connexions, pool_pre_ping : un
+aller-retour de plus à chaque checkout) avec un profil de db_connection.py
+(vérification seulement des connexions inactives depuis DB_IDLE_PING_SECONDS).
+
+Utilise une base SQLite temporaire (DATABASE_URL est surchargée). Pour
+reproduire un aller-retour réseau PostgreSQL, chaque requête SQL (et chaque
+ping) attend --latency ms.
+Usage: python bench_pool_exhaustion.py [--students 200] [--latency 5] [--queries 4] [--hold 30]
+                                       [--profile web] [--timeout 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+workdir = tempfile.mkdtemp(prefix='bench-pool-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+from sqlalchemy import create_engine, event, exc, text  # noqa: E402
+from sqlalchemy.pool import QueuePool  # noqa: E402
+from db_connection import POOL_PROFILES, create_db_engine, pool_stats  # noqa: E402
+
+
+def simulate_latency(engine, latency: float):
+    """Chaque requête SQL et chaque ping coûtent un aller-retour"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def round_trip(*_):
+        time.sleep(latency)
+
+    do_ping = engine.dialect.do_ping
+
+    def slow_ping(dbapi_connection):
+        engine.pings += 1
+        time.sleep(latency)
+        return do_ping(dbapi_connection)
+
+    engine.pings = 0
+    engine.dialect.do_ping = slow_ping
+
+
+def student(engine, barrier, queries: int, hold: float):
+    """Une requête /exams : checkout, requêtes SQL, rendu avec la session ouverte"""
+    barrier.wait()
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            waited = time.perf_counter() - start
+            for _ in range(queries):
+                conn.execute(text("SELECT 1"))
+            time.sleep(hold)
+        return waited, time.perf_counter() - start, None
+    except exc.TimeoutError:
+        return time.perf_counter() - start, time.perf_counter() - start, 'timeout'
+
+
+def run(label, engine, args):
+    simulate_latency(engine, args.latency / 1000)
+
+    # Pool déjà chaud (connexions ouvertes par les requêtes précédentes)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    engine.pings = 0
+
+    peak = {'in_use': 0, 'overflow': 0}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            stats = pool_stats(engine)
+            peak['in_use'] = max(peak['in_use'], stats['in_use'])
+            peak['overflow'] = max(peak['overflow'], stats['overflow'])
+            time.sleep(0.002)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+
+    barrier = threading.Barrier(args.students)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.students) as executor:
+        results = list(executor.map(
+            lambda _: student(engine, barrier, args.queries, args.hold / 1000), range(args.students)
+        ))
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    waits = sorted(waited * 1000 for waited, _, error in results if not error)
+    durations = sorted(duration * 1000 for _, duration, error in results if not error)
+    timeouts = sum(1 for _, _, error in results if error)
+    p99 = lambda values: values[max(0, int(len(values) * 0.99) - 1)] if values else 0.0  # noqa: E731
+
+    print(f"\n🔌 {label}")
+    print(f"   Pool : {engine.pool.size()} + débordement, pic {peak['in_use']} connexion(s) empruntée(s) "
+          f"dont {peak['overflow']} en débordement")
+    print(f"   Attente checkout : médiane {statistics.median(waits) if waits else 0:7.1f} ms, "
+          f"p99 {p99(waits):7.1f} ms, max {max(waits, default=0):7.1f} ms")
+    print(f"   Requête complète : médiane {statistics.median(durations) if durations else 0:7.1f} ms, "
+          f"p99 {p99(durations):7.1f} ms")
+    print(f"   {len(waits)}/{args.students} servies, {timeouts} timeout(s), {engine.pings} ping(s), "
+          f"total {elapsed * 1000:.0f} ms")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=5.0, help="ms par aller-retour SQL")
+    parser.add_argument('--queries', type=int, default=4, help="requêtes SQL par page")
+    parser.add_argument('--hold', type=float, default=30.0, help="ms de rendu avec la connexion empruntée")
+    parser.add_argument('--profile', default='web', choices=sorted(POOL_PROFILES))
+    parser.add_argument('--timeout', type=float, default=None, help="pool_timeout (défaut : celui du profil)")
+    args = parser.parse_args()
+
+    url = os.environ['DATABASE_URL']
+    if args.timeout is not None:
+        os.environ['DB_POOL_TIMEOUT'] = str(args.timeout)
+
+    try:
+        print(f"📦 {args.students} élèves ouvrent /exams en même temps "
+              f"({args.queries} requêtes de {args.latency} ms, {args.hold} ms de rendu)")
+
+        legacy = create_engine(url, poolclass=QueuePool, pool_size=5, max_overflow=10, pool_pre_ping=True,
+                               pool_timeout=args.timeout if args.timeout is not None else 30)
+        run("Ancienne configuration (5 + 10, pool_pre_ping)", legacy, args)
+        run(f"Profil {args.profile} (vérification des connexions inactives)",
+            create_db_engine(url, args.profile), args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
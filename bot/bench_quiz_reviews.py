@@ -0,0 +1,105 @@
+"""
+Benchmark : latence de démarrage d'un quiz (get_questions_to_review)
+Compare l'ancien stockage JSON (relu à chaque question) avec ReviewStore
+
+Usage: python bench_quiz_reviews.py [--users 10000] [--questions 200]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import quiz_reviews_manager
+from review_store import ReviewStore
+
+
+def generate_reviews(users: int, questions: int) -> dict:
+    """Génère {user_key: {question_id: révision}} avec des dates de révision variées"""
+    now = datetime.now()
+    reviews = {}
+    for user in range(users):
+        user_reviews = {}
+        for q in range(questions):
+            next_review = now + timedelta(hours=random.randint(-240, 240))
+            user_reviews[f"q{q}"] = {
+                'interval_days': float(random.randint(1, 30)),
+                'repetitions': random.randint(0, 6),
+                'easiness_factor': round(random.uniform(1.3, 2.8), 2),
+                'next_review': next_review.isoformat()
+            }
+        reviews[str(100000000000000000 + user)] = user_reviews
+    return reviews
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--samples', type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-reviews-')
+    try:
+        snapshot_path = os.path.join(workdir, 'quiz_reviews.json')
+
+        print(f"📦 Génération de {args.users} utilisateurs × {args.questions} questions...")
+        reviews = generate_reviews(args.users, args.questions)
+        with open(snapshot_path, 'w', encoding='utf-8') as f:
+            json.dump(reviews, f)
+        size_mb = os.path.getsize(snapshot_path) / 1e6
+        print(f"   Fichier : {size_mb:.1f} Mo")
+
+        all_questions = [{'id': f"q{q}"} for q in range(args.questions)]
+        user_keys = list(reviews.keys())
+        del reviews
+
+        # Ancien système : un json.load complet par question
+        start = time.perf_counter()
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        legacy_load = time.perf_counter() - start
+        print(f"\n🐢 Ancien stockage : {legacy_load * 1000:.0f} ms par lecture du fichier")
+        print(f"   Démarrage d'un quiz ≈ {args.questions} lectures ≈ {legacy_load * args.questions:.1f} s")
+
+        # Nouveau système
+        start = time.perf_counter()
+        store = ReviewStore(snapshot_path)
+        boot = time.perf_counter() - start
+        quiz_reviews_manager._store = store
+        print(f"\n🚀 ReviewStore : chargement initial {boot:.2f} s ({len(store)} révisions)")
+
+        latencies = []
+        for user_key in random.sample(user_keys, min(args.samples, len(user_keys))):
+            start = time.perf_counter()
+            quiz_reviews_manager.get_questions_to_review(int(user_key), all_questions)
+            latencies.append(time.perf_counter() - start)
+
+        print(f"   Démarrage d'un quiz : médiane {statistics.median(latencies) * 1000:.3f} ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.3f} ms")
+
+        latencies = []
+        for user_key in random.sample(user_keys, min(args.samples, len(user_keys))):
+            start = time.perf_counter()
+            quiz_reviews_manager.update_review_sm2(int(user_key), random.choice(all_questions)['id'], 5)
+            latencies.append(time.perf_counter() - start)
+
+        print(f"   Écriture SM-2 (fsync) : médiane {statistics.median(latencies) * 1000:.3f} ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.3f} ms")
+
+        store.close()
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark : temps de démarrage du planificateur de révisions avec 50k rappels
+Compare l'ancien rechargement complet (recherche linéaire des questions, tâches
+en mémoire) avec le store SQLAlchemy persistant + réconciliation
+
+--check : vérifie seulement que les tâches écrites directement dans review_jobs
+(_bulk_add_review_jobs) sont relues par APScheduler comme celles de add_job
+(à relancer avant d'ajouter une version à DIRECT_JOBSTORE_VERSIONS).
+
+Utilise une base SQLite temporaire (DATABASE_URL est surchargée).
+Usage: python bench_review_jobs.py [--users 500] [--questions-per-user 100] [--check]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+workdir = tempfile.mkdtemp(prefix='bench-review-jobs-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+os.environ.setdefault('DB_PROFILE', 'bot')
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler  # noqa: E402
+from apscheduler.triggers.date import DateTrigger  # noqa: E402
+from db_connection import engine  # noqa: E402
+import quiz_reviews_manager  # noqa: E402
+import review_scheduler  # noqa: E402
+from review_store import ReviewStore  # noqa: E402
+
+
+def generate(users: int, per_user: int, courses: int, per_course: int):
+    """Génère quizzes.json et les révisions {user_key: {question_id: révision}}"""
+    quizzes_data = {'courses': [
+        {'title': f"Cours {c}", 'questions': [
+            {'id': f"c{c}_q{q}", 'question': '?', 'options': ['a', 'b'], 'correct': 0}
+            for q in range(per_course)
+        ]} for c in range(courses)
+    ]}
+    question_ids = [q['id'] for course in quizzes_data['courses'] for q in course['questions']]
+
+    now = datetime.now()
+    reviews = {}
+    for user in range(users):
+        reviews[str(100000000000000000 + user)] = {
+            question_id: {
+                'interval_days': 1.0,
+                'repetitions': 1,
+                'easiness_factor': 2.5,
+                'next_review': (now + timedelta(minutes=random.randint(10, 60 * 24 * 30))).isoformat()
+            } for question_id in random.sample(question_ids, per_user)
+        }
+    return quizzes_data, reviews
+
+
+def legacy_boot(quizzes_data):
+    """Ancien load_scheduled_reviews : recherche linéaire + une tâche mémoire par révision"""
+    scheduler = AsyncIOScheduler()
+    scheduler.start(paused=True)
+    count = 0
+    for user_id_str, user_reviews in quiz_reviews_manager.load_reviews().items():
+        for question_id, review_data in user_reviews.items():
+            next_review = datetime.fromisoformat(review_data['next_review'])
+            question_data = None
+            for course in quizzes_data['courses']:
+                for q in course['questions']:
+                    if q['id'] == question_id:
+                        question_data = q
+                        break
+                if question_data:
+                    break
+            if question_data:
+                scheduler.add_job(
+                    review_scheduler.send_review_question,
+                    trigger=DateTrigger(run_date=next_review),
+                    args=[None, int(user_id_str), question_data],
+                    id=f"review_{user_id_str}_{question_id}",
+                    replace_existing=True,
+                    misfire_grace_time=3600
+                )
+                print(f"⏰ Révision planifiée pour {user_id_str} - Question {question_id} à {next_review}")
+                count += 1
+    scheduler.shutdown(wait=False)
+    return count
+
+
+def check_roundtrip() -> bool:
+    """Une tâche écrite par _bulk_add_review_jobs est relue comme une tâche de add_job"""
+    run_date = datetime.now().replace(microsecond=0) + timedelta(days=2)
+    review_scheduler._add_review_job(1, 'c0_q0', run_date)
+    review_scheduler._bulk_add_review_jobs([(2, 'c0_q0', run_date)])
+
+    reference = review_scheduler.review_jobstore.lookup_job(review_scheduler._job_id(1, 'c0_q0'))
+    direct = review_scheduler.review_jobstore.lookup_job(review_scheduler._job_id(2, 'c0_q0'))
+    if direct is None:
+        print("❌ Tâche écrite directement introuvable via lookup_job")
+        return False
+
+    def state(job):
+        state = {k: v for k, v in job.__getstate__().items() if k not in ('id', 'args')}
+        state['trigger'] = (type(job.trigger), job.trigger.__getstate__())  # DateTrigger sans __eq__
+        return state
+
+    expected, actual = state(reference), state(direct)
+    differences = sorted(k for k in expected.keys() | actual.keys() if expected.get(k) != actual.get(k))
+    if differences or direct.args != (2, 'c0_q0'):
+        print(f"❌ Format de review_jobs différent de add_job : {differences or ['args']}")
+        return False
+
+    review_scheduler.scheduler.remove_all_jobs()
+    print(f"✅ Format de review_jobs vérifié (APScheduler {review_scheduler.apscheduler.__version__}, "
+          f"accès direct {'activé' if review_scheduler.DIRECT_JOBSTORE else 'désactivé'})")
+    return True
+
+
+async def timed(label, func, *args):
+    start = time.perf_counter()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = func(*args)
+        if asyncio.iscoroutine(result):
+            await result
+    elapsed = time.perf_counter() - start
+    summary = output.getvalue().strip().splitlines()
+    print(f"   {label} : {elapsed:.2f} s  {summary[-1] if summary else ''}")
+    return elapsed
+
+
+async def run(args) -> bool:
+    review_scheduler.scheduler.start(paused=True)
+    ok = check_roundtrip()
+    if args.check or not ok:
+        review_scheduler.scheduler.shutdown(wait=False)
+        return ok
+
+    quizzes_data, reviews = generate(args.users, args.questions_per_user, args.courses, args.questions_per_course)
+    store = ReviewStore(os.path.join(workdir, 'quiz_reviews.json'), fsync=False)
+    store.replace_all(reviews)
+    quiz_reviews_manager._store = store
+    print(f"📦 {len(store)} révisions, {args.courses * args.questions_per_course} questions")
+
+    print("\n🐢 Ancien démarrage")
+    await timed("Rechargement complet", legacy_boot, quizzes_data)
+
+    print("\n🚀 Store persistant")
+    await timed("Premier démarrage (table vide)", review_scheduler.load_scheduled_reviews, None, quizzes_data)
+    await timed("Redémarrage (rien à corriger)", review_scheduler.load_scheduled_reviews, None, quizzes_data)
+
+    # Dérive : 1 % des révisions modifiées pendant que le bot était éteint
+    drifted = random.sample(list(reviews.items()), max(1, args.users // 100))
+    for user_key, user_reviews in drifted:
+        for question_id, review in user_reviews.items():
+            store.put(user_key, question_id, {**review, 'next_review': (datetime.now() + timedelta(days=3)).isoformat()})
+    await timed("Redémarrage (1 % de dérive)", review_scheduler.load_scheduled_reviews, None, quizzes_data)
+
+    review_scheduler.scheduler.shutdown(wait=False)
+    store.close()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--questions-per-user', type=int, default=100)
+    parser.add_argument('--courses', type=int, default=20)
+    parser.add_argument('--questions-per-course', type=int, default=50)
+    parser.add_argument('--check', action='store_true', help="vérifie seulement le format de review_jobs")
+    args = parser.parse_args()
+
+    try:
+        ok = asyncio.run(run(args))
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
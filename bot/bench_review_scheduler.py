@@ -0,0 +1,100 @@
+"""
+Benchmark : coût d'un passage de ReviewScheduler.check_reviews avec 1M révisions
+Compare l'ancien scan complet (get_all_reviews + is_review_due) avec la file DueQueue
+
+Utilise une base SQLite temporaire (DATABASE_URL est surchargée).
+Usage: python bench_review_scheduler.py [--rows 1000000] [--users 10000]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+workdir = tempfile.mkdtemp(prefix='bench-scheduler-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+os.environ.setdefault('DB_PROFILE', 'bot')
+
+from db_connection import engine, Base  # noqa: E402
+from models import Review  # noqa: E402
+from database_sql import ReviewDatabaseSQL  # noqa: E402
+from scheduler import DueQueue, ReviewScheduler  # noqa: E402
+
+
+def populate(rows: int, users: int):
+    """Insère des révisions réparties sur ±30 jours (~0,1 % dues dans la minute)"""
+    now = datetime.now()
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                'user_id': random.randrange(users),
+                'question_id': i,
+                'next_review': now + timedelta(minutes=random.randint(-30, 60 * 24 * 30)),
+                'interval_days': 1.0,
+                'repetitions': 1,
+                'easiness_factor': 2.5
+            })
+            if len(batch) == 50000:
+                conn.execute(Review.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Review.__table__.insert(), batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    args = parser.parse_args()
+
+    try:
+        Base.metadata.create_all(engine)
+        print(f"📦 Insertion de {args.rows} révisions...")
+        start = time.perf_counter()
+        populate(args.rows, args.users)
+        print(f"   {time.perf_counter() - start:.1f} s")
+
+        db = ReviewDatabaseSQL()
+
+        # Ancien passage : toute la table à chaque minute
+        start = time.perf_counter()
+        due_legacy = [r for r in db.get_all_reviews() if db.is_review_due(r)]
+        legacy_tick = time.perf_counter() - start
+        print(f"\n🐢 Scan complet : {legacy_tick * 1000:.0f} ms par passage ({len(due_legacy)} dues)")
+
+        # Nouveau : amorçage unique puis pop des seules révisions dues
+        queue = DueQueue()
+        now = datetime.now()
+        start = time.perf_counter()
+        queue.extend(db.get_due_reviews(until=now + ReviewScheduler.HORIZON), now + ReviewScheduler.HORIZON)
+        seed = time.perf_counter() - start
+        print(f"\n🚀 DueQueue : amorçage {seed * 1000:.0f} ms ({len(queue)} révisions dans la fenêtre)")
+
+        start = time.perf_counter()
+        due = queue.pop_due(now)
+        first_tick = time.perf_counter() - start
+        print(f"   Premier passage : {first_tick * 1000:.2f} ms ({len(due)} dues)")
+
+        # Passages suivants : une minute plus tard, avec des mises à jour incrémentales
+        for review in due[:1000]:
+            queue.push({**review, 'next_review': now + timedelta(days=2)})
+        start = time.perf_counter()
+        due = queue.pop_due(now + timedelta(minutes=1))
+        tick = time.perf_counter() - start
+        print(f"   Passage suivant : {tick * 1000:.2f} ms ({len(due)} dues)")
+
+        start = time.perf_counter()
+        new_horizon = now + 2 * ReviewScheduler.HORIZON
+        queue.extend(db.get_due_reviews(until=new_horizon, after=queue.horizon), new_horizon)
+        extend = time.perf_counter() - start
+        print(f"   Extension de l'horizon (1×/heure) : {extend * 1000:.0f} ms")
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark : recalcul SM-2 d'une cohorte complète
+Compare la boucle Python (une révision à la fois) avec le moteur vectorisé NumPy
+et vérifie que les deux donnent exactement les mêmes flottants
+
+Usage: python bench_sm2_engine.py [--rows 1000000]
+"""
+import argparse
+import random
+import time
+
+import sm2_engine
+from sm2_engine import SPACED_REP_PARAMS, QUIZ_REVIEW_PARAMS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    if sm2_engine.np is None:
+        print("❌ NumPy n'est pas installé : seul le mode Python pur est disponible")
+        return
+
+    print(f"📦 Génération de {args.rows} révisions...")
+    ef = [round(random.uniform(1.3, 2.8), 2) for _ in range(args.rows)]
+    repetitions = [random.randint(0, 8) for _ in range(args.rows)]
+    interval = [random.uniform(0.007, 200) for _ in range(args.rows)]
+    quality = [random.randint(0, 5) for _ in range(args.rows)]
+
+    for name, params in (('SpacedRepetition', SPACED_REP_PARAMS), ('quiz_reviews', QUIZ_REVIEW_PARAMS)):
+        print(f"\n⚙️ Paramètres {name}")
+
+        start = time.perf_counter()
+        rows = [sm2_engine.update(*row, params) for row in zip(ef, repetitions, interval, quality)]
+        loop = time.perf_counter() - start
+        print(f"   🐢 Boucle Python : {loop * 1000:.0f} ms")
+
+        columns = [sm2_engine.np.asarray(c) for c in (ef, repetitions, interval, quality)]
+        start = time.perf_counter()
+        new_ef, new_repetitions, new_interval = sm2_engine.update_batch(*columns, params)
+        batch = time.perf_counter() - start
+        print(f"   🚀 NumPy : {batch * 1000:.1f} ms (×{loop / batch:.0f})")
+
+        identical = (
+            new_ef.tolist() == [row[0] for row in rows]
+            and new_repetitions.tolist() == [row[1] for row in rows]
+            and new_interval.tolist() == [row[2] for row in rows]
+        )
+        print(f"   {'✅' if identical else '❌'} Résultats identiques au bit près : {identical}")
+
+
+if __name__ == "__main__":
+    main()
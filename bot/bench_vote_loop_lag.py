@@ -0,0 +1,157 @@
+"""
+Benchmark : latence de la boucle asyncio pendant 200 /vote simultanés
+Compare l'accès base de données bloquant (session synchrone appelée dans la
+coroutine, ancienne version) avec run_db (pool de threads borné, db_executor.py)
+
+Une tâche « battement » se réveille toutes les 5 ms : son retard mesure combien
+de temps la boucle a été gelée (heartbeat gateway, autres interactions).
+
+Utilise une base SQLite temporaire (DATABASE_URL est surchargée). Pour
+reproduire un aller-retour réseau PostgreSQL, chaque requête SQL attend
+--latency ms (défaut 2 ms) côté client.
+Usage: python bench_vote_loop_lag.py [--voters 200] [--latency 2]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+workdir = tempfile.mkdtemp(prefix='bench-vote-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+os.environ.setdefault('DB_PROFILE', 'bot')
+
+from sqlalchemy import event  # noqa: E402
+from db_connection import SessionLocal, engine  # noqa: E402
+from models import Base, Utilisateur, ExamPeriod  # noqa: E402
+from vote_system import VoteSystem  # noqa: E402
+
+NIVEAU = 1
+TICK = 0.005
+
+
+class FakeMember:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+
+class FakeResponse:
+    async def defer(self, ephemeral=False):
+        pass
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, embed=None, ephemeral=False):
+        self.messages.append(content or embed.title)
+
+
+class FakeInteraction:
+    def __init__(self, user_id):
+        self.user = FakeMember(user_id)
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+def seed(voters: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    now = datetime.now()
+    db = SessionLocal()
+    try:
+        db.add(ExamPeriod(
+            id='bench_period', group_number=NIVEAU, vote_start_time=now - timedelta(hours=1),
+            start_time=now + timedelta(hours=1), end_time=now + timedelta(hours=7)
+        ))
+        db.add_all(
+            Utilisateur(user_id=user_id, username=f"user{user_id}", niveau_actuel=NIVEAU, groupe=f"{NIVEAU}-A")
+            for user_id in range(1, voters + 4)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def legacy_vote(vote_system, interaction, members):
+    """Ancienne version : requêtes synchrones directement dans la coroutine"""
+    await interaction.response.defer(ephemeral=True)
+    errors, voted_ids = vote_system._record_votes(interaction.user.id, [(m.id, m.mention) for m in members])
+    await interaction.followup.send("\n".join(errors) if errors else "✅ Votes enregistrés", ephemeral=True)
+
+
+async def offloaded_vote(vote_system, interaction, members):
+    await vote_system.vote_command(interaction, *members)
+
+
+async def measure(vote, voters: int):
+    """Lance tous les /vote en même temps et mesure le retard du battement"""
+    vote_system = VoteSystem(bot=None)
+    lags = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            expected = loop.time() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(0.0, loop.time() - expected))
+
+    ticker = asyncio.create_task(heartbeat())
+    await asyncio.sleep(TICK * 2)
+
+    interactions = [FakeInteraction(user_id) for user_id in range(1, voters + 1)]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        vote(vote_system, interaction, [FakeMember(interaction.user.id + k) for k in (1, 2, 3)])
+        for interaction in interactions
+    ))
+    elapsed = time.perf_counter() - start
+
+    done.set()
+    await ticker
+    ok = sum(1 for interaction in interactions if interaction.followup.messages == ["✅ Votes enregistrés"])
+    return elapsed, lags, ok
+
+
+def run(label, vote, voters):
+    seed(voters)
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, lags, ok = asyncio.run(measure(vote, voters))
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99) - 1] if lags_ms else 0.0
+    print(f"   {label:<18} total {elapsed * 1000:8.1f} ms | retard boucle max {max(lags_ms, default=0):7.1f} ms, "
+          f"p99 {p99:6.1f} ms, médiane {statistics.median(lags_ms) if lags_ms else 0:5.1f} ms "
+          f"({len(lags_ms)} battements) | {ok}/{voters} votes")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--voters', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=2.0, help="ms ajoutées à chaque requête SQL")
+    args = parser.parse_args()
+
+    if args.latency > 0:
+        @event.listens_for(engine, 'before_cursor_execute')
+        def simulate_round_trip(*_):
+            time.sleep(args.latency / 1000)
+
+    try:
+        print(f"📦 {args.voters} /vote simultanés, {args.latency} ms par requête SQL")
+        print(f"\n⏱️ Retard du battement ({TICK * 1000:.0f} ms)")
+        run("bloquant", legacy_vote, args.voters)
+        run("run_db", offloaded_vote, args.voters)
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ S'exécute automatiquement à la fin de chaque période d'examen (6h)
 Utilise APScheduler pour planifier l'application des bonus exactement à end_time
 """
 
+import asyncio
 import discord
 from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -11,7 +12,12 @@ from apscheduler.triggers.date import DateTrigger
 from db_connection import SessionLocal
 from models import Utilisateur, Vote, ExamPeriod, ExamResult
 from vote_system import VoteSystem
-from sqlalchemy import func
+from notification_dispatcher import get_dispatcher
+from guild_index import get_guild_index
+from db_executor import run_db
+from loop_monitor import instrument_scheduler
+from web_sync import invalidate_web_cache
+from sqlalchemy import func, or_, select, update
 
 # Scheduler global pour les applications de bonus
 bonus_scheduler = AsyncIOScheduler()
@@ -23,6 +29,8 @@ class BonusSystem:
     def __init__(self, bot):
         self.bot = bot
         self.vote_system = VoteSystem(bot)
+        self.dispatcher = get_dispatcher(bot)
+        self._group_lock = asyncio.Lock()  # Promotions en parallèle : un seul groupe créé à la fois
     
     async def apply_bonuses_for_period(self, exam_period: ExamPeriod, guild: discord.Guild):
         """
@@ -34,23 +42,20 @@ class BonusSystem:
         4. Vérifie les promotions (échec → réussite)
         5. Envoie les notifications
         """
-        db = SessionLocal()
-        
         try:
             print(f"\n{'='*60}")
             print(f"🎁 APPLICATION DES BONUS - {exam_period.id}")
             print(f"{'='*60}\n")
             
-            # 1. Récupérer tous les votes
-            vote_counts = self.vote_system.get_vote_counts(exam_period.id)
-            
-            print(f"📊 Votes comptabilisés : {len(vote_counts)} utilisateur(s)")
-            
+            # 1. Récupérer tous les votes, triés par nombre de votes (décroissant) pour les rangs,
+            #    et les résultats d'examen de la période (thread base de données)
+            sorted_votes, exam_results = await run_db(self._load_period, exam_period)
+
+            print(f"📊 Votes comptabilisés : {len(sorted_votes)} utilisateur(s)")
+
             # 2. Attribuer les bonus et calculer les rangs
             bonus_assignments = {}
-
-            # Trier par nombre de votes (décroissant) pour calculer les rangs
-            sorted_votes = sorted(vote_counts.items(), key=lambda x: x[1], reverse=True)
+            updates = {}  # {user_id: colonnes à mettre à jour} → un seul UPDATE groupé
 
             for rank, (user_id, vote_count) in enumerate(sorted_votes, start=1):
                 bonus_points, bonus_level = self.vote_system.calculate_bonus(vote_count)
@@ -61,144 +66,209 @@ class BonusSystem:
                     'rank': rank,
                     'total_voters': len(sorted_votes)
                 }
+                updates[user_id] = {'user_id': user_id, 'bonus_points': bonus_points, 'bonus_level': bonus_level}
 
-                # Mettre à jour l'utilisateur
-                user = db.query(Utilisateur).filter(
-                    Utilisateur.user_id == user_id
-                ).first()
-
-                if user:
-                    user.bonus_points = bonus_points
-                    user.bonus_level = bonus_level
-
-                    print(f"  ✅ {user.username}: {vote_count} votes (rang #{rank}) → +{bonus_points}% ({bonus_level})")
+            # 3. Résultats d'examen de cette période (avec l'utilisateur, chargés en 1.)
+            print(f"\n📝 Résultats d'examen avec bonus : {len(exam_results)}")
 
-            db.commit()
-            
-            # 3. Récupérer tous les résultats d'examen de cette période
-            start_time = exam_period.start_time
-            end_time = exam_period.end_time
-            
-            exam_results = db.query(ExamResult).filter(
-                ExamResult.date >= start_time,
-                ExamResult.date <= end_time
-            ).all()
-            
-            print(f"\n📝 Résultats d'examen trouvés : {len(exam_results)}")
-            
             promotions = []
             notifications = []
-            
+            bonus_consumed = set()
+
             # 4. Appliquer les bonus aux notes
             for result in exam_results:
-                user = db.query(Utilisateur).filter(
-                    Utilisateur.user_id == result.user_id
-                ).first()
-                
-                if not user or user.bonus_points == 0:
+                user_id = result.user_id
+
+                # Bonus de la période, sinon bonus encore en attente sur le compte
+                assignment = bonus_assignments.get(user_id)
+                if assignment:
+                    user_bonus, user_bonus_level = assignment['bonus'], assignment['level']
+                else:
+                    user_bonus, user_bonus_level = result.bonus_points, result.bonus_level
+
+                # Crédit unique : déjà consommé par un résultat précédent
+                if user_id in bonus_consumed or not user_bonus:
                     continue
-                
+                bonus_consumed.add(user_id)
+
                 # Note originale
                 original_percentage = result.percentage
-                
-                # Appliquer le bonus (additif)
-                bonus_percentage = original_percentage + user.bonus_points
-                
-                # Cap à 100%
-                bonus_percentage = min(bonus_percentage, 100.0)
-                
+
+                # Appliquer le bonus (additif), cap à 100%
+                bonus_percentage = min(original_percentage + user_bonus, 100.0)
+
                 # Vérifier si le bonus fait passer de raté à réussi
                 was_failed = original_percentage < result.passing_score
                 is_now_passed = bonus_percentage >= result.passing_score
-                
-                print(f"\n  👤 {user.username}:")
-                print(f"     Note originale: {original_percentage}%")
-                print(f"     Bonus: +{user.bonus_points}%")
-                print(f"     Note finale: {bonus_percentage}%")
-                
+
+                # Réinitialiser le bonus (crédit unique)
+                user_update = updates.setdefault(user_id, {'user_id': user_id})
+                user_update.update(bonus_points=0.0, bonus_level=None, has_voted=False, current_exam_period=None)
+
                 if was_failed and is_now_passed:
-                    print(f"     🎉 PROMOTION: {original_percentage}% → {bonus_percentage}% (≥{result.passing_score}%)")
-                    
-                    # Promouvoir l'utilisateur
-                    old_niveau = user.niveau_actuel
-                    old_groupe = user.groupe
-                    
-                    # Trouver un groupe disponible au niveau supérieur
-                    new_niveau = old_niveau + 1
-                    new_groupe = await self._find_available_group(guild, new_niveau, db)
-                    
-                    user.niveau_actuel = new_niveau
-                    user.groupe = new_groupe
-                    user.examens_reussis += 1
-                    
+                    # Promouvoir l'utilisateur dans un groupe disponible au niveau supérieur
+                    new_niveau = result.niveau_actuel + 1
+                    new_groupe = await self._find_available_group(guild, new_niveau)
+
+                    user_update.update(
+                        niveau_actuel=new_niveau,
+                        groupe=new_groupe,
+                        examens_reussis=result.examens_reussis + 1
+                    )
+
                     promotions.append({
-                        'user_id': user.user_id,
-                        'old_groupe': old_groupe,
+                        'user_id': user_id,
+                        'old_groupe': result.groupe,
                         'new_groupe': new_groupe,
                         'old_percentage': original_percentage,
                         'new_percentage': bonus_percentage,
-                        'bonus': user.bonus_points,
-                        'bonus_level': user.bonus_level
+                        'bonus': user_bonus,
+                        'bonus_level': user_bonus_level
                     })
-                    
-                    print(f"     ✅ Promotion: {old_groupe} → {new_groupe}")
-                
+
+                    print(f"  🎉 PROMOTION {result.username}: {original_percentage}% → {bonus_percentage}% "
+                          f"(≥{result.passing_score}%), {result.groupe} → {new_groupe}")
+
                 # Sauvegarder la notification avec votes et rang
-                bonus_info = bonus_assignments.get(user.user_id, {})
+                bonus_info = assignment or {}
                 notifications.append({
-                    'user_id': user.user_id,
+                    'user_id': user_id,
                     'original_percentage': original_percentage,
                     'bonus_percentage': bonus_percentage,
-                    'bonus': user.bonus_points,
-                    'bonus_level': user.bonus_level,
+                    'bonus': user_bonus,
+                    'bonus_level': user_bonus_level,
                     'promoted': was_failed and is_now_passed,
                     'votes_received': bonus_info.get('votes', 0),
                     'rank': bonus_info.get('rank', 0),
                     'total_voters': bonus_info.get('total_voters', 0)
                 })
-                
-                # Réinitialiser le bonus (crédit unique)
-                user.bonus_points = 0.0
-                user.bonus_level = None
-                user.has_voted = False
-                user.current_exam_period = None
-            
-            db.commit()
-            
-            # 5. Envoyer les notifications Discord
-            print(f"\n📧 Envoi de {len(notifications)} notification(s)...")
-            
+
+            # MP de bonus ajoutés à l'outbox dans la même transaction : envoyés même après un crash
+            outbox = []
             for notif in notifications:
-                await self._send_bonus_notification(notif, guild)
-            
-            # 6. Gérer les promotions (rôles Discord)
+                if not guild.get_member(notif['user_id']):
+                    print(f"  ⚠️ Membre {notif['user_id']} introuvable")
+                    continue
+                outbox.append((notif['user_id'], 'bonus', self._build_bonus_embed(notif)))
+
+            # Écriture groupée (bonus, réinitialisations, promotions, outbox) et période
+            # marquée comme traitée dans la même transaction, avant les envois Discord
+            notification_ids = await run_db(self._save_period, exam_period.id, list(updates.values()), outbox)
+            exam_period.bonuses_applied = True
+            exam_period.votes_closed = True
+            await invalidate_web_cache(user_ids=list(updates))
+
+            print(f"✅ {len(updates)} utilisateur(s) mis à jour, {len(promotions)} promotion(s)")
+
+            # 5. Gérer les promotions (rôles Discord)
             print(f"\n🎊 Gestion de {len(promotions)} promotion(s)...")
 
-            for promo in promotions:
-                await self._handle_promotion(promo, guild)
+            # En parallèle, bornées par la concurrence et le débit global du dispatcher
+            promotion_ids = await asyncio.gather(*(self._handle_promotion(promo, guild) for promo in promotions))
+            notification_ids.extend(notification_id for notification_id in promotion_ids if notification_id)
+
+            # 6. Envoyer les MP (en parallèle, limités par route Discord)
+            print(f"\n📧 Envoi de {len(notification_ids)} notification(s)...")
+            await self.dispatcher.dispatch(notification_ids)
 
             # 7. [SUPPRIMÉ] Pas de message public dans le salon entraide
             # Les utilisateurs reçoivent uniquement des MPs privés avec leurs votes et rang
 
-            # 8. Marquer la période comme traitée
-            exam_period.bonuses_applied = True
-            exam_period.votes_closed = True
-            db.commit()
-            
             print(f"\n{'='*60}")
             print(f"✅ APPLICATION DES BONUS TERMINÉE")
             print(f"{'='*60}\n")
         
         except Exception as e:
-            db.rollback()
             print(f"❌ Erreur application bonus: {e}")
             import traceback
             traceback.print_exc()
-        
+
+    def _load_period(self, exam_period: ExamPeriod):
+        """Classement des votes et résultats de la période (à appeler via run_db)"""
+        db = SessionLocal()
+        try:
+            return self._get_vote_ranking(db, exam_period.id), self._get_period_results(db, exam_period)
+        finally:
+            db.close()
+
+    def _save_period(self, exam_period_id: str, user_updates: list, outbox: list) -> list:
+        """
+        Enregistre les bonus, promotions et MP d'une période en une transaction (à appeler via run_db)
+
+        Args:
+            user_updates: Colonnes à mettre à jour par utilisateur [{'user_id': ..., ...}]
+            outbox: MP à ajouter [(user_id, kind, embed)]
+
+        Returns:
+            Les id des MP ajoutés à l'outbox
+        """
+        db = SessionLocal()
+        try:
+            if user_updates:
+                db.execute(update(Utilisateur), user_updates)
+            db.execute(
+                update(ExamPeriod).where(ExamPeriod.id == exam_period_id).values(
+                    bonuses_applied=True,
+                    votes_closed=True
+                )
+            )
+            notifications = [
+                self.dispatcher.enqueue(user_id, kind, embed=embed, db=db)
+                for user_id, kind, embed in outbox
+            ]
+            db.flush()
+            notification_ids = [notification.id for notification in notifications]
+            db.commit()
+            return notification_ids
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
     
-    async def _find_available_group(self, guild: discord.Guild, niveau: int, db) -> str:
+    @staticmethod
+    def _get_vote_ranking(db, exam_period_id: str) -> list:
+        """Retourne [(user_id, nombre_votes)] trié par votes décroissants (rang = position)"""
+        vote_count = func.count(Vote.id)
+        return db.execute(
+            select(Vote.voted_for_id, vote_count).where(
+                Vote.exam_period_id == exam_period_id
+            ).group_by(Vote.voted_for_id).order_by(vote_count.desc(), Vote.voted_for_id)
+        ).all()
+
+    @staticmethod
+    def _get_period_results(db, exam_period: ExamPeriod) -> list:
+        """
+        Résultats d'examen de la période qui peuvent recevoir un bonus, avec l'utilisateur
+
+        Seuls les résultats de l'examen du niveau de la période sont pris
+        (exam.json : l'examen du niveau N a l'id N), et seulement pour les
+        utilisateurs qui ont reçu des votes ou qui ont encore un bonus en attente.
+        """
+        voted_for = select(Vote.voted_for_id).where(Vote.exam_period_id == exam_period.id)
+
+        return db.execute(
+            select(
+                ExamResult.user_id,
+                ExamResult.percentage,
+                ExamResult.passing_score,
+                Utilisateur.username,
+                Utilisateur.niveau_actuel,
+                Utilisateur.groupe,
+                Utilisateur.examens_reussis,
+                Utilisateur.bonus_points,
+                Utilisateur.bonus_level
+            ).join(
+                Utilisateur, Utilisateur.user_id == ExamResult.user_id
+            ).where(
+                ExamResult.date >= exam_period.start_time,
+                ExamResult.date <= exam_period.end_time,
+                ExamResult.exam_id == exam_period.group_number,
+                or_(Utilisateur.bonus_points != 0, Utilisateur.user_id.in_(voted_for))
+            ).order_by(ExamResult.date, ExamResult.id)
+        ).all()
+
+    async def _find_available_group(self, guild: discord.Guild, niveau: int) -> str:
         """
         Trouve un groupe disponible (< 15 membres) pour un niveau donné
         Crée un nouveau groupe si tous sont pleins
@@ -207,11 +277,11 @@ class BonusSystem:
         
         for letter in letters:
             groupe_name = f"{niveau}-{letter}"
-            role = discord.utils.get(guild.roles, name=f"Groupe {groupe_name}")
+            role = get_guild_index(guild).role(f"Groupe {groupe_name}")
             
             if role is None:
                 # Groupe n'existe pas, le créer
-                await self._create_new_group(guild, groupe_name, db)
+                await self._create_new_group(guild, groupe_name)
                 return groupe_name
             
             # Compter les membres du groupe
@@ -222,10 +292,10 @@ class BonusSystem:
         
         # Si tous les groupes A-J sont pleins, créer K
         new_groupe = f"{niveau}-K"
-        await self._create_new_group(guild, new_groupe, db)
+        await self._create_new_group(guild, new_groupe)
         return new_groupe
     
-    async def _create_new_group(self, guild: discord.Guild, groupe: str, db):
+    async def _create_new_group(self, guild: discord.Guild, groupe: str):
         """Crée un nouveau groupe (rôle + salons)"""
         from onboarding import OnboardingManager
         
@@ -241,96 +311,88 @@ class BonusSystem:
         
         print(f"  ✅ Groupe {groupe} créé")
     
-    async def _send_bonus_notification(self, notif: dict, guild: discord.Guild):
-        """Envoie une notification de bonus à un utilisateur"""
-        try:
-            member = guild.get_member(notif['user_id'])
-            
-            if not member:
-                print(f"  ⚠️ Membre {notif['user_id']} introuvable")
-                return
-            
-            bonus_emoji = {
-                'or': '🥇',
-                'argent': '🥈',
-                'bronze': '🥉'
-            }.get(notif['bonus_level'], '🎁')
-            
-            bonus_color = {
-                'or': discord.Color.gold(),
-                'argent': discord.Color.greyple(),
-                'bronze': discord.Color.orange()
-            }.get(notif['bonus_level'], discord.Color.blue())
-            
-            # Afficher le rang avec emoji
-            rank_emoji = "🥇" if notif.get('rank', 0) == 1 else "🥈" if notif.get('rank', 0) == 2 else "🥉" if notif.get('rank', 0) == 3 else "🏅"
-
-            embed = discord.Embed(
-                title=f"{bonus_emoji} Bonus d'Entraide Appliqué !",
-                description=f"Tes camarades ont voté pour toi !",
-                color=bonus_color,
-                timestamp=datetime.now()
-            )
-
-            # Nombre de votes reçus
+    def _build_bonus_embed(self, notif: dict) -> discord.Embed:
+        """Construit le MP de bonus d'un utilisateur"""
+        bonus_emoji = {
+            'or': '🥇',
+            'argent': '🥈',
+            'bronze': '🥉'
+        }.get(notif['bonus_level'], '🎁')
+
+        bonus_color = {
+            'or': discord.Color.gold(),
+            'argent': discord.Color.greyple(),
+            'bronze': discord.Color.orange()
+        }.get(notif['bonus_level'], discord.Color.blue())
+
+        # Afficher le rang avec emoji
+        rank_emoji = "🥇" if notif.get('rank', 0) == 1 else "🥈" if notif.get('rank', 0) == 2 else "🥉" if notif.get('rank', 0) == 3 else "🏅"
+
+        embed = discord.Embed(
+            title=f"{bonus_emoji} Bonus d'Entraide Appliqué !",
+            description=f"Tes camarades ont voté pour toi !",
+            color=bonus_color,
+            timestamp=datetime.now()
+        )
+
+        # Nombre de votes reçus
+        embed.add_field(
+            name="🗳️ Votes Reçus",
+            value=f"**{notif.get('votes_received', 0)} vote(s)**",
+            inline=True
+        )
+
+        # Rang
+        embed.add_field(
+            name=f"{rank_emoji} Rang",
+            value=f"**#{notif.get('rank', 0)}** / {notif.get('total_voters', 0)}",
+            inline=True
+        )
+
+        if notif['bonus_level']:
             embed.add_field(
-                name="🗳️ Votes Reçus",
-                value=f"**{notif.get('votes_received', 0)} vote(s)**",
+                name="🏆 Niveau de Récompense",
+                value=f"**{notif['bonus_level'].upper()}** ({bonus_emoji})",
                 inline=True
             )
 
-            # Rang
-            embed.add_field(
-                name=f"{rank_emoji} Rang",
-                value=f"**#{notif.get('rank', 0)}** / {notif.get('total_voters', 0)}",
-                inline=True
-            )
+        embed.add_field(
+            name="📊 Bonus Obtenu",
+            value=f"**+{notif['bonus']}%**",
+            inline=False
+        )
 
-            if notif['bonus_level']:
-                embed.add_field(
-                    name="🏆 Niveau de Récompense",
-                    value=f"**{notif['bonus_level'].upper()}** ({bonus_emoji})",
-                    inline=True
-                )
+        embed.add_field(
+            name="🎯 Application",
+            value=f"**{notif['original_percentage']}%** → **{notif['bonus_percentage']}%**",
+            inline=True
+        )
 
+        if notif['promoted']:
             embed.add_field(
-                name="📊 Bonus Obtenu",
-                value=f"**+{notif['bonus']}%**",
-                inline=False
-            )
-            
-            embed.add_field(
-                name="🎯 Application",
-                value=f"**{notif['original_percentage']}%** → **{notif['bonus_percentage']}%**",
-                inline=True
-            )
-            
-            if notif['promoted']:
-                embed.add_field(
-                    name="🎉 PROMOTION !",
-                    value="Grâce au bonus, tu as réussi l'examen !\n"
-                          "Tu passes au niveau suivant ! 🚀",
-                    inline=False
-                )
-                embed.color = discord.Color.green()
-            
-            embed.add_field(
-                name="💡 Info",
-                value="Ce bonus était valable uniquement pour cet examen.\n"
-                      "Continue à aider tes camarades pour gagner plus de bonus !",
+                name="🎉 PROMOTION !",
+                value="Grâce au bonus, tu as réussi l'examen !\n"
+                      "Tu passes au niveau suivant ! 🚀",
                 inline=False
             )
-            
-            await member.send(embed=embed)
-            print(f"  ✅ Notification envoyée à {member.name}")
-        
-        except discord.Forbidden:
-            print(f"  ⚠️ MP bloqués pour {notif['user_id']}")
-        except Exception as e:
-            print(f"  ❌ Erreur notification {notif['user_id']}: {e}")
-    
+            embed.color = discord.Color.green()
+
+        embed.add_field(
+            name="💡 Info",
+            value="Ce bonus était valable uniquement pour cet examen.\n"
+                  "Continue à aider tes camarades pour gagner plus de bonus !",
+            inline=False
+        )
+
+        return embed
+
     async def _handle_promotion(self, promo: dict, guild: discord.Guild):
-        """Gère la promotion d'un utilisateur (changement de rôles Discord)"""
+        """
+        Gère la promotion d'un utilisateur (changement de rôles Discord)
+
+        Returns:
+            ID du MP de promotion ajouté à l'outbox (None si membre introuvable ou erreur)
+        """
         try:
             member = guild.get_member(promo['user_id'])
             
@@ -338,27 +400,28 @@ class BonusSystem:
                 print(f"  ⚠️ Membre {promo['user_id']} introuvable")
                 return
             
-            # Retirer l'ancien rôle
-            old_role = discord.utils.get(guild.roles, name=f"Groupe {promo['old_groupe']}")
-            if old_role and old_role in member.roles:
-                await member.remove_roles(old_role)
-                print(f"  ❌ Rôle {old_role.name} retiré de {member.name}")
-            
-            # Ajouter le nouveau rôle
-            new_role = discord.utils.get(guild.roles, name=f"Groupe {promo['new_groupe']}")
-            if not new_role:
-                # Créer le groupe si nécessaire
-                db = SessionLocal()
-                try:
-                    niveau = int(promo['new_groupe'].split('-')[0])
-                    promo['new_groupe'] = await self._find_available_group(guild, niveau, db)
-                    new_role = discord.utils.get(guild.roles, name=f"Groupe {promo['new_groupe']}")
-                finally:
-                    db.close()
-            
-            if new_role:
-                await member.add_roles(new_role)
-                print(f"  ✅ Rôle {new_role.name} ajouté à {member.name}")
+            async with self.dispatcher.slot():
+                # Retirer l'ancien rôle
+                index = get_guild_index(guild)
+                old_role = index.role(f"Groupe {promo['old_groupe']}")
+                if old_role and old_role in member.roles:
+                    await self.dispatcher.acquire_global()
+                    await member.remove_roles(old_role)
+                    print(f"  ❌ Rôle {old_role.name} retiré de {member.name}")
+                
+                # Ajouter le nouveau rôle
+                new_role = index.role(f"Groupe {promo['new_groupe']}")
+                if not new_role:
+                    # Créer le groupe si nécessaire
+                    async with self._group_lock:
+                        niveau = int(promo['new_groupe'].split('-')[0])
+                        promo['new_groupe'] = await self._find_available_group(guild, niveau)
+                    new_role = index.role(f"Groupe {promo['new_groupe']}")
+                
+                if new_role:
+                    await self.dispatcher.acquire_global()
+                    await member.add_roles(new_role)
+                    print(f"  ✅ Rôle {new_role.name} ajouté à {member.name}")
             
             # Envoyer message de promotion
             bonus_emoji = {
@@ -401,13 +464,12 @@ class BonusSystem:
                 inline=False
             )
             
-            await member.send(embed=embed)
-            print(f"  🎉 Message de promotion envoyé à {member.name}")
-        
-        except discord.Forbidden:
-            print(f"  ⚠️ MP bloqués pour {promo['user_id']}")
+            notification = await run_db(self.dispatcher.enqueue, member.id, 'promotion', embed=embed)
+            return notification.id
+
         except Exception as e:
             print(f"  ❌ Erreur promotion {promo['user_id']}: {e}")
+            return None
 
     async def _send_group_summary(self, exam_period: ExamPeriod, notifications: list, guild: discord.Guild, db):
         """Envoie un récapitulatif des résultats dans le salon discussion du groupe"""
@@ -418,10 +480,11 @@ class BonusSystem:
             # Nom du salon : groupe-X-Y-entraide (ex: groupe-1-a-entraide)
             # On doit trouver tous les groupes de ce niveau
             possible_groups = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j']
+            index = get_guild_index(guild)
 
             for letter in possible_groups:
                 channel_name = f"groupe-{group_number}-{letter}-entraide"
-                channel = discord.utils.get(guild.text_channels, name=channel_name)
+                channel = index.text_channel(channel_name)
 
                 if channel:
                     # Filtrer les notifications pour ce groupe seulement
@@ -485,10 +548,9 @@ async def apply_bonuses_job(bot, exam_period_id: str):
     Job APScheduler : Applique les bonus pour une période d'examen terminée
     S'exécute automatiquement à end_time
     """
-    db = SessionLocal()
     try:
         # Récupérer la période
-        period = db.query(ExamPeriod).filter(ExamPeriod.id == exam_period_id).first()
+        period = await run_db(_get_exam_period, exam_period_id)
 
         if not period:
             print(f"❌ Période {exam_period_id} introuvable")
@@ -515,6 +577,13 @@ async def apply_bonuses_job(bot, exam_period_id: str):
         print(f"❌ Erreur apply_bonuses_job pour {exam_period_id}: {e}")
         import traceback
         traceback.print_exc()
+
+
+def _get_exam_period(exam_period_id: str):
+    """Période d'examen détachée de la session (à appeler via run_db)"""
+    db = SessionLocal()
+    try:
+        return db.query(ExamPeriod).filter(ExamPeriod.id == exam_period_id).first()
     finally:
         db.close()
 
@@ -553,23 +622,21 @@ def schedule_bonus_application(bot, exam_period: ExamPeriod):
 def start_bonus_scheduler():
     """Démarre le scheduler de bonus"""
     if not bonus_scheduler.running:
+        instrument_scheduler(bonus_scheduler, 'bonus')
         bonus_scheduler.start()
         print("✅ Planificateur de bonus démarré")
 
 
-def load_pending_exam_periods(bot):
+async def load_pending_exam_periods(bot):
     """
     Charge toutes les périodes d'examen non-terminées au démarrage
     et planifie automatiquement l'application des bonus
     """
-    db = SessionLocal()
     try:
         now = datetime.now()
 
         # Trouver les périodes non-terminées ou terminées mais non-traitées
-        pending_periods = db.query(ExamPeriod).filter(
-            ExamPeriod.bonuses_applied == False
-        ).all()
+        pending_periods = await run_db(_get_pending_exam_periods)
 
         count = 0
         for period in pending_periods:
@@ -586,6 +653,15 @@ def load_pending_exam_periods(bot):
         print(f"❌ Erreur load_pending_exam_periods: {e}")
         import traceback
         traceback.print_exc()
+
+
+def _get_pending_exam_periods():
+    """Périodes dont les bonus ne sont pas appliqués, détachées de la session (à appeler via run_db)"""
+    db = SessionLocal()
+    try:
+        return db.query(ExamPeriod).filter(
+            ExamPeriod.bonuses_applied == False
+        ).all()
     finally:
         db.close()
 
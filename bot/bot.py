@@ -7,6 +7,7 @@ Bot Discord - Version Ultime
 
 import discord
 import os
+os.environ.setdefault('DB_PROFILE', 'bot')  # Pool de connexions du bot (voir db_connection.py)
 from dotenv import load_dotenv
 from discord.ext import commands, tasks
 from discord import app_commands
@@ -17,62 +18,22 @@ from vote_system import VoteSystem
 from bonus_system import BonusSystem, start_bonus_scheduler, load_pending_exam_periods, schedule_bonus_application
 # Keep-alive
 from stay_alive import keep_alive, set_bot
+from web_sync import invalidate_discord_roles, invalidate_web_cache
+from db_executor import run_db
+from loop_monitor import InstrumentedCommandTree, get_loop_monitor
+from guild_index import get_guild_index, rebuild_guild_index
+from course_posts import (build_course_embed, content_hash, load_posts, record_posts, adopt_existing_posts,
+                          RESOURCES_CONCURRENCY)
 keep_alive()
 load_dotenv()
 
 # ===== INITIALISATION BASE DE DONNÉES =====
-print("🔧 Initialisation de la base de données...")
+# Une seule requête si le schéma est à jour (migrations versionnées, voir migrations.py)
 try:
-    from db_connection import engine, Base, SessionLocal
-    from models import Cohorte, Utilisateur, ExamResult
-    from sqlalchemy import text
-    
-    Base.metadata.create_all(engine)
-    print("✅ Tables créées")
-    
-       # Ajouter colonne 'groupe' si nécessaire
-    db = SessionLocal()
-    try:
-        check = text("SELECT column_name FROM information_schema.columns WHERE table_name='utilisateurs' AND column_name='groupe'")
-        if not db.execute(check).fetchone():
-            db.execute(text("ALTER TABLE utilisateurs ADD COLUMN groupe VARCHAR(10) DEFAULT '1-A'"))
-            db.commit()
-            print("✅ Colonne 'groupe' ajoutée")
-    except:
-        pass
-    finally:
-        db.close()
-
-    # Ajouter colonne 'vote_start_time' dans exam_periods si nécessaire
-    db = SessionLocal()
-    try:
-        check = text("SELECT column_name FROM information_schema.columns WHERE table_name='exam_periods' AND column_name='vote_start_time'")
-        if not db.execute(check).fetchone():
-            print("📝 Ajout colonne vote_start_time...")
-            # Ajouter la colonne (nullable temporairement)
-            db.execute(text("ALTER TABLE exam_periods ADD COLUMN vote_start_time TIMESTAMP NULL"))
-            db.commit()
-
-            # Calculer vote_start_time pour les périodes existantes (start_time - 24h)
-            db.execute(text("""
-                UPDATE exam_periods
-                SET vote_start_time = start_time - INTERVAL '1 day'
-                WHERE vote_start_time IS NULL
-            """))
-            db.commit()
-
-            # Rendre la colonne NOT NULL
-            db.execute(text("ALTER TABLE exam_periods ALTER COLUMN vote_start_time SET NOT NULL"))
-            db.commit()
-            print("✅ Colonne 'vote_start_time' ajoutée")
-    except Exception as e:
-        print(f"⚠️ Migration vote_start_time: {e}")
-        db.rollback()
-    finally:
-        db.close()
-
-    print("✅ Base de données prête")
-
+    from db_connection import SessionLocal
+    from models import Utilisateur, ExamResult
+    from migrations import check_schema
+    print(f"✅ Base de données prête (schéma v{check_schema()})")
 except Exception as e:
     print(f"⚠️ Erreur DB: {e}")
 
@@ -87,7 +48,7 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 intents.guilds = True
-bot = commands.Bot(command_prefix='/', intents=intents)
+bot = commands.Bot(command_prefix='/', intents=intents, tree_cls=InstrumentedCommandTree)
 
 # Variable globale pour stocker le serveur principal
 main_guild = None
@@ -101,6 +62,9 @@ async def on_ready():
     print(f'✅ {bot.user} connecté')
     print(f'🔗 Connecté à {len(bot.guilds)} serveur(s)')
 
+    # Mesurer le retard de la boucle et détecter les appels bloquants (/metrics)
+    get_loop_monitor().start()
+
     # Définir le serveur principal
     if bot.guilds:
         main_guild = bot.guilds[0]
@@ -125,15 +89,23 @@ async def on_ready():
     print("📅 Démarrage du planificateur de révisions...")
     from review_scheduler import start_scheduler, load_scheduled_reviews
     start_scheduler()
-    load_scheduled_reviews(bot, QUIZZES_DATA)
+    await load_scheduled_reviews(bot, QUIZZES_DATA)
     print("✅ Planificateur de révisions prêt")
 
     # Démarrer le planificateur de bonus (application automatique à la fin des périodes)
     print("🎁 Démarrage du planificateur de bonus...")
     start_bonus_scheduler()
-    load_pending_exam_periods(bot)
+    await load_pending_exam_periods(bot)
     print("✅ Planificateur de bonus prêt")
 
+    # Renvoyer les MP restés dans l'outbox (crash, erreurs Discord)
+    from notification_dispatcher import get_dispatcher
+    get_dispatcher(bot).start()
+
+    # Appliquer en continu les changements de groupe faits par le site (examens)
+    from group_events import start_group_change_consumer
+    start_group_change_consumer(bot, ensure_channels=create_group_channels)
+
 
 # ANCIENNE MÉTHODE : Vérification périodique toutes les 30 secondes (DÉSACTIVÉE)
 # La promotion se fait maintenant immédiatement via l'API /api/promote
@@ -159,7 +131,7 @@ async def on_member_join(member: discord.Member):
         print(f"📌 Groupe attribué : {groupe}")
         
         # 2. Créer ou récupérer le rôle
-        role = discord.utils.get(guild.roles, name=f"Groupe {groupe}")
+        role = get_guild_index(guild).role(f"Groupe {groupe}")
         if not role:
             role = await guild.create_role(
                 name=f"Groupe {groupe}",
@@ -167,6 +139,7 @@ async def on_member_join(member: discord.Member):
                 mentionable=True,
                 hoist=True  # Afficher séparément à gauche sur Discord
             )
+            get_guild_index(guild).role_created(role)
             print(f"✅ Rôle créé : {role.name}")
         
         # 3. Attribuer le rôle
@@ -184,7 +157,7 @@ async def on_member_join(member: discord.Member):
         db = SessionLocal()
         try:
             # Vérifier si existe déjà
-            existing = db.query(Utilisateur).filter(Utilisateur.user_id == member.id).first()
+            existing = await run_db(db.query(Utilisateur).filter(Utilisateur.user_id == member.id).first)
             
             if not existing:
                 # Créer ou récupérer la cohorte
@@ -193,7 +166,7 @@ async def on_member_join(member: discord.Member):
                 year = str(now.year)[-2:]
                 cohorte_id = f"{month}{year}-A"
                 
-                cohorte = db.query(Cohorte).filter(Cohorte.id == cohorte_id).first()
+                cohorte = await run_db(db.query(Cohorte).filter(Cohorte.id == cohorte_id).first)
                 if not cohorte:
                     cohorte = Cohorte(
                         id=cohorte_id,
@@ -203,7 +176,7 @@ async def on_member_join(member: discord.Member):
                         statut='active'
                     )
                     db.add(cohorte)
-                    db.flush()
+                    await run_db(db.flush)
                 
                 # Créer l'utilisateur
                 new_user = Utilisateur(
@@ -217,7 +190,7 @@ async def on_member_join(member: discord.Member):
                 )
                 
                 db.add(new_user)
-                db.commit()
+                await run_db(db.commit)
                 print(f"✅ Utilisateur enregistré en DB")
         
         finally:
@@ -277,16 +250,69 @@ async def on_member_join(member: discord.Member):
         traceback.print_exc()
 
 
+# ==================== SYNCHRONISATION DES RÔLES AVEC LE SITE ====================
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    """Prévient le site quand les rôles d'un membre changent (cache des rôles admin)"""
+    if before.roles != after.roles:
+        await invalidate_discord_roles(user_id=after.id)
+
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    """Un rôle renommé peut donner ou retirer l'accès admin sur le site"""
+    get_guild_index(after.guild).role_updated(before, after)
+    if before.name != after.name:
+        await invalidate_discord_roles(guild_roles=True)
+
+
+@bot.event
+async def on_guild_role_create(role: discord.Role):
+    get_guild_index(role.guild).role_created(role)
+    await invalidate_discord_roles(guild_roles=True)
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    get_guild_index(role.guild).role_deleted(role)
+    await invalidate_discord_roles(guild_roles=True)
+
+
+# ==================== INDEX DES RÔLES ET SALONS ====================
+
+@bot.event
+async def on_guild_channel_create(channel: discord.abc.GuildChannel):
+    get_guild_index(channel.guild).channel_created(channel)
+
+
+@bot.event
+async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    get_guild_index(after.guild).channel_updated(before, after)
+
+
+@bot.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    get_guild_index(channel.guild).channel_deleted(channel)
+
+
+@bot.event
+async def on_guild_available(guild: discord.Guild):
+    """Reconnexion : le cache discord.py a été rechargé, l'index aussi"""
+    rebuild_guild_index(guild)
+
+
 async def get_available_group(guild: discord.Guild, niveau: int) -> str:
     """
     Trouve le premier groupe non plein pour un niveau donné
     Limite : 15 membres par groupe
     """
     letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']
+    index = get_guild_index(guild)
     
     for letter in letters:
         groupe_name = f"{niveau}-{letter}"
-        role = discord.utils.get(guild.roles, name=f"Groupe {groupe_name}")
+        role = index.role(f"Groupe {groupe_name}")
         
         if role is None:
             return groupe_name
@@ -307,7 +333,8 @@ async def create_group_channels(guild: discord.Guild, groupe: str, role: discord
     category_name = f"📚 Groupe {groupe}"
 
     # Vérifier si la catégorie existe déjà
-    category = discord.utils.get(guild.categories, name=category_name)
+    index = get_guild_index(guild)
+    category = index.category(category_name)
 
     if category:
         return
@@ -320,6 +347,7 @@ async def create_group_channels(guild: discord.Guild, groupe: str, role: discord
     }
 
     category = await guild.create_category(category_name, overwrites=overwrites)
+    index.channel_created(category)
 
     # Créer les salons avec le bon format de nommage
     groupe_lower = groupe.lower()
@@ -353,7 +381,7 @@ async def register(interaction: discord.Interaction):
         username = interaction.user.name
         
         # Vérifier si existe déjà
-        existing = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+        existing = await run_db(db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first)
         
         if existing:
             await interaction.edit_original_response(
@@ -371,7 +399,7 @@ async def register(interaction: discord.Interaction):
             await on_member_join(member)
             await asyncio.sleep(1)
             
-            user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+            user = await run_db(db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first)
             
             if user:
                 await interaction.edit_original_response(
@@ -414,21 +442,21 @@ class ConfirmClearView(discord.ui.View):
         try:
             # Supprimer dans l'ordre à cause des contraintes de clés étrangères
             print("🗑️  Suppression des votes...")
-            db.execute(text("DELETE FROM votes"))
+            await run_db(db.execute, text("DELETE FROM votes"))
 
             print("🗑️  Suppression des périodes d'examen...")
-            db.execute(text("DELETE FROM exam_periods"))
+            await run_db(db.execute, text("DELETE FROM exam_periods"))
 
             print("🗑️  Suppression des résultats d'examen...")
-            db.execute(text("DELETE FROM exam_results"))
+            await run_db(db.execute, text("DELETE FROM exam_results"))
 
             print("🗑️  Suppression des utilisateurs...")
-            db.execute(text("DELETE FROM utilisateurs"))
+            await run_db(db.execute, text("DELETE FROM utilisateurs"))
 
             print("🗑️  Suppression des cohortes...")
-            db.execute(text("DELETE FROM cohortes"))
+            await run_db(db.execute, text("DELETE FROM cohortes"))
 
-            db.commit()
+            await run_db(db.commit)
 
             await interaction.edit_original_response(
                 content="✅ Base de données complètement vidée !\n\n"
@@ -456,35 +484,35 @@ async def my_info(interaction: discord.Interaction):
     """Affiche les infos de l'utilisateur"""
     await interaction.response.defer(ephemeral=True)
     
-    from db_connection import SessionLocal
-    from models import Utilisateur
+    user = await run_db(get_user, interaction.user.id)
     
-    db = SessionLocal()
+    if not user:
+        await interaction.followup.send("❌ Pas inscrit. Utilise `/register`", ephemeral=True)
+        return
     
-    try:
-        user = db.query(Utilisateur).filter(Utilisateur.user_id == interaction.user.id).first()
-        
-        if not user:
-            await interaction.followup.send("❌ Pas inscrit. Utilise `/register`", ephemeral=True)
-            return
-        
-        embed = discord.Embed(title="📋 Tes Informations", color=discord.Color.blue())
-        embed.add_field(name="👥 Groupe", value=f"**{user.groupe}**", inline=True)
-        embed.add_field(name="📊 Niveau", value=f"**{user.niveau_actuel}**", inline=True)
-        embed.add_field(name="🆔 ID", value=f"`{user.user_id}`", inline=True)
-        embed.add_field(
-            name="🌐 Lien Examen",
-            value=f"http://localhost:5000/exams\nID : `{user.user_id}`",
-            inline=False
-        )
-        embed.add_field(
-            name="🤖 Automatique",
-            value="Tu recevras tes résultats automatiquement en MP après chaque examen !",
-            inline=False
-        )
-        
-        await interaction.followup.send(embed=embed, ephemeral=True)
+    embed = discord.Embed(title="📋 Tes Informations", color=discord.Color.blue())
+    embed.add_field(name="👥 Groupe", value=f"**{user.groupe}**", inline=True)
+    embed.add_field(name="📊 Niveau", value=f"**{user.niveau_actuel}**", inline=True)
+    embed.add_field(name="🆔 ID", value=f"`{user.user_id}`", inline=True)
+    embed.add_field(
+        name="🌐 Lien Examen",
+        value=f"http://localhost:5000/exams\nID : `{user.user_id}`",
+        inline=False
+    )
+    embed.add_field(
+        name="🤖 Automatique",
+        value="Tu recevras tes résultats automatiquement en MP après chaque examen !",
+        inline=False
+    )
     
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+def get_user(user_id: int):
+    """Utilisateur par ID Discord, détaché de la session (à appeler via run_db)"""
+    db = SessionLocal()
+    try:
+        return db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
     finally:
         db.close()
 
@@ -517,14 +545,10 @@ class QuizButton(discord.ui.View):
             return
 
         # Vérifier inscription
-        db = SessionLocal()
-        try:
-            user = db.query(Utilisateur).filter(Utilisateur.user_id == interaction.user.id).first()
-            if not user:
-                await interaction.followup.send("❌ Tu dois d'abord t'inscrire avec `/register`", ephemeral=True)
-                return
-        finally:
-            db.close()
+        user = await run_db(get_user, interaction.user.id)
+        if not user:
+            await interaction.followup.send("❌ Tu dois d'abord t'inscrire avec `/register`", ephemeral=True)
+            return
 
         # Filtrer avec SM-2 (JSON uniquement, pas de SQL!)
         from quiz_reviews_manager import get_questions_to_review
@@ -552,88 +576,83 @@ async def start_quiz_interactive(member: discord.Member, course_title: str, ques
     """
     Quiz interactif en MP avec questions une par une
     Utilise l'algorithme SM-2 pour planifier les révisions
+    Les résultats sont sauvegardés en une seule transaction à la fin du quiz
     """
-    from quiz_reviews_manager import update_review_sm2
-
     total_questions = len(questions)
     correct_count = 0
+    outcomes = []  # [(question, quality)]
 
-    for i, question in enumerate(questions):
-        # Envoyer la question
-        embed = discord.Embed(
-            title=f"Question {i+1}/{total_questions}",
-            description=question['question'],
-            color=discord.Color.blue()
-        )
-
-        # Les options sont une liste, pas un dict
-        options_text = ""
-        for idx, option in enumerate(question['options']):
-            letter = chr(65 + idx)  # A, B, C, D
-            options_text += f"**{letter}.** {option}\n"
-
-        embed.add_field(
-            name="Options",
-            value=options_text,
-            inline=False
-        )
+    try:
+        for i, question in enumerate(questions):
+            # Envoyer la question
+            embed = discord.Embed(
+                title=f"Question {i+1}/{total_questions}",
+                description=question['question'],
+                color=discord.Color.blue()
+            )
 
-        await member.send(embed=embed)
+            # Les options sont une liste, pas un dict
+            options_text = ""
+            for idx, option in enumerate(question['options']):
+                letter = chr(65 + idx)  # A, B, C, D
+                options_text += f"**{letter}.** {option}\n"
 
-        # Attendre la réponse
-        def check(m):
-            return (
-                m.author.id == member.id and
-                isinstance(m.channel, discord.DMChannel) and
-                m.content.upper() in ['A', 'B', 'C', 'D']
+            embed.add_field(
+                name="Options",
+                value=options_text,
+                inline=False
             )
 
-        try:
-            msg = await bot.wait_for('message', check=check, timeout=300)  # 5 minutes
-            user_answer = msg.content.upper()
-
-            # Convertir la lettre en index (A=0, B=1, C=2, D=3)
-            answer_index = ord(user_answer) - 65
-            correct_index = question['correct']
+            await member.send(embed=embed)
 
-            # Vérifier la réponse
-            if answer_index == correct_index:
-                quality = 5  # Parfait
-                correct_count += 1
-                result_embed = discord.Embed(
-                    title="✅ Correct !",
-                    description=question.get('explanation', ''),
-                    color=discord.Color.green()
+            # Attendre la réponse
+            def check(m):
+                return (
+                    m.author.id == member.id and
+                    isinstance(m.channel, discord.DMChannel) and
+                    m.content.upper() in ['A', 'B', 'C', 'D']
                 )
-            else:
-                quality = 0  # Échec
-                correct_letter = chr(65 + correct_index)
-                result_embed = discord.Embed(
-                    title="❌ Incorrect",
-                    description=(
-                        f"La bonne réponse était : **{correct_letter}. {question['options'][correct_index]}**\n\n"
-                        f"{question.get('explanation', '')}"
-                    ),
-                    color=discord.Color.red()
-                )
-
-            await member.send(embed=result_embed)
-
-            # Mettre à jour SM-2 et planifier le rappel automatique
-            from quiz_reviews_manager import update_review_sm2
-            from review_scheduler import schedule_review
 
-            review_data = update_review_sm2(member.id, question['id'], quality)
-            next_review_date = review_data['next_review_date']
+            try:
+                msg = await bot.wait_for('message', check=check, timeout=300)  # 5 minutes
+                user_answer = msg.content.upper()
+
+                # Convertir la lettre en index (A=0, B=1, C=2, D=3)
+                answer_index = ord(user_answer) - 65
+                correct_index = question['correct']
+
+                # Vérifier la réponse
+                if answer_index == correct_index:
+                    quality = 5  # Parfait
+                    correct_count += 1
+                    result_embed = discord.Embed(
+                        title="✅ Correct !",
+                        description=question.get('explanation', ''),
+                        color=discord.Color.green()
+                    )
+                else:
+                    quality = 0  # Échec
+                    correct_letter = chr(65 + correct_index)
+                    result_embed = discord.Embed(
+                        title="❌ Incorrect",
+                        description=(
+                            f"La bonne réponse était : **{correct_letter}. {question['options'][correct_index]}**\n\n"
+                            f"{question.get('explanation', '')}"
+                        ),
+                        color=discord.Color.red()
+                    )
 
-            # Planifier le rappel automatique par MP
-            schedule_review(bot, member.id, question, next_review_date)
+                await member.send(embed=result_embed)
+                outcomes.append((question, quality))
 
-            await asyncio.sleep(2)
+                await asyncio.sleep(2)
 
-        except asyncio.TimeoutError:
-            await member.send("⏱️ Temps écoulé ! Quiz annulé.")
-            return
+            except asyncio.TimeoutError:
+                await member.send("⏱️ Temps écoulé ! Quiz annulé.")
+                return
+    finally:
+        # Conserver les réponses déjà données (délai écoulé, MP refusés, annulation)
+        await flush_quiz_outcomes(member.id, outcomes)
 
     # Fin du quiz
     score_pct = (correct_count / total_questions) * 100
@@ -644,15 +663,39 @@ async def start_quiz_interactive(member: discord.Member, course_title: str, ques
     )
 
 
+async def flush_quiz_outcomes(user_id: int, outcomes: list):
+    """
+    Met à jour SM-2 pour toutes les réponses d'un quiz en une transaction
+    puis planifie les rappels automatiques par MP (une transaction pour tout le quiz)
+    """
+    if not outcomes:
+        return
+
+    from quiz_reviews_manager import update_reviews_sm2
+    from review_scheduler import schedule_reviews
+
+    # Écriture du store de révisions (fsync) hors de la boucle d'événements
+    reviews = await run_db(update_reviews_sm2, user_id, [(question['id'], quality) for question, quality in outcomes])
+
+    await schedule_reviews(bot, user_id, [
+        (question, review_data['next_review_date']) for (question, _), review_data in zip(outcomes, reviews)
+    ])
+
+
 # ==================== VUE POUR RÉVISIONS AUTOMATIQUES ====================
 
 class ReviewQuestionView(discord.ui.View):
-    """Vue avec boutons A/B/C/D pour répondre aux questions de révision"""
+    """
+    Vue avec boutons A/B/C/D pour répondre aux questions de révision
+    Les rappels groupés sont paginés : position/total, la suivante s'affiche après la réponse
+    """
 
-    def __init__(self, question_data: dict, user_id: int):
+    def __init__(self, question_data: dict, user_id: int, position: int = 1, total: int = 1):
         super().__init__(timeout=None)  # Pas de timeout !
         self.question_data = question_data
         self.user_id = user_id
+        self.position = position
+        self.total = total
         self.answered = False
 
         # Créer les boutons A, B, C, D
@@ -731,11 +774,11 @@ class ReviewQuestionView(discord.ui.View):
             from quiz_reviews_manager import update_review_sm2
             from review_scheduler import schedule_review, complete_question
 
-            review_data = update_review_sm2(self.user_id, self.question_data['id'], quality)
+            review_data = await run_db(update_review_sm2, self.user_id, self.question_data['id'], quality)
             next_review_date = review_data['next_review_date']
 
             # Planifier la prochaine révision
-            schedule_review(bot, self.user_id, self.question_data, next_review_date)
+            await schedule_review(bot, self.user_id, self.question_data, next_review_date)
 
             # Ajouter info sur la prochaine révision
             if review_data['interval_days'] < 1:
@@ -754,26 +797,19 @@ class ReviewQuestionView(discord.ui.View):
             await interaction.followup.send(embed=result_embed)
 
             # Marquer la question comme répondue et envoyer la suivante si elle existe
-            next_question = complete_question(self.user_id)
+            next_question = await complete_question(self.user_id)
             if next_question:
-                await asyncio.sleep(2)
-                # Envoyer la question suivante
-                embed = discord.Embed(
-                    title="🔔 Question suivante",
-                    description=next_question['question'],
-                    color=discord.Color.blue()
-                )
-
-                options_text = ""
-                for idx, option in enumerate(next_question['options']):
-                    opt_letter = chr(65 + idx)
-                    options_text += f"**{opt_letter}.** {option}\n"
+                from review_scheduler import build_review_embed, pending_count
 
-                embed.add_field(name="Options", value=options_text, inline=False)
-                embed.set_footer(text="Réponds quand tu es prêt !")
+                await asyncio.sleep(2)
+                # Page suivante (d'autres révisions ont pu arriver entre-temps)
+                position = self.position + 1
+                total = max(self.total, position + await pending_count(self.user_id))
+                embed = build_review_embed(next_question, position, total, title="🔔 Question suivante")
 
-                view = ReviewQuestionView(next_question, self.user_id)
-                await interaction.user.send(embed=embed, view=view)
+                # Réponse à l'interaction : n'utilise pas la route des MPs
+                view = ReviewQuestionView(next_question, self.user_id, position=position, total=total)
+                await interaction.followup.send(embed=embed, view=view)
 
         return callback
 
@@ -820,29 +856,35 @@ async def list_users(interaction: discord.Interaction):
     """Liste tous les utilisateurs"""
     await interaction.response.defer(ephemeral=True)
     
-    from db_connection import SessionLocal
-    from models import Utilisateur
+    total, users = await run_db(list_users_page, 25)
     
-    db = SessionLocal()
+    if not users:
+        await interaction.followup.send("📭 Aucun utilisateur", ephemeral=True)
+        return
     
-    try:
-        users = db.query(Utilisateur).all()
-        
-        if not users:
-            await interaction.followup.send("📭 Aucun utilisateur", ephemeral=True)
-            return
-        
-        embed = discord.Embed(title=f"👥 Utilisateurs ({len(users)})", color=discord.Color.blue())
-        
-        for user in users[:25]:
-            embed.add_field(
-                name=f"{user.username}",
-                value=f"ID: `{user.user_id}`\nGroupe: {user.groupe}\nNiveau: {user.niveau_actuel}",
-                inline=True
-            )
-        
-        await interaction.followup.send(embed=embed, ephemeral=True)
+    embed = discord.Embed(title=f"👥 Utilisateurs ({total})", color=discord.Color.blue())
     
+    for user in users:
+        embed.add_field(
+            name=f"{user.username}",
+            value=f"ID: `{user.user_id}`\nGroupe: {user.groupe}\nNiveau: {user.niveau_actuel}",
+            inline=True
+        )
+    
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+def list_users_page(limit: int):
+    """Nombre total d'utilisateurs et les `limit` premiers (à appeler via run_db)"""
+    from sqlalchemy import func
+
+    db = SessionLocal()
+    try:
+        total = db.query(func.count(Utilisateur.user_id)).scalar()
+        users = db.query(
+            Utilisateur.user_id, Utilisateur.username, Utilisateur.groupe, Utilisateur.niveau_actuel
+        ).order_by(Utilisateur.user_id).limit(limit).all()
+        return total, users
     finally:
         db.close()
 
@@ -864,112 +906,152 @@ def get_courses_for_level(niveau: int) -> list:
 async def setup_resources_channels():
     """
     Envoie les cours dans les salons 📖-ressources de chaque groupe existant
+
+    Le registre course_posts indique ce qui est déjà publié : aucune lecture
+    d'historique, seuls les cours absents ou modifiés sont envoyés / mis à jour
+    (salons traités en parallèle).
     """
-    from db_connection import SessionLocal
-    from models import Utilisateur
+    groupes_actifs = await run_db(get_active_groups)
+        
+    print(f"📚 Groupes actifs détectés : {len(groupes_actifs)}")
     
+    for guild in bot.guilds:
+        index = get_guild_index(guild)
+        posted = await run_db(load_posts, guild.id)
+        semaphore = asyncio.Semaphore(RESOURCES_CONCURRENCY)
+        syncs = []
+
+        for groupe, niveau in groupes_actifs:
+            # Trouver la catégorie "📚 Groupe X-Y" (avec emoji livre + espace)
+            category_name = f"📚 Groupe {groupe}"
+            category = index.category(category_name)
+            
+            if not category:
+                print(f"⚠️ Catégorie '{category_name}' introuvable")
+                continue
+            
+            # Chercher le salon 📖-ressources (livre ouvert) dans cette catégorie
+            resources_channel = index.text_channel("📖-ressources", category)
+            
+            if not resources_channel:
+                print(f"⚠️ Salon 📖-ressources introuvable dans {category_name}")
+                continue
+            
+            course_ids = get_courses_for_level(niveau)
+            
+            if not course_ids:
+                print(f"ℹ️ Pas de cours pour le niveau {niveau}")
+                continue
+
+            syncs.append(sync_resources_channel(resources_channel, category_name, course_ids, posted, semaphore))
+
+        results = await asyncio.gather(*syncs)
+        await run_db(record_posts, guild.id, [post for channel_posts in results for post in channel_posts])
+
+
+def get_active_groups() -> list:
+    """Groupes actifs [(groupe, niveau)] (à appeler via run_db)"""
     db = SessionLocal()
     try:
-        # Récupérer tous les groupes actifs
-        groupes_actifs = db.query(Utilisateur.groupe, Utilisateur.niveau_actuel).distinct().all()
-        
-        print(f"📚 Groupes actifs détectés : {len(groupes_actifs)}")
-        
-        for guild in bot.guilds:
-            for groupe, niveau in groupes_actifs:
-                # Trouver la catégorie "📚 Groupe X-Y" (avec emoji livre + espace)
-                category_name = f"📚 Groupe {groupe}"
-                category = discord.utils.get(guild.categories, name=category_name)
-                
-                if not category:
-                    print(f"⚠️ Catégorie '{category_name}' introuvable")
-                    continue
-                
-                # Chercher le salon 📖-ressources (livre ouvert) dans cette catégorie
-                resources_channel = None
-                for channel in category.text_channels:
-                    if channel.name == "📖-ressources":
-                        resources_channel = channel
-                        break
-                
-                if not resources_channel:
-                    print(f"⚠️ Salon 📖-ressources introuvable dans {category_name}")
-                    continue
-                
-                # Vérifier si les cours ont déjà été envoyés
-                messages_count = 0
-                async for message in resources_channel.history(limit=50):
-                    if message.author == bot.user and message.embeds:
-                        messages_count += 1
-                
-                course_ids = get_courses_for_level(niveau)
-                
-                if messages_count >= len(course_ids) and messages_count > 0:
-                    print(f"✅ Cours déjà envoyés dans {category_name}")
-                    continue
-                
-                if not course_ids:
-                    print(f"ℹ️ Pas de cours pour le niveau {niveau}")
-                    continue
-                
-                print(f"📤 Envoi de {len(course_ids)} cours dans {category_name} 📖-ressources...")
-                
-                for course_id in course_ids:
-                    await send_course_to_channel(course_id, resources_channel)
-                    await asyncio.sleep(1)
-                
-                print(f"✅ Cours envoyés dans {category_name}")
-    
+        return db.query(Utilisateur.groupe, Utilisateur.niveau_actuel).distinct().all()
     finally:
         db.close()
 
 
-async def send_course_to_channel(course_id: int, channel: discord.TextChannel):
+async def sync_resources_channel(channel: discord.TextChannel, category_name: str, course_ids: list,
+                                 posted: dict, semaphore: asyncio.Semaphore) -> list:
+    """
+    Publie ou met à jour les cours d'un salon 📖-ressources
+
+    Returns:
+        [(channel_id, course_id, message_id, content_hash)] à enregistrer
+    """
+    courses = {c['id']: c for c in QUIZZES_DATA['courses']}
+    wanted = {}
+    for course_id in course_ids:
+        course = courses.get(course_id)
+        if not course:
+            print(f"  ❌ Cours {course_id} introuvable")
+            continue
+        embed = build_course_embed(course)
+        wanted[course_id] = (embed, content_hash(embed))
+
+    todo = [course_id for course_id, (_, digest) in wanted.items()
+            if posted.get((channel.id, course_id), (None, None))[1] != digest]
+    if not todo:
+        print(f"✅ Cours déjà envoyés dans {category_name}")
+        return []
+
+    records = []
+    async with semaphore:
+        try:
+            # Salon publié avant le registre : reprendre les messages existants (une seule fois)
+            existing = {}
+            if not any(key[0] == channel.id for key in posted):
+                existing = await adopt_existing_posts(channel, bot.user, todo)
+
+            print(f"📤 Envoi de {len(todo)} cours dans {category_name} 📖-ressources...")
+
+            for course_id in todo:
+                embed, digest = wanted[course_id]
+                message = existing.get(course_id)
+                if message is None and (channel.id, course_id) in posted:
+                    message = channel.get_partial_message(posted[(channel.id, course_id)][0])
+
+                if message is not None and course_id in existing and content_hash(message.embeds[0]) == digest:
+                    pass  # Déjà publié à l'identique avant le registre
+                elif message is not None:
+                    try:
+                        await message.edit(embed=embed, view=QuizButton(course_id))
+                        print(f"  🔄 Cours {course_id} mis à jour")
+                    except discord.NotFound:
+                        message = None
+
+                if message is None:
+                    message = await send_course_to_channel(course_id, channel, embed)
+                    await asyncio.sleep(1)
+                    if message is None:
+                        continue
+
+                records.append((channel.id, course_id, message.id, digest))
+
+            print(f"✅ Cours envoyés dans {category_name}")
+        except discord.HTTPException as e:
+            print(f"❌ Erreur salon 📖-ressources de {category_name}: {e}")
+
+    return records
+
+
+async def send_course_to_channel(course_id: int, channel: discord.TextChannel, embed: discord.Embed = None):
     """
     Envoie un cours avec son bouton quiz dans un salon
     Utilise QUIZZES_DATA (déjà chargé en mémoire)
+
+    Returns:
+        Le message envoyé (None en cas d'erreur)
     """
     try:
-        # Trouver le cours dans les données déjà chargées
-        course = next((c for c in QUIZZES_DATA['courses'] if c['id'] == course_id), None)
+        if embed is None:
+            # Trouver le cours dans les données déjà chargées
+            course = next((c for c in QUIZZES_DATA['courses'] if c['id'] == course_id), None)
 
-        if not course:
-            print(f"  ❌ Cours {course_id} introuvable")
-            return
-        
-        course_title = course['title']
-        
-        # Créer l'embed
-        embed = discord.Embed(
-            title=f"📚 {course_title}",
-            description=f"Accède au cours en ligne et teste tes connaissances !",
-            color=discord.Color.blue()
-        )
-        
-        # URL vers la page du cours
-        course_url = f"http://localhost:5000/course/{course_id}"
-        
-        embed.add_field(
-            name="🌐 Lien du cours",
-            value=f"[Cliquez ici pour accéder au cours]({course_url})",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="📝 Quiz Interactif",
-            value="Clique sur le bouton ci-dessous pour faire le quiz en MP !",
-            inline=False
-        )
+            if not course:
+                print(f"  ❌ Cours {course_id} introuvable")
+                return None
+
+            embed = build_course_embed(course)
         
         # Créer la vue avec le bouton
         view = QuizButton(course_id)
         
         # Envoyer dans le salon
-        await channel.send(embed=embed, view=view)
+        message = await channel.send(embed=embed, view=view)
         print(f"  ✅ Cours {course_id} envoyé")
+        return message
 
     except Exception as e:
         print(f"  ❌ Erreur lors de l'envoi du cours {course_id}: {e}")
+        return None
 
 
 # ==================== COMMANDE /vote ====================
@@ -1027,7 +1109,7 @@ async def create_exam_period(
         db = SessionLocal()
         try:
             # Vérifier si une période existe déjà
-            existing = db.query(ExamPeriod).filter(ExamPeriod.id == period_id).first()
+            existing = await run_db(db.query(ExamPeriod).filter(ExamPeriod.id == period_id).first)
             if existing:
                 # Vérifier si la période est terminée
                 now = datetime.now()
@@ -1050,7 +1132,7 @@ async def create_exam_period(
                     # Période terminée, on la supprime automatiquement
                     print(f"🗑️ Suppression automatique de la période terminée {period_id}")
                     db.delete(existing)
-                    db.commit()
+                    await run_db(db.commit)
 
             period = ExamPeriod(
                 id=period_id,
@@ -1063,7 +1145,9 @@ async def create_exam_period(
             )
 
             db.add(period)
-            db.commit()
+            await run_db(db.commit)
+            await run_db(db.refresh, period)
+            await invalidate_web_cache(exam_periods=True)
 
             # Planifier automatiquement l'application des bonus à la fin de la période
             schedule_bonus_application(bot, period)
@@ -1088,15 +1172,16 @@ async def create_exam_period(
                 # Format: groupe-X-y où X est le niveau et y une lettre
                 # On cherche tous les groupes du niveau concerné
                 possible_letters = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j']
+                index = get_guild_index(guild)
 
                 for letter in possible_letters:
                     # Chercher la catégorie du groupe
                     category_name = f"📚 Groupe {group}-{letter.upper()}"
-                    category = discord.utils.get(guild.categories, name=category_name)
+                    category = index.category(category_name)
 
                     if category:
                         # Chercher le salon mon-examen dans cette catégorie
-                        exam_channel = discord.utils.get(category.text_channels, name="📝-mon-examen")
+                        exam_channel = index.text_channel("📝-mon-examen", category)
 
                         if exam_channel:
                             # Créer l'embed pour les étudiants
@@ -1158,7 +1243,7 @@ async def delete_exam_period(
 
     db = SessionLocal()
     try:
-        period = db.query(ExamPeriod).filter(ExamPeriod.id == period_id).first()
+        period = await run_db(db.query(ExamPeriod).filter(ExamPeriod.id == period_id).first)
 
         if not period:
             await interaction.followup.send(
@@ -1178,7 +1263,8 @@ async def delete_exam_period(
         )
 
         db.delete(period)
-        db.commit()
+        await run_db(db.commit)
+        await invalidate_web_cache(exam_periods=True)
 
         await interaction.followup.send(info_msg, ephemeral=True)
 
@@ -1201,9 +1287,9 @@ async def list_exam_periods_command(interaction: discord.Interaction):
         now = datetime.now()
 
         # Récupérer seulement les périodes à venir (end_time > now)
-        periods = db.query(ExamPeriod).filter(
+        periods = await run_db(db.query(ExamPeriod).filter(
             ExamPeriod.end_time > now
-        ).order_by(ExamPeriod.start_time).all()
+        ).order_by(ExamPeriod.start_time).all)
 
         if not periods:
             await interaction.followup.send(
@@ -1248,112 +1334,79 @@ async def list_exam_periods_command(interaction: discord.Interaction):
 
 @bot.tree.command(name="actualiser_exams", description="[ADMIN] Actualiser les rôles Discord selon la base de données")
 @commands.has_permissions(administrator=True)
-async def actualiser_exams(interaction: discord.Interaction):
+@app_commands.describe(
+    complet="Revérifier tous les utilisateurs (par défaut : seulement ceux dont le groupe a changé)"
+)
+async def actualiser_exams(interaction: discord.Interaction, complet: bool = False):
     """
     Synchronise les rôles Discord avec la base de données
     Applique toutes les promotions qui sont dans la DB mais pas sur Discord
     """
     await interaction.response.defer(ephemeral=True)
 
-    from db_connection import SessionLocal
-    from models import Utilisateur
+    from role_reconciler import RoleReconciler
+    from notification_dispatcher import get_dispatcher
 
-    db = SessionLocal()
     try:
         guild = interaction.guild
         if not guild:
             await interaction.followup.send("❌ Commande doit être utilisée sur un serveur", ephemeral=True)
             return
 
-        # Récupérer tous les utilisateurs
-        all_users = db.query(Utilisateur).all()
+        reconciler = RoleReconciler(guild, ensure_channels=create_group_channels)
+
+        # Diff base de données / serveur en mémoire, puis un member.edit par membre à corriger
+        desired = await run_db(reconciler.load_desired, full=complet)
 
-        if not all_users:
-            await interaction.followup.send("⚠️ Aucun utilisateur dans la base de données", ephemeral=True)
+        if not desired:
+            await interaction.followup.send(
+                "✅ Aucun changement de groupe depuis la dernière actualisation "
+                "(utilise `complet: True` pour tout revérifier)",
+                ephemeral=True
+            )
             return
 
-        # Statistiques
-        updated_count = 0
-        unchanged_count = 0
-        errors = []
+        changes, in_sync, missing = reconciler.plan(desired)
 
         await interaction.followup.send(
             f"🔄 **Actualisation en cours...**\n"
-            f"📊 {len(all_users)} utilisateur(s) à vérifier",
+            f"📊 {len(desired)} utilisateur(s) vérifié(s), {len(changes)} à corriger",
             ephemeral=True
         )
 
-        for user_db in all_users:
-            try:
-                member = guild.get_member(user_db.user_id)
-
-                if not member:
-                    errors.append(f"⚠️ {user_db.username} (ID: {user_db.user_id}) - Membre introuvable sur Discord")
-                    continue
-
-                # Rôle attendu selon la base de données
-                expected_role_name = f"Groupe {user_db.groupe}"
-                expected_role = discord.utils.get(guild.roles, name=expected_role_name)
-
-                # Vérifier si le membre a déjà le bon rôle
-                if expected_role and expected_role in member.roles:
-                    unchanged_count += 1
-                    continue
-
-                print(f"\n🔄 Actualisation : {user_db.username}")
-                print(f"   Groupe DB: {user_db.groupe}")
-
-                # Retirer tous les anciens rôles de groupe
-                for role in member.roles:
-                    if role.name.startswith("Groupe "):
-                        await member.remove_roles(role)
-                        print(f"   ❌ Rôle retiré : {role.name}")
-
-                # Créer ou récupérer le nouveau rôle
-                if not expected_role:
-                    expected_role = await guild.create_role(
-                        name=expected_role_name,
-                        color=discord.Color.blue(),
-                        mentionable=True,
-                        hoist=True  # Afficher séparément à gauche sur Discord
-                    )
-                    print(f"   ✅ Rôle créé : {expected_role_name}")
-
-                # Ajouter le nouveau rôle
-                await member.add_roles(expected_role)
-                print(f"   ✅ Rôle ajouté : {expected_role_name}")
-
-                # Créer les salons si nécessaire
-                await create_group_channels(guild, user_db.groupe, expected_role)
-
-                # Envoyer un MP de notification
-                try:
-                    embed = discord.Embed(
-                        title="🔄 Rôles Actualisés",
-                        description=f"Tes rôles Discord ont été mis à jour !",
-                        color=discord.Color.blue()
-                    )
-                    embed.add_field(
-                        name="📊 Groupe Actuel",
-                        value=f"**{user_db.groupe}** (Niveau {user_db.niveau_actuel})",
-                        inline=False
-                    )
-                    embed.add_field(
-                        name="💡 Info",
-                        value="Cette actualisation a été effectuée par un administrateur.",
-                        inline=False
-                    )
-
-                    await member.send(embed=embed)
-                    print(f"   ✅ MP envoyé")
-                except discord.Forbidden:
-                    print(f"   ⚠️ MP bloqués pour {member.name}")
-
-                updated_count += 1
+        applied = await reconciler.apply(changes)
+        await run_db(reconciler.record, in_sync + [(change.user_id, change.groupe) for change in applied])
 
-            except Exception as e:
-                errors.append(f"❌ {user_db.username} - {str(e)}")
-                print(f"❌ Erreur pour {user_db.username}: {e}")
+        # MP de notification (outbox en une transaction, envoyés en parallèle)
+        dispatcher = get_dispatcher(bot)
+        outbox = []
+        for change in applied:
+            embed = discord.Embed(
+                title="🔄 Rôles Actualisés",
+                description=f"Tes rôles Discord ont été mis à jour !",
+                color=discord.Color.blue()
+            )
+            embed.add_field(
+                name="📊 Groupe Actuel",
+                value=f"**{change.groupe}** (Niveau {change.niveau})",
+                inline=False
+            )
+            embed.add_field(
+                name="💡 Info",
+                value="Cette actualisation a été effectuée par un administrateur.",
+                inline=False
+            )
+            outbox.append((change.user_id, 'roles_refresh', embed))
+        notification_ids = await run_db(dispatcher.enqueue_many, outbox)
+        await dispatcher.dispatch(notification_ids)
+
+        errors = [
+            f"⚠️ {username} (ID: {user_id}) - Membre introuvable sur Discord"
+            for user_id, username in missing
+        ] + [
+            f"❌ {change.username} - {change.error}"
+            for change in changes if change.error is not None
+        ]
 
         # Rapport final
         report = discord.Embed(
@@ -1363,8 +1416,8 @@ async def actualiser_exams(interaction: discord.Interaction):
 
         report.add_field(
             name="📊 Résumé",
-            value=f"**{updated_count}** utilisateur(s) actualisé(s)\n"
-                  f"**{unchanged_count}** déjà à jour",
+            value=f"**{len(applied)}** utilisateur(s) actualisé(s)\n"
+                  f"**{len(in_sync)}** déjà à jour",
             inline=False
         )
 
@@ -1386,9 +1439,6 @@ async def actualiser_exams(interaction: discord.Interaction):
         import traceback
         traceback.print_exc()
 
-    finally:
-        db.close()
-
 
 @bot.tree.command(name="change_group", description="[ADMIN] Modifier le groupe d'un utilisateur")
 @commands.has_permissions(administrator=True)
@@ -1430,7 +1480,7 @@ async def change_group(
             return
 
         # Trouver l'utilisateur
-        user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id_int).first()
+        user = await run_db(db.query(Utilisateur).filter(Utilisateur.user_id == user_id_int).first)
 
         if not user:
             await interaction.followup.send(
@@ -1443,6 +1493,7 @@ async def change_group(
         # Sauvegarder l'ancien groupe
         old_groupe = user.groupe
         old_niveau = user.niveau_actuel
+        username = user.username
 
         # Créer le nouveau groupe
         new_groupe = f"{niveau}-{groupe_upper}"
@@ -1451,7 +1502,7 @@ async def change_group(
         user.niveau_actuel = niveau
         user.groupe = new_groupe
 
-        db.commit()
+        await run_db(db.commit)
 
         # Message de confirmation
         embed = discord.Embed(
@@ -1459,7 +1510,7 @@ async def change_group(
             color=discord.Color.green()
         )
 
-        embed.add_field(name="👤 Utilisateur", value=f"{user.username} (`{user_id_int}`)", inline=False)
+        embed.add_field(name="👤 Utilisateur", value=f"{username} (`{user_id_int}`)", inline=False)
         embed.add_field(name="📊 Ancien groupe", value=f"Niveau {old_niveau} - Groupe {old_groupe}", inline=True)
         embed.add_field(name="🆕 Nouveau groupe", value=f"Niveau {niveau} - Groupe {new_groupe}", inline=True)
 
@@ -1483,7 +1534,7 @@ async def user_info(interaction: discord.Interaction, user: str):
     await interaction.response.defer(ephemeral=True)
 
     from db_connection import SessionLocal
-    from models import Utilisateur, ExamResult
+    from models import Utilisateur
 
     # Extraire l'ID de la mention ou utiliser directement l'ID
     user_id_str = user.strip()
@@ -1498,7 +1549,7 @@ async def user_info(interaction: discord.Interaction, user: str):
 
     db = SessionLocal()
     try:
-        user_db = db.query(Utilisateur).filter(Utilisateur.user_id == user_id_int).first()
+        user_db = await run_db(db.query(Utilisateur).filter(Utilisateur.user_id == user_id_int).first)
 
         if not user_db:
             await interaction.followup.send(
@@ -1512,9 +1563,9 @@ async def user_info(interaction: discord.Interaction, user: str):
         member_name = member.display_name if member else user_db.username
 
         # Récupérer les résultats d'examen
-        exam_results = db.query(ExamResult).filter(
+        exam_results = await run_db(db.query(ExamResult).filter(
             ExamResult.user_id == user_id_int
-        ).order_by(ExamResult.date_passage.desc()).limit(5).all()
+        ).order_by(ExamResult.date_passage.desc()).limit(5).all)
 
         embed = discord.Embed(
             title=f"📋 Informations de {member_name}",
@@ -1585,15 +1636,15 @@ class ConfirmDeleteUserView(discord.ui.View):
         db = SessionLocal()
         try:
             # Supprimer les votes de/pour cet utilisateur
-            db.execute(text("DELETE FROM votes WHERE voter_id = :uid OR voted_for_id = :uid"), {"uid": self.user_id})
+            await run_db(db.execute, text("DELETE FROM votes WHERE voter_id = :uid OR voted_for_id = :uid"), {"uid": self.user_id})
 
             # Supprimer les résultats d'examen
-            db.execute(text("DELETE FROM exam_results WHERE user_id = :uid"), {"uid": self.user_id})
+            await run_db(db.execute, text("DELETE FROM exam_results WHERE user_id = :uid"), {"uid": self.user_id})
 
             # Supprimer l'utilisateur
-            result = db.execute(text("DELETE FROM utilisateurs WHERE user_id = :uid"), {"uid": self.user_id})
+            result = await run_db(db.execute, text("DELETE FROM utilisateurs WHERE user_id = :uid"), {"uid": self.user_id})
 
-            db.commit()
+            await run_db(db.commit)
 
             if result.rowcount > 0:
                 await interaction.edit_original_response(
@@ -1638,7 +1689,7 @@ async def group_members(interaction: discord.Interaction, groupe: str):
 
     db = SessionLocal()
     try:
-        users = db.query(Utilisateur).filter(Utilisateur.groupe == groupe_clean).all()
+        users = await run_db(db.query(Utilisateur).filter(Utilisateur.groupe == groupe_clean).all)
 
         if not users:
             await interaction.followup.send(
@@ -1703,7 +1754,7 @@ async def waiting_list(interaction: discord.Interaction, niveau: int = None):
         if niveau:
             query = query.filter(WaitingList.niveau == niveau)
 
-        waiting_users = query.all()
+        waiting_users = await run_db(query.all)
 
         if not waiting_users:
             msg = f"📭 Aucune personne en liste d'attente"
@@ -0,0 +1,117 @@
+"""
+Registre des cours publiés dans les salons 📖-ressources (table course_posts)
+
+Au démarrage, setup_resources_channels lisait les 50 derniers messages de chaque
+salon de ressources pour savoir si les cours y étaient déjà : un appel API par
+groupe. Le registre garde, pour chaque (salon, cours), le message publié et le
+hash de son contenu :
+- hash identique → rien à faire, aucun appel Discord
+- hash différent (cours modifié) → le message existant est mis à jour
+- absent → le cours est publié
+
+Un salon encore absent du registre (publié avant son introduction) est relu une
+seule fois pour reprendre les messages existants au lieu de les republier.
+"""
+
+import hashlib
+import json
+import os
+import discord
+from sqlalchemy import delete, insert, select
+from db_connection import SessionLocal
+from models import CoursePost
+
+COURSE_URL = "http://localhost:5000/course/{course_id}"
+RESOURCES_CONCURRENCY = int(os.getenv('RESOURCES_CONCURRENCY', 4))  # Salons traités en parallèle
+
+
+def build_course_embed(course: dict):
+    """Embed d'un cours (titre, lien vers le site, invitation au quiz)"""
+    embed = discord.Embed(
+        title=f"📚 {course['title']}",
+        description="Accède au cours en ligne et teste tes connaissances !",
+        color=discord.Color.blue()
+    )
+
+    embed.add_field(
+        name="🌐 Lien du cours",
+        value=f"[Cliquez ici pour accéder au cours]({COURSE_URL.format(course_id=course['id'])})",
+        inline=False
+    )
+
+    embed.add_field(
+        name="📝 Quiz Interactif",
+        value="Clique sur le bouton ci-dessous pour faire le quiz en MP !",
+        inline=False
+    )
+    return embed
+
+
+def content_hash(embed) -> str:
+    """Hash stable du contenu publié (change si le cours ou sa présentation change)"""
+    payload = json.dumps(embed.to_dict(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_posts(guild_id: int) -> dict:
+    """
+    Retourne {(channel_id, course_id): (message_id, content_hash)} pour un serveur
+    (une seule requête pour tous les salons)
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(CoursePost.channel_id, CoursePost.course_id, CoursePost.message_id, CoursePost.content_hash)
+            .where(CoursePost.guild_id == guild_id)
+        ).all()
+        return {(row.channel_id, row.course_id): (row.message_id, row.content_hash) for row in rows}
+    finally:
+        db.close()
+
+
+def record_posts(guild_id: int, posts: list):
+    """
+    Enregistre les cours publiés [(channel_id, course_id, message_id, content_hash)]
+    (remplace l'entrée existante du même salon et du même cours)
+    """
+    if not posts:
+        return
+
+    db = SessionLocal()
+    try:
+        for channel_id, course_id, _, _ in posts:
+            db.execute(delete(CoursePost).where(
+                CoursePost.channel_id == channel_id, CoursePost.course_id == course_id
+            ))
+        db.execute(insert(CoursePost), [
+            {'guild_id': guild_id, 'channel_id': channel_id, 'course_id': course_id,
+             'message_id': message_id, 'content_hash': digest}
+            for channel_id, course_id, message_id, digest in posts
+        ])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erreur enregistrement des cours publiés: {e}")
+    finally:
+        db.close()
+
+
+async def adopt_existing_posts(channel, bot_user, course_ids: list) -> dict:
+    """
+    Reprise unique d'un salon publié avant le registre : retrouve les messages
+    de cours du bot dans l'historique (par le lien du cours)
+
+    Returns:
+        {course_id: message} des cours déjà présents
+    """
+    urls = {COURSE_URL.format(course_id=course_id): course_id for course_id in course_ids}
+    found = {}
+
+    async for message in channel.history(limit=50):
+        if message.author != bot_user or not message.embeds:
+            continue
+        for field in message.embeds[0].fields:
+            for url, course_id in urls.items():
+                if f"({url})" in (field.value or '') and course_id not in found:
+                    found[course_id] = message
+    return found
@@ -3,6 +3,8 @@ Gestion des révisions espacées (Spaced Repetition) avec PostgreSQL
 Remplace l'ancien database.py basé sur JSON
 """
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 from models import Review
 from db_connection import SessionLocal
@@ -10,6 +12,29 @@ from db_connection import SessionLocal
 
 class ReviewDatabaseSQL:
     """Gestion du stockage persistant des révisions avec PostgreSQL"""
+
+    # Callbacks appelés après chaque sauvegarde (ex: file des révisions dues du scheduler)
+    _listeners = []
+
+    @classmethod
+    def add_listener(cls, callback):
+        """Enregistre un callback(review_data) appelé après chaque sauvegarde"""
+        if callback not in cls._listeners:
+            cls._listeners.append(callback)
+
+    @classmethod
+    def remove_listener(cls, callback):
+        """Retire un callback enregistré"""
+        if callback in cls._listeners:
+            cls._listeners.remove(callback)
+
+    def _notify(self, review_data: dict):
+        """Prévient les listeners qu'une révision a changé"""
+        for callback in self._listeners:
+            try:
+                callback(review_data)
+            except Exception as e:
+                print(f"❌ Erreur listener révision: {e}")
     
     def save_review(self, review_data: dict):
         """
@@ -25,39 +50,82 @@ class ReviewDatabaseSQL:
                 'easiness_factor': float
             }
         """
+        self.save_reviews([review_data])
+
+    def save_reviews(self, reviews) -> int:
+        """
+        Sauvegarde un lot de révisions en une seule requête et un seul commit
+        INSERT ... ON CONFLICT (user_id, question_id) DO UPDATE
+
+        Args:
+            reviews: itérable de dicts au format de save_review
+
+        Returns:
+            int: nombre de révisions sauvegardées
+        """
+        # Une seule ligne par (user_id, question_id) : la dernière l'emporte
+        rows = {}
+        for review_data in reviews:
+            rows[(review_data['user_id'], review_data['question_id'])] = review_data
+
+        if not rows:
+            return 0
+
+        values = [{
+            'user_id': r['user_id'],
+            'question_id': r['question_id'],
+            'next_review': r['next_review'],
+            'interval_days': r['interval'],
+            'repetitions': r['repetitions'],
+            'easiness_factor': r['easiness_factor']
+        } for r in rows.values()]
+
         db = SessionLocal()
         try:
-            # Vérifier si la révision existe déjà
-            existing = db.query(Review).filter(
-                Review.user_id == review_data['user_id'],
-                Review.question_id == review_data['question_id']
-            ).first()
-            
-            if existing:
-                # Mise à jour
-                existing.next_review = review_data['next_review']
-                existing.interval_days = review_data['interval']
-                existing.repetitions = review_data['repetitions']
-                existing.easiness_factor = review_data['easiness_factor']
-            else:
-                # Création
-                new_review = Review(
-                    user_id=review_data['user_id'],
-                    question_id=review_data['question_id'],
-                    next_review=review_data['next_review'],
-                    interval_days=review_data['interval'],
-                    repetitions=review_data['repetitions'],
-                    easiness_factor=review_data['easiness_factor']
+            dialect = db.get_bind().dialect.name
+
+            if dialect in ('postgresql', 'sqlite'):
+                # SQLite (tests en local) supporte la même syntaxe d'upsert
+                insert = pg_insert if dialect == 'postgresql' else sqlite_insert
+                stmt = insert(Review).values(values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Review.user_id, Review.question_id],
+                    set_={
+                        'next_review': stmt.excluded.next_review,
+                        'interval_days': stmt.excluded.interval_days,
+                        'repetitions': stmt.excluded.repetitions,
+                        'easiness_factor': stmt.excluded.easiness_factor
+                    }
                 )
-                db.add(new_review)
-            
+                db.execute(stmt)
+            else:
+                # Autres bases : SELECT puis UPDATE/INSERT, mais toujours un seul commit
+                for value in values:
+                    existing = db.query(Review).filter(
+                        Review.user_id == value['user_id'],
+                        Review.question_id == value['question_id']
+                    ).first()
+
+                    if existing:
+                        existing.next_review = value['next_review']
+                        existing.interval_days = value['interval_days']
+                        existing.repetitions = value['repetitions']
+                        existing.easiness_factor = value['easiness_factor']
+                    else:
+                        db.add(Review(**value))
+
             db.commit()
         except Exception as e:
             db.rollback()
-            print(f"❌ Erreur save_review: {e}")
+            print(f"❌ Erreur save_reviews: {e}")
             raise
         finally:
             db.close()
+
+        for review_data in rows.values():
+            self._notify(review_data)
+
+        return len(rows)
     
     def get_review(self, user_id: int, question_id: int) -> dict:
         """
@@ -147,17 +215,23 @@ class ReviewDatabaseSQL:
         finally:
             db.close()
     
-    def get_due_reviews(self) -> list:
+    def get_due_reviews(self, until: datetime = None, after: datetime = None) -> list:
         """
         Récupère toutes les révisions dues (next_review <= maintenant)
         Utile pour le scheduler
+
+        Args:
+            until: Borne haute (défaut : maintenant) pour précharger une fenêtre à venir
+            after: Borne basse exclue (défaut : aucune)
         """
         db = SessionLocal()
         try:
-            now = datetime.now()
-            reviews = db.query(Review).filter(
-                Review.next_review <= now
-            ).all()
+            query = db.query(Review).filter(
+                Review.next_review <= (until or datetime.now())
+            )
+            if after is not None:
+                query = query.filter(Review.next_review > after)
+            reviews = query.order_by(Review.next_review, Review.user_id).all()
             
             return [{
                 'user_id': r.user_id,
@@ -3,11 +3,13 @@ Connexion à la base de données PostgreSQL
 Fichier partagé entre Bot Discord et Site Web
 """
 import os
+import time
 from pathlib import Path
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+from metrics import Counter, Gauge, Histogram
 
 # Charger le fichier .env depuis la RACINE du projet
 # Cherche .env dans le dossier parent (racine)
@@ -32,16 +34,125 @@ if DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
     print("🔧 URL corrigée de postgres:// vers postgresql://")
 
-# Configuration du moteur SQLAlchemy
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=5,              # Nombre de connexions dans le pool
-    max_overflow=10,          # Connexions supplémentaires max
-    pool_pre_ping=True,       # Vérifie la connexion avant utilisation
-    pool_recycle=3600,        # Recycle les connexions toutes les heures
-    echo=False                # Mettre True pour voir les requêtes SQL (debug)
+# ==================== POOL DE CONNEXIONS ====================
+# Le bot et le site partagent la même petite instance PostgreSQL : chaque
+# processus choisit son profil (DB_PROFILE) pour ne prendre que sa part des
+# connexions. Chaque valeur peut être surchargée par l'environnement
+# (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE).
+POOL_PROFILES = {
+    'bot': {'pool_size': 5, 'max_overflow': 3, 'pool_timeout': 10.0},      # Handlers + db_executor (DB_WORKERS)
+    'web': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 10.0},     # Par worker gunicorn (pics d'examen)
+    'scripts': {'pool_size': 1, 'max_overflow': 1, 'pool_timeout': 30.0},  # Migrations, scripts d'administration
+}
+DB_PROFILE = os.getenv('DB_PROFILE', 'scripts')
+
+# Vérification de la connexion au checkout seulement si elle est restée inutilisée
+# plus de DB_IDLE_PING_SECONDS (pool_pre_ping ajoutait un aller-retour à chaque checkout)
+IDLE_PING_SECONDS = float(os.getenv('DB_IDLE_PING_SECONDS', 60))
+
+POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', "Attente d'une connexion du pool", labelnames=('profile',),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
 )
+POOL_TIMEOUTS = Counter('db_pool_checkout_timeouts', "Pool épuisé (pool_timeout dépassé)", labelnames=('profile',))
+POOL_IN_USE = Gauge('db_pool_in_use', "Connexions empruntées", labelnames=('profile',))
+POOL_OVERFLOW = Gauge('db_pool_overflow', "Connexions ouvertes au-delà de pool_size", labelnames=('profile',))
+POOL_LIVENESS = Histogram(
+    'db_pool_liveness_check_seconds', "Coût des vérifications de connexion inactive", labelnames=('profile',),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+)
+POOL_STALE = Counter('db_pool_stale_connections', "Connexions mortes remplacées au checkout", labelnames=('profile',))
+
+
+def pool_settings(profile: str) -> dict:
+    """Paramètres du pool pour un profil, avec les surcharges de l'environnement"""
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"❌ DB_PROFILE inconnu : {profile} (profils : {', '.join(POOL_PROFILES)})")
+
+    settings = dict(POOL_PROFILES[profile])
+    for key, env, cast in (('pool_size', 'DB_POOL_SIZE', int), ('max_overflow', 'DB_MAX_OVERFLOW', int),
+                           ('pool_timeout', 'DB_POOL_TIMEOUT', float)):
+        if os.getenv(env):
+            settings[key] = cast(os.getenv(env))
+    settings['pool_recycle'] = int(os.getenv('DB_POOL_RECYCLE', 3600))  # Recycle les connexions toutes les heures
+    return settings
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente d'une connexion (pool épuisé → attente)"""
+    profile = DB_PROFILE
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc(profile=self.profile)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, profile=self.profile)
+
+
+def _instrument_pool(engine, profile: str):
+    """Jauges du pool et vérification des connexions restées inactives"""
+
+    def update_gauges():
+        POOL_IN_USE.set(engine.pool.checkedout(), profile=profile)
+        POOL_OVERFLOW.set(max(0, engine.pool.overflow()), profile=profile)
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, record):
+        record.info['last_used'] = time.monotonic()
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, record, proxy):
+        idle = time.monotonic() - record.info.get('last_used', 0)
+        if idle > IDLE_PING_SECONDS:
+            start = time.perf_counter()
+            try:
+                engine.dialect.do_ping(dbapi_connection)
+            except Exception as e:
+                POOL_STALE.inc(profile=profile)
+                # Le pool jette la connexion et en ouvre une nouvelle
+                raise exc.DisconnectionError(f"Connexion inactive depuis {idle:.0f}s hors service : {e}") from e
+            finally:
+                POOL_LIVENESS.observe(time.perf_counter() - start, profile=profile)
+        update_gauges()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, record):
+        record.info['last_used'] = time.monotonic()
+        update_gauges()
+
+
+def create_db_engine(url: str, profile: str = DB_PROFILE):
+    """Moteur SQLAlchemy avec le pool du profil (instrumenté, voir /metrics)"""
+    # Une sous-classe par profil : le label survit à engine.dispose() (pool recréé)
+    pool_class = type('InstrumentedQueuePool', (InstrumentedQueuePool,), {'profile': profile})
+    engine = create_engine(
+        url,
+        poolclass=pool_class,
+        **pool_settings(profile),
+        echo=False                # Mettre True pour voir les requêtes SQL (debug)
+    )
+    _instrument_pool(engine, profile)
+    return engine
+
+
+def pool_stats(engine) -> dict:
+    """État instantané du pool (connexions empruntées, en débordement, disponibles)"""
+    pool = engine.pool
+    return {
+        'size': pool.size(),
+        'in_use': pool.checkedout(),
+        'overflow': max(0, pool.overflow()),
+        'idle': pool.checkedin(),
+    }
+
+
+# Configuration du moteur SQLAlchemy
+engine = create_db_engine(DATABASE_URL)
+print(f"🔌 Pool {DB_PROFILE} : {engine.pool.size()} connexion(s), attente max {engine.pool.timeout()}s")
 
 # Factory de sessions
 SessionLocal = sessionmaker(
@@ -0,0 +1,37 @@
+"""
+Accès base de données depuis les coroutines du bot sans bloquer la boucle asyncio
+
+Les sessions SQLAlchemy (SessionLocal) sont synchrones : appelées directement
+dans un handler discord.py, chaque aller-retour PostgreSQL gèle toute la boucle
+(heartbeat de la gateway, interactions des autres utilisateurs).
+
+run_db() exécute une fonction synchrone (une « unité de travail » qui ouvre sa
+session, fait ses requêtes et son commit, puis la ferme) dans un pool de threads
+borné. La boucle reste libre pendant les requêtes.
+
+- DB_WORKERS threads au plus (défaut : pool_size du moteur) : les requêtes en
+  trop attendent dans la file de l'exécuteur, pas dans le pool de connexions
+- Une unité de travail ne touche jamais à Discord (ni await, ni objets discord
+  modifiés) : elle reçoit des valeurs simples et retourne des valeurs simples
+- Les objets ORM retournés sont détachés : lire leurs colonnes, pas leurs relations
+
+Usage:
+    user = await run_db(get_user, interaction.user.id)
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from db_connection import engine
+
+DB_WORKERS = int(os.getenv('DB_WORKERS', engine.pool.size()))
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='db')
+
+
+async def run_db(func, *args, **kwargs):
+    """Exécute func(*args, **kwargs) dans un thread base de données et retourne son résultat"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
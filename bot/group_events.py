@@ -0,0 +1,245 @@
+"""
+Application en continu, sur Discord, des changements de groupe faits par le site
+
+Le site écrit un GroupChangeEvent dans la même transaction que le résultat
+d'examen et le changement de groupe (GroupManager). Le bot lit les nouveaux
+événements (high-water mark persisté dans event_cursors) et ne réconcilie que
+les membres concernés : plus besoin de /actualiser_exams après chaque examen.
+
+- PostgreSQL : LISTEN group_changes réveille le bot dès le commit (quelques ms)
+- Sinon (ou connexion LISTEN perdue) : interrogation toutes les GROUP_EVENTS_POLL secondes
+
+Les id auto-incrémentés peuvent être validés dans le désordre (deux transactions
+concurrentes) : les LOOKBACK derniers id sous le high-water mark sont relus, et
+ceux déjà traités sont ignorés. Réappliquer un événement est sans effet
+(la réconciliation part du groupe actuel en base).
+
+Un membre dont la mise à jour Discord échoue est réessayé au passage suivant ;
+le high-water mark persisté reste avant son premier événement non appliqué.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from sqlalchemy import select
+from db_connection import SessionLocal, engine
+from models import GroupChangeEvent, EventCursor
+from role_reconciler import RoleReconciler
+from db_executor import run_db
+
+CONSUMER_NAME = 'bot_group_changes'
+GROUP_CHANGES_CHANNEL = 'group_changes'  # Même canal que group_manager.GROUP_CHANGES_CHANNEL
+POLL_INTERVAL = float(os.getenv('GROUP_EVENTS_POLL', 5))
+BATCH_SIZE = 500
+LOOKBACK = 100
+
+
+class GroupChangeConsumer:
+    """Lit group_change_events et applique les rôles des membres concernés"""
+
+    def __init__(self, bot, ensure_channels=None, poll_interval: float = POLL_INTERVAL):
+        """
+        Args:
+            ensure_channels: Coroutine (guild, groupe, role) qui crée les salons d'un groupe s'ils manquent
+        """
+        self.bot = bot
+        self.ensure_channels = ensure_channels
+        self.poll_interval = poll_interval
+        self.last_id = None
+        self._seen = set()          # id traités sous le high-water mark (fenêtre LOOKBACK)
+        self._retry = {}            # user_id en échec → id de son premier événement non appliqué
+        self._wakeup = asyncio.Event()
+        self._listen_conn = None
+        self._task = None
+
+    def start(self):
+        """Lance la boucle de consommation (sans effet si elle tourne déjà)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    # ==================== HIGH-WATER MARK ====================
+
+    @staticmethod
+    def _load_cursor() -> int:
+        db = SessionLocal()
+        try:
+            cursor = db.get(EventCursor, CONSUMER_NAME)
+            return cursor.last_event_id if cursor else 0
+        finally:
+            db.close()
+
+    @staticmethod
+    def _save_cursor(last_id: int):
+        db = SessionLocal()
+        try:
+            cursor = db.get(EventCursor, CONSUMER_NAME)
+            if cursor is None:
+                cursor = EventCursor(consumer=CONSUMER_NAME)
+                db.add(cursor)
+            cursor.last_event_id = last_id
+            cursor.updated_at = datetime.now()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Erreur sauvegarde du curseur {CONSUMER_NAME}: {e}")
+        finally:
+            db.close()
+
+    def _fetch(self) -> list:
+        """Nouveaux événements [(id, user_id)] dans l'ordre des id"""
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(GroupChangeEvent.id, GroupChangeEvent.user_id).where(
+                    GroupChangeEvent.id > self.last_id - LOOKBACK
+                ).order_by(GroupChangeEvent.id).limit(BATCH_SIZE + LOOKBACK)
+            ).all()
+        finally:
+            db.close()
+        return [row for row in rows if row.id > self.last_id or row.id not in self._seen]
+
+    # ==================== TRAITEMENT ====================
+
+    async def process_pending(self) -> int:
+        """
+        Applique tous les événements pas encore traités
+
+        Returns:
+            Nombre d'événements traités
+        """
+        guild = self.bot.guilds[0] if self.bot.guilds else None
+        if guild is None:
+            return 0
+
+        processed = 0
+        retry = set(self._retry)  # Échecs précédents : réessayés une fois par appel
+        while True:
+            events = await run_db(self._fetch)
+            if not events and not retry:
+                return processed
+
+            # Un utilisateur peut changer plusieurs fois : seul son groupe actuel compte
+            user_ids = list({event.user_id for event in events} | retry)
+            retry = set()
+
+            reconciler = RoleReconciler(guild, ensure_channels=self.ensure_channels)
+            desired = await run_db(reconciler.load_desired, full=True, user_ids=user_ids)
+            changes, in_sync, missing = reconciler.plan(desired)
+            applied = await reconciler.apply(changes)
+            await run_db(reconciler.record, in_sync + [(change.user_id, change.groupe) for change in applied])
+
+            failed = {change.user_id for change in changes if change.error is not None}
+            self._track_failures(events, user_ids, failed)
+
+            self._seen.update(event.id for event in events)
+            self.last_id = max([self.last_id] + [event.id for event in events])
+            self._seen = {event_id for event_id in self._seen if event_id > self.last_id - LOOKBACK}
+            await run_db(self._save_cursor, self._committed_id())
+
+            processed += len(events)
+            print(f"🔔 {len(events)} changement(s) de groupe appliqué(s) sur Discord "
+                  f"({len(applied)} membre(s) modifié(s), {len(missing)} introuvable(s), "
+                  f"{len(failed)} en échec)")
+
+    def _track_failures(self, events: list, user_ids: list, failed: set):
+        """Met à jour les utilisateurs à réessayer après une réconciliation"""
+        for user_id in user_ids:
+            if user_id not in failed:
+                self._retry.pop(user_id, None)
+        for event in events:
+            if event.user_id in failed:
+                self._retry[event.user_id] = min(self._retry.get(event.user_id, event.id), event.id)
+
+    def _committed_id(self) -> int:
+        """High-water mark persisté : avant le premier événement d'un utilisateur en échec"""
+        if not self._retry:
+            return self.last_id
+        return min(self.last_id, min(self._retry.values()) - 1)
+
+    async def _run(self):
+        self.last_id = await run_db(self._load_cursor)
+        print(f"✅ Suivi des changements de groupe démarré (depuis l'événement #{self.last_id})")
+
+        while True:
+            if self._listen_conn is None and engine.dialect.name == 'postgresql':
+                await self._listen()
+            try:
+                await self.process_pending()
+            except Exception as e:
+                print(f"❌ Erreur traitement des changements de groupe: {e}")
+            await self._wait()
+
+    # ==================== RÉVEIL (LISTEN/NOTIFY ou interrogation) ====================
+
+    async def _wait(self):
+        """Attend une notification PostgreSQL ou la prochaine interrogation"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    @staticmethod
+    def _open_listen_connection():
+        """Connexion dédiée (hors pool) en écoute sur le canal group_changes (à appeler via run_db)"""
+        connection = None
+        try:
+            raw = engine.raw_connection()
+            raw.detach()  # Connexion gardée ouverte : ne pas occuper une place du pool
+            connection = raw.driver_connection
+            connection.rollback()  # Transaction ouverte par le ping du checkout : autocommit impossible sinon
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {GROUP_CHANGES_CHANNEL}")
+            return connection
+        except Exception:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            raise
+
+    async def _listen(self):
+        """Écoute le canal group_changes : chaque notification réveille la boucle de consommation"""
+        connection = None
+        try:
+            connection = await run_db(self._open_listen_connection)
+            asyncio.get_running_loop().add_reader(connection.fileno(), self._on_notify)
+            self._listen_conn = connection
+            print(f"✅ LISTEN {GROUP_CHANGES_CHANNEL} actif")
+        except Exception as e:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            print(f"⚠️ LISTEN indisponible, interrogation toutes les {self.poll_interval}s : {e}")
+
+    def _on_notify(self):
+        try:
+            self._listen_conn.poll()
+            self._listen_conn.notifies.clear()
+            self._wakeup.set()
+        except Exception as e:
+            # Connexion perdue : retour à l'interrogation, nouvelle écoute au prochain tour
+            print(f"⚠️ Connexion LISTEN perdue : {e}")
+            loop = asyncio.get_running_loop()
+            try:
+                loop.remove_reader(self._listen_conn.fileno())
+                self._listen_conn.close()
+            except Exception:
+                pass
+            self._listen_conn = None
+
+
+_consumer = None
+
+
+def start_group_change_consumer(bot, ensure_channels=None) -> GroupChangeConsumer:
+    """Démarre le consommateur partagé (appelé dans on_ready, qui peut se répéter)"""
+    global _consumer
+    if _consumer is None:
+        _consumer = GroupChangeConsumer(bot, ensure_channels=ensure_channels)
+    _consumer.start()
+    return _consumer
@@ -0,0 +1,125 @@
+"""
+Index nom → rôle / catégorie / salon d'un serveur Discord
+
+discord.utils.get(guild.roles, name=...) parcourt toute la liste à chaque appel,
+et category.text_channels refiltre tous les salons du serveur : dans les boucles
+par utilisateur ou par groupe, le coût devient O(utilisateurs × rôles).
+
+L'index est construit une fois par serveur puis tenu à jour par les événements
+on_guild_role_* et on_guild_channel_* (voir bot.py) : recherches en O(1).
+Comme discord.utils.get, un nom en double renvoie le premier rôle/salon rencontré.
+"""
+
+import discord
+
+
+class GuildIndex:
+    """Rôles, catégories et salons textuels d'un serveur, indexés par nom"""
+
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        self.rebuild()
+
+    def rebuild(self):
+        """Reconstruit tout l'index depuis le cache discord.py"""
+        self._roles = {}
+        for role in self.guild.roles:
+            self._roles.setdefault(role.name, role)
+
+        self._categories = {}
+        self._text_channels = {}  # {(category_id, nom): salon}, category_id None = tous les salons
+        for channel in self.guild.channels:
+            self._add_channel(channel)
+
+    # ==================== RECHERCHE ====================
+
+    def role(self, name: str):
+        """Rôle par nom (None s'il n'existe pas)"""
+        return self._roles.get(name)
+
+    def category(self, name: str):
+        """Catégorie par nom (None si elle n'existe pas)"""
+        return self._categories.get(name)
+
+    def text_channel(self, name: str, category=None):
+        """Salon textuel par nom, dans une catégorie donnée ou dans tout le serveur"""
+        category_id = category.id if category is not None else None
+        return self._text_channels.get((category_id, name))
+
+    # ==================== RÔLES ====================
+
+    def role_created(self, role: discord.Role):
+        self._roles.setdefault(role.name, role)
+
+    def role_updated(self, before: discord.Role, after: discord.Role):
+        if before.name != after.name:
+            self._forget(self._roles, before.name, before.id, self.guild.roles)
+        if self._roles.get(after.name) is None or self._roles[after.name].id == after.id:
+            self._roles[after.name] = after
+
+    def role_deleted(self, role: discord.Role):
+        self._forget(self._roles, role.name, role.id, self.guild.roles)
+
+    # ==================== SALONS ====================
+
+    def _add_channel(self, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            self._categories.setdefault(channel.name, channel)
+        elif isinstance(channel, discord.TextChannel):
+            self._text_channels.setdefault((None, channel.name), channel)
+            if channel.category_id is not None:
+                self._text_channels.setdefault((channel.category_id, channel.name), channel)
+
+    def _remove_channel(self, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            self._forget(self._categories, channel.name, channel.id, self.guild.categories)
+        elif isinstance(channel, discord.TextChannel):
+            for key in ((None, channel.name), (channel.category_id, channel.name)):
+                current = self._text_channels.get(key)
+                if current is not None and current.id == channel.id:
+                    del self._text_channels[key]
+                    # Un autre salon du même nom reprend la place
+                    for other in self.guild.text_channels:
+                        if other.id != channel.id and other.name == channel.name and \
+                                (key[0] is None or other.category_id == key[0]):
+                            self._text_channels[key] = other
+                            break
+
+    def channel_created(self, channel):
+        self._add_channel(channel)
+
+    def channel_updated(self, before, after):
+        self._remove_channel(before)
+        self._add_channel(after)
+
+    def channel_deleted(self, channel):
+        self._remove_channel(channel)
+
+    @staticmethod
+    def _forget(index: dict, name: str, object_id: int, candidates):
+        """Retire `name` s'il désigne cet objet ; un autre objet du même nom reprend la place"""
+        current = index.get(name)
+        if current is None or current.id != object_id:
+            return
+        del index[name]
+        for other in candidates:
+            if other.id != object_id and other.name == name:
+                index[name] = other
+                break
+
+
+_indexes = {}  # {guild_id: GuildIndex}
+
+
+def get_guild_index(guild: discord.Guild) -> GuildIndex:
+    """Retourne l'index du serveur (construit au premier appel)"""
+    index = _indexes.get(guild.id)
+    if index is None or index.guild is not guild:
+        index = _indexes[guild.id] = GuildIndex(guild)
+    return index
+
+
+def rebuild_guild_index(guild: discord.Guild) -> GuildIndex:
+    """Reconstruit l'index (connexion / reconnexion au serveur)"""
+    index = _indexes[guild.id] = GuildIndex(guild)
+    return index
@@ -1,57 +1,17 @@
-import discord
+"""
+Initialisation de la base de données (tables, colonnes, index)
+Applique les migrations versionnées de migrations.py
+"""
 import os
-from dotenv import load_dotenv
-from discord.ext import commands
-import json
-from datetime import datetime
-import asyncio
+import sys
+from db_connection import test_connection
+from migrations import run_migrations, INDEXES
 
-# ===== INITIALISATION AUTOMATIQUE =====
-print("🔧 Initialisation du système...")
-
-try:
-    print("📦 Vérification de la base de données...")
-    from init_db import init_database
-    init_database()
-except Exception as e:
-    print(f"⚠️ Erreur init DB: {e}")
-
-try:
-    print("📦 Vérification de la colonne 'groupe'...")
-    from add_groupe_column import add_groupe_column
-    add_groupe_column()
-except Exception as e:
-    print(f"⚠️ Erreur migration: {e}")
-
-print("✅ Initialisation terminée")
-# =======================================
-
-# Modules de quiz et révisions
-from quiz import QuizManager
-# ... reste du code
 
 def create_indexes():
-    """Crée les index pour optimiser les requêtes"""
-    print("📊 Création des index...")
-    
-    indexes = [
-        "CREATE INDEX IF NOT EXISTS idx_utilisateurs_cohorte ON utilisateurs(cohorte_id);",
-        "CREATE INDEX IF NOT EXISTS idx_calendrier_cohorte ON calendrier_examens(cohorte_id);",
-        "CREATE INDEX IF NOT EXISTS idx_reviews_next ON reviews(next_review);",
-        "CREATE INDEX IF NOT EXISTS idx_reviews_user ON reviews(user_id);",
-        "CREATE INDEX IF NOT EXISTS idx_exam_results_user ON exam_results(user_id);",
-        "CREATE INDEX IF NOT EXISTS idx_exam_results_notified ON exam_results(notified);",
-    ]
-    
-    with engine.connect() as conn:
-        for idx_query in indexes:
-            try:
-                conn.execute(text(idx_query))
-                conn.commit()
-            except Exception as e:
-                print(f"⚠️ Index déjà existant ou erreur : {e}")
-    
-    print("✅ Index créés")
+    """Crée les index pour optimiser les requêtes (migration 'index')"""
+    print(f"📊 {len(INDEXES)} index gérés par migrations.py")
+    run_migrations()
 
 def main():
     """Fonction principale d'initialisation"""
@@ -71,23 +31,16 @@ def main():
         print("❌ Impossible de se connecter à PostgreSQL")
         sys.exit(1)
     
-    # Créer les tables
-    print("\n2️⃣ Création des tables...")
+    # Tables, colonnes et index
+    print("\n2️⃣ Migrations du schéma...")
     try:
-        init_db()
+        version = run_migrations()
     except Exception as e:
-        print(f"❌ Erreur lors de la création des tables : {e}")
+        print(f"❌ Erreur lors des migrations : {e}")
         sys.exit(1)
     
-    # Créer les index
-    print("\n3️⃣ Création des index...")
-    try:
-        create_indexes()
-    except Exception as e:
-        print(f"⚠️ Avertissement lors de la création des index : {e}")
-    
     print("\n" + "=" * 60)
-    print("✅ INITIALISATION TERMINÉE AVEC SUCCÈS")
+    print(f"✅ INITIALISATION TERMINÉE AVEC SUCCÈS (schéma v{version})")
     print("=" * 60)
     print("\nLa base de données est prête à être utilisée !")
     print("Vous pouvez maintenant démarrer votre application.")
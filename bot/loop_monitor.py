@@ -0,0 +1,155 @@
+"""
+Surveillance de la boucle asyncio du bot (exposée sur /metrics par stay_alive.py)
+
+Tout ce qui tourne dans la boucle sans await (requête SQL synchrone, json.load
+d'un gros fichier, rafale de print) gèle le bot entier : heartbeat de la gateway,
+interactions des autres utilisateurs, tâches planifiées.
+
+- LoopMonitor : une coroutine se réveille toutes les LOOP_LAG_INTERVAL secondes
+  et mesure son retard (bot_loop_lag_seconds). Un thread de surveillance détecte
+  un réveil qui n'arrive pas : au-delà de LOOP_BLOCK_THRESHOLD secondes, il
+  capture la pile du thread de la boucle, c'est-à-dire l'appel bloquant en cours
+- InstrumentedCommandTree : durée de chaque commande slash (bot_command_duration_seconds)
+- instrument_scheduler : durée de chaque tâche APScheduler (bot_job_duration_seconds)
+
+Usage:
+    bot = commands.Bot(..., tree_cls=InstrumentedCommandTree)
+    get_loop_monitor().start()  # dans on_ready
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+from discord import app_commands
+from metrics import Counter, Gauge, Histogram
+
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', 0.25))      # Secondes entre deux mesures
+LOOP_BLOCK_THRESHOLD = float(os.getenv('LOOP_BLOCK_THRESHOLD', 0.1))  # Blocage signalé au-delà (secondes)
+STACK_DEPTH = 12          # Frames gardées (les plus proches de l'appel bloquant)
+RECENT_STALLS = 20        # Blocages gardés pour /metrics/stalls
+
+LOOP_LAG = Histogram(
+    'bot_loop_lag_seconds', "Retard de réveil de la boucle asyncio",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_STALLS = Counter('bot_loop_stalls', "Blocages de la boucle asyncio au-delà du seuil")
+LAST_STALL = Gauge('bot_loop_last_stall_seconds', "Durée du dernier blocage de la boucle")
+COMMAND_DURATION = Histogram(
+    'bot_command_duration_seconds', "Durée des commandes slash", labelnames=('command', 'status')
+)
+JOB_DURATION = Histogram(
+    'bot_job_duration_seconds', "Durée des tâches planifiées", labelnames=('scheduler', 'job', 'status')
+)
+
+
+class LoopMonitor:
+    """Mesure le retard de la boucle et capture la pile des appels bloquants"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=RECENT_STALLS)  # [{'at', 'duration', 'stack'}]
+        self._loop_thread_id = None
+        self._last_beat = None
+        self._pending_stack = None  # Pile capturée pendant le blocage en cours
+        self._task = None
+
+    def start(self):
+        """Démarre la mesure (à appeler depuis la boucle, ex: on_ready)"""
+        if self._task and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        threading.Thread(target=self._watch, name='loop-monitor', daemon=True).start()
+        print(f"✅ Surveillance de la boucle démarrée (seuil {self.threshold * 1000:.0f} ms)")
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_beat = time.monotonic()
+            LOOP_LAG.observe(lag)
+            if lag > self.threshold:
+                self._record_stall(lag)
+
+    def _record_stall(self, duration: float):
+        stack, self._pending_stack = self._pending_stack, None
+        self.stalls.append({'at': datetime.now().isoformat(timespec='seconds'),
+                            'duration': round(duration, 3), 'stack': stack})
+        LOOP_STALLS.inc()
+        LAST_STALL.set(duration)
+        print(f"⚠️ Boucle bloquée {duration * 1000:.0f} ms")
+        if stack:
+            print(stack, end='')
+
+    def _watch(self):
+        """Thread de surveillance : capture la pile tant que la boucle ne se réveille pas"""
+        captured_beat = None
+        while self._task and not self._task.done():
+            time.sleep(self.threshold / 2)
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked <= self.threshold or captured_beat == beat:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._pending_stack = ''.join(traceback.format_stack(frame)[-STACK_DEPTH:])
+                captured_beat = beat
+
+
+_monitor = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor()
+    return _monitor
+
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """CommandTree qui mesure la durée de chaque commande slash"""
+
+    async def _call(self, interaction):
+        start = time.perf_counter()
+        try:
+            await super()._call(interaction)
+        finally:
+            command = interaction.command.qualified_name if interaction.command else 'inconnue'
+            status = 'error' if interaction.command_failed else 'ok'
+            COMMAND_DURATION.observe(time.perf_counter() - start, command=command, status=status)
+
+
+def instrument_scheduler(scheduler, name: str):
+    """
+    Mesure la durée des tâches d'un scheduler APScheduler
+
+    Le label job est le préfixe de l'id (review_<user>_<question> → review) pour
+    ne pas créer une série par utilisateur.
+    """
+    started = {}  # {(job_id, scheduled_run_time): début}
+
+    def listener(event):
+        if event.code == EVENT_JOB_SUBMITTED:
+            for run_time in event.scheduled_run_times:
+                started[(event.job_id, run_time)] = time.perf_counter()
+            return
+
+        start = started.pop((event.job_id, event.scheduled_run_time), None)
+        if start is not None:
+            JOB_DURATION.observe(
+                time.perf_counter() - start, scheduler=name,
+                job=event.job_id.split('_', 1)[0], status='error' if event.exception else 'ok'
+            )
+
+    scheduler.add_listener(listener, EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
@@ -0,0 +1,249 @@
+"""
+Migrations de schéma versionnées
+
+Remplace les scripts lancés à la main (run_migration.py, add_groupe_column.py,
+migration_nouveau_systeme.py, add_vote_start_time.py) et les vérifications
+information_schema faites à chaque import de bot.py.
+
+- Chaque migration a un numéro ; celles appliquées sont notées dans schema_version
+- Au démarrage, check_schema() fait une seule requête (MAX(version)) et
+  n'applique que les migrations manquantes
+- Les migrations restent idempotentes (colonne/index déjà là → rien à faire) :
+  une base créée avant ce système est simplement mise à niveau au premier démarrage
+
+Nouvelle table ou colonne dans models.py → ajouter une migration en fin de MIGRATIONS.
+
+Usage: python migrations.py [--status]
+"""
+
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import insert, inspect, select, func, text
+from db_connection import Base, engine
+from models import SchemaVersion
+import models  # noqa: F401 - enregistre toutes les tables dans Base.metadata
+
+MIGRATION_LOCK_ID = 742001  # pg_advisory_lock : un seul processus migre à la fois
+
+
+# ==================== OUTILS ====================
+
+def _columns(conn, table: str) -> set:
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table: str, column: str, ddl: str) -> bool:
+    """Ajoute une colonne si elle n'existe pas (retourne True si ajoutée)"""
+    if column in _columns(conn, table):
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    print(f"  ✅ Colonne {table}.{column} ajoutée")
+    return True
+
+
+def _is_postgres(conn) -> bool:
+    return conn.dialect.name == 'postgresql'
+
+
+# ==================== MIGRATIONS ====================
+
+def _create_tables(conn):
+    """Tables manquantes (base neuve : schéma complet de models.py)"""
+    Base.metadata.create_all(conn)
+
+
+def _vote_system(conn):
+    """Colonnes du système de vote (ancien run_migration.py)"""
+    _add_column(conn, 'utilisateurs', 'has_voted', "BOOLEAN NOT NULL DEFAULT FALSE")
+    _add_column(conn, 'utilisateurs', 'current_exam_period', "VARCHAR(50)")
+    _add_column(conn, 'utilisateurs', 'bonus_points', "FLOAT NOT NULL DEFAULT 0.0")
+    _add_column(conn, 'utilisateurs', 'bonus_level', "VARCHAR(20)")
+
+
+def _groupe_column(conn):
+    """Colonne utilisateurs.groupe (ancien add_groupe_column.py)"""
+    if _add_column(conn, 'utilisateurs', 'groupe', "VARCHAR(10) DEFAULT '1-A'"):
+        conn.execute(text("""
+            UPDATE utilisateurs
+            SET groupe = CAST(niveau_actuel AS VARCHAR(2)) || '-A'
+            WHERE groupe IS NULL OR groupe = '' OR groupe = '1-A'
+        """))
+
+
+def _groupes_sans_cohortes(conn):
+    """Nouveau système de groupes (ancien migration_nouveau_systeme.py)"""
+    if _is_postgres(conn):
+        conn.execute(text("ALTER TABLE utilisateurs ALTER COLUMN cohorte_id DROP NOT NULL"))
+    _add_column(conn, 'utilisateurs', 'is_alumni', "BOOLEAN NOT NULL DEFAULT FALSE")
+    _add_column(conn, 'utilisateurs', 'in_rattrapage', "BOOLEAN NOT NULL DEFAULT FALSE")
+    _add_column(conn, 'exam_periods', 'groupe', "VARCHAR(10)")
+    _add_column(conn, 'exam_periods', 'is_rattrapage', "BOOLEAN NOT NULL DEFAULT FALSE")
+
+
+def _vote_start_time(conn):
+    """exam_periods.vote_start_time = start_time - 24h (ancien add_vote_start_time.py)"""
+    if not _add_column(conn, 'exam_periods', 'vote_start_time', "TIMESTAMP NULL"):
+        return
+
+    periods = conn.execute(text("SELECT id, start_time FROM exam_periods WHERE vote_start_time IS NULL")).all()
+    if periods:
+        conn.execute(
+            text("UPDATE exam_periods SET vote_start_time = :vote_start_time WHERE id = :id"),
+            [{'id': period.id, 'vote_start_time': _day_before(period.start_time)} for period in periods]
+        )
+        print(f"  ✅ {len(periods)} période(s) mise(s) à jour")
+
+    if _is_postgres(conn):
+        conn.execute(text("ALTER TABLE exam_periods ALTER COLUMN vote_start_time SET NOT NULL"))
+
+
+def _day_before(start_time):
+    if isinstance(start_time, str):  # SQLite renvoie du texte en SQL brut
+        start_time = datetime.fromisoformat(start_time)
+    return start_time - timedelta(days=1)
+
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_utilisateurs_cohorte ON utilisateurs(cohorte_id)",
+    "CREATE INDEX IF NOT EXISTS idx_calendrier_cohorte ON calendrier_examens(cohorte_id)",
+    "CREATE INDEX IF NOT EXISTS idx_reviews_next ON reviews(next_review)",
+    "CREATE INDEX IF NOT EXISTS idx_reviews_user ON reviews(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_reviews_next_review_user ON reviews(next_review, user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_exam_results_user ON exam_results(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_utilisateurs_groupe_rattrapage ON utilisateurs(groupe, in_rattrapage)",
+    "CREATE INDEX IF NOT EXISTS idx_exam_periods_level_groupe_start ON exam_periods(group_number, groupe, start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_exam_results_notified ON exam_results(notified)",
+    "CREATE INDEX IF NOT EXISTS idx_notification_outbox_status_next ON notification_outbox(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_votes_voter ON votes(voter_id)",
+    "CREATE INDEX IF NOT EXISTS idx_votes_voted_for ON votes(voted_for_id)",
+    "CREATE INDEX IF NOT EXISTS idx_votes_period ON votes(exam_period_id)",
+    "CREATE INDEX IF NOT EXISTS idx_exam_periods_group ON exam_periods(group_number)",
+]
+
+
+def _indexes(conn):
+    """
+    Index des requêtes fréquentes (ancien init_db.create_indexes)
+
+    Un index qui ne peut pas être créé fait échouer la migration : elle est
+    annulée et n'est pas notée dans schema_version (réessayée au prochain démarrage)
+    """
+    for statement in INDEXES:
+        try:
+            conn.execute(text(statement))
+        except Exception as e:
+            print(f"  ❌ Index {statement.split(' ON ')[0].split()[-1]} impossible à créer : {e}")
+            raise
+
+
+def _reviews_unique(conn):
+    """
+    Contrainte unique reviews(user_id, question_id), cible de l'upsert de save_review(s)
+
+    Une base existante peut contenir plusieurs révisions pour la même question :
+    on garde la plus récente (next_review la plus tardive, puis id le plus grand)
+    avant de créer l'index. Si l'index ne peut toujours pas être créé, la
+    migration échoue (les sauvegardes de révisions échoueraient toutes sans lui).
+    """
+    result = conn.execute(text("""
+        DELETE FROM reviews
+        WHERE EXISTS (
+            SELECT 1 FROM reviews newer
+            WHERE newer.user_id = reviews.user_id
+              AND newer.question_id = reviews.question_id
+              AND (newer.next_review > reviews.next_review
+                   OR (newer.next_review = reviews.next_review AND newer.id > reviews.id))
+        )
+    """))
+    if result.rowcount:
+        print(f"  ✅ {result.rowcount} révision(s) en double supprimée(s)")
+
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_reviews_user_question ON reviews(user_id, question_id)"
+    ))
+
+
+# (version, nom, fonction) - ne jamais renuméroter ni modifier une migration publiée
+MIGRATIONS = [
+    (1, 'tables', _create_tables),
+    (2, 'systeme_de_vote', _vote_system),
+    (3, 'colonne_groupe', _groupe_column),
+    (4, 'groupes_sans_cohortes', _groupes_sans_cohortes),
+    (5, 'vote_start_time', _vote_start_time),
+    (6, 'index', _indexes),
+    (7, 'reviews_unique', _reviews_unique),  # Sortie de la 6 : l'index échouait sur les doublons
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ==================== EXÉCUTION ====================
+
+def current_version() -> int:
+    """
+    Dernière migration appliquée (0 si la table schema_version n'existe pas encore)
+
+    Toute autre erreur (base injoignable, droits) est propagée : la traiter comme
+    un schéma vide relancerait toutes les migrations.
+    """
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(SchemaVersion.__tablename__):
+            return 0
+        return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+def run_migrations() -> int:
+    """
+    Applique les migrations manquantes, chacune dans sa transaction
+
+    Returns:
+        Version du schéma après exécution
+    """
+    with engine.connect() as conn:
+        if _is_postgres(conn):
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {'id': MIGRATION_LOCK_ID})
+            conn.commit()
+        try:
+            with conn.begin():
+                SchemaVersion.__table__.create(conn, checkfirst=True)
+                version = conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+            for number, name, migrate in MIGRATIONS:
+                if number <= version:
+                    continue
+                print(f"🔧 Migration {number} : {name}...")
+                with conn.begin():
+                    migrate(conn)
+                    conn.execute(insert(SchemaVersion), {'version': number, 'name': name, 'applied_at': datetime.now()})
+                version = number
+                print(f"✅ Migration {number} appliquée")
+
+            return version
+        finally:
+            if _is_postgres(conn):
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': MIGRATION_LOCK_ID})
+                conn.commit()
+
+
+def check_schema() -> int:
+    """
+    Vérification au démarrage : une seule requête si le schéma est à jour
+
+    Returns:
+        Version du schéma
+    """
+    version = current_version()
+    if version >= LATEST_VERSION:
+        return version
+
+    print(f"📦 Schéma en version {version}, migration vers la version {LATEST_VERSION}...")
+    return run_migrations()
+
+
+if __name__ == "__main__":
+    if '--status' in sys.argv:
+        version = current_version()
+        print(f"📦 Schéma en version {version} / {LATEST_VERSION}")
+        for number, name, _ in MIGRATIONS:
+            print(f"  {'✅' if number <= version else '⏳'} {number} {name}")
+    else:
+        print(f"✅ Schéma en version {run_migrations()}")
@@ -2,7 +2,7 @@
 Modèles SQLAlchemy pour la base de données
 Utilisé par le Bot Discord et le Site Web
 """
-from sqlalchemy import Column, Integer, String, BigInteger, Float, Boolean, DateTime, ForeignKey, JSON, CheckConstraint, Text
+from sqlalchemy import Column, Integer, String, BigInteger, Float, Boolean, DateTime, ForeignKey, JSON, CheckConstraint, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db_connection import Base
@@ -61,6 +61,7 @@ class Utilisateur(Base):
     # Contraintes
     __table_args__ = (
         CheckConstraint("niveau_actuel BETWEEN 1 AND 5", name='chk_niveau'),
+        Index('idx_utilisateurs_groupe_rattrapage', 'groupe', 'in_rattrapage'),  # Occupation des groupes
     )
     
     def __repr__(self):
@@ -123,6 +124,8 @@ class Review(Base):
     # Index pour optimiser les requêtes
     __table_args__ = (
         CheckConstraint("user_id >= 0", name='chk_user_id_review'),
+        Index('idx_reviews_next_review_user', 'next_review', 'user_id'),  # File des révisions dues
+        UniqueConstraint('user_id', 'question_id', name='uq_reviews_user_question'),  # Cible de l'upsert
     )
     
     def __repr__(self):
@@ -196,6 +199,10 @@ class ExamPeriod(Base):
     bonuses_applied = Column(Boolean, nullable=False, default=False)
     is_rattrapage = Column(Boolean, nullable=False, default=False)  # Si c'est un examen de rattrapage
 
+    __table_args__ = (
+        Index('idx_exam_periods_level_groupe_start', 'group_number', 'groupe', 'start_time'),  # Prochain examen par groupe
+    )
+
     def __repr__(self):
         return f"<ExamPeriod {self.id} - Group {self.group_number}>"
 
@@ -232,3 +239,98 @@ class RattrapageExam(Base):
 
     def __repr__(self):
         return f"<RattrapageExam {self.user_id} - Niveau {self.niveau} - {self.date_exam_rattrapage}>"
+
+
+class NotificationOutbox(Base):
+    """Table des MP à envoyer (survivent à un redémarrage du bot)"""
+    __tablename__ = 'notification_outbox'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)  # Destinataire Discord
+    kind = Column(String(30), nullable=False)  # 'bonus', 'promotion', 'exam_failure'...
+    payload = Column(JSON, nullable=False)  # {'content': ..., 'embed': embed.to_dict()}
+    status = Column(String(10), nullable=False, default='pending')  # 'pending', 'sent', 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(String(200), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_notification_outbox_status_next', 'status', 'next_attempt_at'),  # MP en attente
+    )
+
+    def __repr__(self):
+        return f"<NotificationOutbox {self.id} - {self.kind} → {self.user_id} ({self.status})>"
+
+
+class RoleReconciliation(Base):
+    """Dernier groupe appliqué sur Discord pour chaque utilisateur (/actualiser_exams)"""
+    __tablename__ = 'role_reconciliations'
+
+    user_id = Column(BigInteger, ForeignKey('utilisateurs.user_id', ondelete='CASCADE'), primary_key=True)
+    groupe = Column(String(30), nullable=False)  # Groupe dont le rôle a été vérifié/appliqué
+    reconciled_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<RoleReconciliation {self.user_id} - {self.groupe}>"
+
+
+class GroupChangeEvent(Base):
+    """Changements de groupe écrits par le site (même transaction), appliqués sur Discord par le bot"""
+    __tablename__ = 'group_change_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Ordre de lecture (high-water mark)
+    user_id = Column(BigInteger, nullable=False)
+    old_groupe = Column(String(30), nullable=True)
+    new_groupe = Column(String(30), nullable=True)
+    reason = Column(String(30), nullable=False)  # 'promotion', 'rattrapage', 'assign_group', 'waiting_list'...
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<GroupChangeEvent {self.id} - {self.user_id}: {self.old_groupe} → {self.new_groupe}>"
+
+
+class EventCursor(Base):
+    """Dernier événement traité par chaque consommateur"""
+    __tablename__ = 'event_cursors'
+
+    consumer = Column(String(50), primary_key=True)  # Ex: 'bot_group_changes'
+    last_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<EventCursor {self.consumer} - {self.last_event_id}>"
+
+
+class CoursePost(Base):
+    """Cours déjà publiés dans les salons 📖-ressources (évite de relire l'historique au démarrage)"""
+    __tablename__ = 'course_posts'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    guild_id = Column(BigInteger, nullable=False)
+    channel_id = Column(BigInteger, nullable=False)
+    course_id = Column(Integer, nullable=False)
+    message_id = Column(BigInteger, nullable=False)  # Message du bot (modifié si le cours change)
+    content_hash = Column(String(64), nullable=False)  # sha256 de l'embed publié
+    posted_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint('channel_id', 'course_id', name='uq_course_posts_channel_course'),
+        Index('idx_course_posts_guild', 'guild_id'),
+    )
+
+    def __repr__(self):
+        return f"<CoursePost cours {self.course_id} → salon {self.channel_id} ({self.message_id})>"
+
+
+class SchemaVersion(Base):
+    """Migrations de schéma appliquées (voir migrations.py)"""
+    __tablename__ = 'schema_version'
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<SchemaVersion {self.version} - {self.name}>"
@@ -0,0 +1,308 @@
+"""
+Envoi des MP de notification (bonus, promotions, résultats d'examen)
+
+- Chaque MP est d'abord écrit dans la table notification_outbox (dans la même
+  transaction que la décision qui le déclenche) : un crash du bot ne perd rien,
+  les MP en attente sont renvoyés au démarrage (livraison « au moins une fois »)
+- Envois en parallèle, bornés par un asyncio.Semaphore
+- Un seau à jetons par route Discord (ouverture du salon MP, messages d'un salon)
+  en plus du débit global, pour rester sous les limites au lieu de subir des 429
+- 429 : attente du retry_after donné par Discord ; autres erreurs temporaires :
+  nouvel essai avec backoff exponentiel et jitter
+"""
+
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+import aiohttp
+import discord
+from sqlalchemy import select, update
+from db_connection import SessionLocal
+from models import NotificationOutbox
+from rate_limiter import TokenBucket
+from db_executor import run_db
+
+DISPATCH_CONCURRENCY = int(os.getenv('NOTIFY_CONCURRENCY', 8))
+MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', 8))      # Au total, avant abandon ('failed')
+TRIES_PER_PASS = 3                                              # Essais par passage de dispatch
+RETRY_INTERVAL = int(os.getenv('NOTIFY_RETRY_INTERVAL', 60))    # Secondes entre deux passages
+BACKOFF_BASE = 1.0   # secondes
+BACKOFF_MAX = 60.0
+
+# Débit global du bot (Discord : 50 requêtes/s) et limites par route
+GLOBAL_RATE = float(os.getenv('DISCORD_GLOBAL_RATE', 40))
+# {route: (jetons par seconde, rafale)}
+ROUTE_LIMITS = {
+    'create_dm': (float(os.getenv('DISCORD_CREATE_DM_RATE', 10)), 10),    # POST /users/@me/channels
+    'fetch_user': (float(os.getenv('DISCORD_FETCH_USER_RATE', 10)), 10),  # GET /users/{id}
+    'channel': (1, 5),  # POST /channels/{id}/messages (5 messages / 5 s par salon)
+}
+
+
+class PermanentFailure(Exception):
+    """Erreur définitive : inutile de réessayer (MP bloqués, utilisateur introuvable)"""
+
+
+class NotificationDispatcher:
+    """File d'envoi des MP avec outbox persistante"""
+
+    def __init__(self, bot, concurrency: int = DISPATCH_CONCURRENCY, max_attempts: int = MAX_ATTEMPTS):
+        self.bot = bot
+        self.max_attempts = max_attempts
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._global = TokenBucket(GLOBAL_RATE, int(GLOBAL_RATE))
+        self._routes = {}  # {route: TokenBucket}
+        self._dispatch_lock = asyncio.Lock()
+        self._runner = None
+
+    # ==================== OUTBOX ====================
+
+    @staticmethod
+    def enqueue(user_id: int, kind: str, embed: discord.Embed = None, content: str = None, db=None) -> NotificationOutbox:
+        """
+        Ajoute un MP à l'outbox
+
+        Args:
+            db: Session de l'appelant : le MP est ajouté à sa transaction (commit par l'appelant).
+                Sans session, le MP est enregistré immédiatement.
+        """
+        notification = NotificationOutbox(
+            user_id=user_id,
+            kind=kind,
+            payload={'content': content, 'embed': embed.to_dict() if embed else None}
+        )
+
+        if db is not None:
+            db.add(notification)
+            return notification
+
+        db = SessionLocal()
+        try:
+            db.add(notification)
+            db.commit()
+            db.refresh(notification)
+            db.expunge(notification)
+            return notification
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Erreur enregistrement notification {kind} pour {user_id}: {e}")
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def enqueue_many(notifications: list) -> list:
+        """
+        Ajoute plusieurs MP à l'outbox en une transaction (à appeler via run_db)
+
+        Args:
+            notifications: [(user_id, kind, embed)]
+
+        Returns:
+            Les id des MP ajoutés
+        """
+        if not notifications:
+            return []
+
+        db = SessionLocal()
+        try:
+            outbox = [
+                NotificationDispatcher.enqueue(user_id, kind, embed=embed, db=db)
+                for user_id, kind, embed in notifications
+            ]
+            db.flush()
+            ids = [notification.id for notification in outbox]
+            db.commit()
+            return ids
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Erreur enregistrement de {len(notifications)} notification(s): {e}")
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _load_due(ids=None) -> list:
+        """MP en attente dont l'heure d'essai est passée (ou parmi `ids`)"""
+        db = SessionLocal()
+        try:
+            query = select(
+                NotificationOutbox.id, NotificationOutbox.user_id, NotificationOutbox.kind,
+                NotificationOutbox.payload, NotificationOutbox.attempts
+            ).where(NotificationOutbox.status == 'pending')
+
+            if ids is not None:
+                query = query.where(NotificationOutbox.id.in_(ids))
+            else:
+                query = query.where(NotificationOutbox.next_attempt_at <= datetime.now())
+
+            return db.execute(query.order_by(NotificationOutbox.id)).all()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _save_outcomes(outcomes: list):
+        """Enregistre le résultat des envois en un UPDATE groupé"""
+        if not outcomes:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(update(NotificationOutbox), outcomes)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Erreur mise à jour de l'outbox: {e}")
+        finally:
+            db.close()
+
+    # ==================== ENVOI ====================
+
+    async def dispatch(self, ids: list = None) -> dict:
+        """
+        Envoie les MP en attente (tous ceux qui sont dus, ou seulement `ids`)
+
+        Returns:
+            dict {'sent': n, 'failed': n, 'retry': n}
+        """
+        async with self._dispatch_lock:
+            notifications = await run_db(self._load_due, ids)
+            if not notifications:
+                return {'sent': 0, 'failed': 0, 'retry': 0}
+
+            outcomes = await asyncio.gather(*(self._deliver(n) for n in notifications))
+            await run_db(self._save_outcomes, outcomes)
+
+            counts = {'sent': 0, 'failed': 0, 'retry': 0}
+            for outcome in outcomes:
+                counts['retry' if outcome['status'] == 'pending' else outcome['status']] += 1
+
+            print(f"📧 Notifications : {counts['sent']} envoyée(s), {counts['failed']} en échec, "
+                  f"{counts['retry']} à réessayer")
+            return counts
+
+    def start(self, interval: int = RETRY_INTERVAL):
+        """Lance le passage périodique sur l'outbox (MP restés en attente, reprise après crash)"""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run(interval))
+
+    async def _run(self, interval: int):
+        while True:
+            try:
+                await self.dispatch()
+            except Exception as e:
+                print(f"❌ Erreur envoi des notifications en attente: {e}")
+            await asyncio.sleep(interval)
+
+    async def _deliver(self, notification) -> dict:
+        """Envoie un MP avec nouveaux essais, retourne la mise à jour de sa ligne d'outbox"""
+        attempts = notification.attempts
+        error = None
+
+        async with self._semaphore:
+            tries = 0
+            while tries < TRIES_PER_PASS and attempts < self.max_attempts:
+                tries += 1
+                attempts += 1
+                try:
+                    await self._send(notification.user_id, notification.payload)
+                    return {'id': notification.id, 'status': 'sent', 'attempts': attempts,
+                            'sent_at': datetime.now(), 'last_error': None}
+
+                except PermanentFailure as e:
+                    print(f"  ⚠️ MP {notification.kind} non envoyé à {notification.user_id}: {e}")
+                    return {'id': notification.id, 'status': 'failed', 'attempts': attempts,
+                            'last_error': str(e)[:200]}
+
+                except discord.HTTPException as e:
+                    error = e
+                    retry_after = self._retry_after(e)
+                    if retry_after is None and e.status < 500:
+                        # 4xx autre que 429 : la requête elle-même est invalide
+                        return {'id': notification.id, 'status': 'failed', 'attempts': attempts,
+                                'last_error': f"{e.status}: {e.text}"[:200]}
+                    delay = retry_after if retry_after is not None else self._backoff(attempts)
+
+                except (discord.RateLimited, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+                    delay = getattr(e, 'retry_after', None) or self._backoff(attempts)
+
+                if tries < TRIES_PER_PASS and attempts < self.max_attempts:
+                    await asyncio.sleep(delay + random.uniform(0, BACKOFF_BASE))
+
+        print(f"  ❌ MP {notification.kind} pour {notification.user_id} après {attempts} essai(s): {error}")
+        if attempts >= self.max_attempts:
+            return {'id': notification.id, 'status': 'failed', 'attempts': attempts,
+                    'last_error': str(error)[:200]}
+
+        # Toujours en erreur : on réessaiera au prochain passage (ou au redémarrage)
+        return {'id': notification.id, 'status': 'pending', 'attempts': attempts,
+                'next_attempt_at': datetime.now() + timedelta(seconds=BACKOFF_MAX),
+                'last_error': str(error)[:200]}
+
+    async def _send(self, user_id: int, payload: dict):
+        """Ouvre le salon MP si besoin et envoie le message, en respectant les limites de chaque route"""
+        user = self.bot.get_user(user_id)
+        if user is None:
+            await self._acquire('fetch_user')
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                raise PermanentFailure("utilisateur introuvable")
+
+        channel = user.dm_channel
+        if channel is None:
+            await self._acquire('create_dm')
+            channel = await user.create_dm()
+
+        embed = discord.Embed.from_dict(payload['embed']) if payload.get('embed') else None
+
+        await self._acquire('channel', channel.id)
+        try:
+            await channel.send(content=payload.get('content'), embed=embed)
+        except discord.Forbidden:
+            raise PermanentFailure("MP bloqués")
+
+    def slot(self):
+        """Place parmi les appels Discord simultanés (async with), partagée avec les envois de MP"""
+        return self._semaphore
+
+    async def acquire_global(self):
+        """Jeton du débit global, pour les appels Discord hors MP (rôles)"""
+        await self._global.acquire()
+
+    async def _acquire(self, route: str, key=None):
+        """Prend un jeton global et un jeton de la route (ex: messages d'un salon précis)"""
+        bucket_key = (route, key)
+        bucket = self._routes.get(bucket_key)
+        if bucket is None:
+            rate, burst = ROUTE_LIMITS[route]
+            bucket = self._routes[bucket_key] = TokenBucket(rate, burst)
+        await bucket.acquire()
+        await self._global.acquire()
+
+    @staticmethod
+    def _retry_after(error: discord.HTTPException):
+        """Délai imposé par Discord pour un 429 (None pour les autres erreurs)"""
+        if error.status != 429:
+            return None
+        try:
+            return float(error.response.headers.get('Retry-After', BACKOFF_BASE))
+        except (AttributeError, TypeError, ValueError):
+            return BACKOFF_BASE
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        """Backoff exponentiel plafonné"""
+        return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+_dispatcher = None
+
+
+def get_dispatcher(bot) -> NotificationDispatcher:
+    """Retourne le dispatcher partagé (seaux à jetons communs à tous les envois)"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher(bot)
+    return _dispatcher
@@ -14,6 +14,8 @@ from db_connection import SessionLocal
 from models import Utilisateur, Cohorte
 from group_manager import GroupManager
 from cohort_config import TEMPS_FORMATION_MINIMUM
+from guild_index import get_guild_index
+from db_executor import run_db
 import os
 
 
@@ -36,7 +38,7 @@ class OnboardingManager:
             group_manager = GroupManager(db)
 
             # Tenter l'inscription
-            groupe, info = group_manager.register_user(member.id, member.name, niveau=1)
+            groupe, info = await run_db(group_manager.register_user, member.id, member.name, niveau=1)
 
             if info['status'] == 'direct':
                 # Inscription directe réussie
@@ -142,7 +144,8 @@ class OnboardingManager:
 
         if accepted:
             # Confirmer l'inscription
-            groupe = group_manager.confirm_registration_with_insufficient_time(
+            groupe = await run_db(
+                group_manager.confirm_registration_with_insufficient_time,
                 user_id,
                 membre.name,
                 info['niveau'],
@@ -154,7 +157,7 @@ class OnboardingManager:
 
         else:
             # Chercher un autre groupe ou waiting list
-            groupe, new_info = group_manager.register_user(user_id, membre.name, niveau=info['niveau'])
+            groupe, new_info = await run_db(group_manager.register_user, user_id, membre.name, niveau=info['niveau'])
 
             if new_info['status'] == 'direct':
                 await self._complete_onboarding(membre, groupe, guild)
@@ -208,7 +211,7 @@ class OnboardingManager:
         
         for letter in letters:
             groupe_name = f"{niveau}-{letter}"
-            role = discord.utils.get(guild.roles, name=f"Groupe {groupe_name}")
+            role = get_guild_index(guild).role(f"Groupe {groupe_name}")
             
             if role is None:
                 # Rôle n'existe pas encore, ce groupe est disponible
@@ -236,7 +239,7 @@ class OnboardingManager:
             discord.Role: Le rôle créé ou existant
         """
         role_name = f"Groupe {groupe}"
-        role = discord.utils.get(guild.roles, name=role_name)
+        role = get_guild_index(guild).role(role_name)
         
         if role is None:
             # Créer le rôle avec une couleur différente par niveau
@@ -258,6 +261,7 @@ class OnboardingManager:
                 hoist=True,  # Afficher séparément à gauche sur Discord
                 reason=f"Création automatique du groupe {groupe}"
             )
+            get_guild_index(guild).role_created(role)
             print(f"✅ Rôle '{role_name}' créé")
         
         return role
@@ -272,7 +276,7 @@ class OnboardingManager:
         category_name = f"GROUPE {groupe.upper()}"
         
         # Vérifier si la catégorie existe déjà
-        category = discord.utils.get(guild.categories, name=category_name)
+        category = get_guild_index(guild).category(category_name)
         
         if category is None:
             # Créer la catégorie avec permissions
@@ -287,6 +291,7 @@ class OnboardingManager:
                 overwrites=overwrites,
                 reason=f"Création automatique de la catégorie {groupe}"
             )
+            get_guild_index(guild).channel_created(category)
             print(f"✅ Catégorie '{category_name}' créée")
             
             # 1. Salon Ressources (lecture seule pour les membres)
@@ -0,0 +1,216 @@
+"""
+File d'attente des questions de révision par utilisateur (remplace les relectures de pending_questions.json)
+
+- {user_key: deque de questions} en mémoire : la première est la question courante
+- Journal append-only avec fsync → chaque opération survit à un crash
+- Compaction : snapshot atomique au format de l'ancien pending_questions.json, puis journal vidé
+
+Un ancien pending_questions.json est donc importé tel quel au premier démarrage.
+Chaque ligne du journal est une opération numérotée : [seq, "add", user_key, [questions]]
+ou [seq, "done", user_key]. Le snapshot garde le dernier seq inclus (clé "_seq") pour
+qu'un crash pendant la compaction ne rejoue pas deux fois la même opération.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+
+
+class PendingQuestionStore:
+    """Files de questions en attente, une par utilisateur, avec journal d'écriture"""
+
+    def __init__(self, snapshot_path: str, journal_path: str = None, compact_every: int = 1000, fsync: bool = True):
+        """
+        Args:
+            snapshot_path: Fichier snapshot (ex: pending_questions.json)
+            journal_path: Fichier journal (défaut: snapshot_path + '.wal')
+            compact_every: Nombre minimum d'opérations journalisées avant compaction
+            fsync: Forcer l'écriture physique de chaque opération
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{snapshot_path}.wal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+
+        self._queues = {}  # {user_key: deque([question_data, ...])}
+        self._ids = {}     # {user_key: {question_id}} pour ignorer les doublons en O(1)
+        self._count = 0
+        self._seq = 0
+        self._journal = None
+        self._journal_entries = 0
+        self._lock = threading.RLock()
+
+        self._load()
+
+    # ==================== CHARGEMENT ====================
+
+    def _load(self):
+        """Charge le snapshot puis rejoue le journal"""
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                pending = json.load(f)
+            self._seq = pending.pop('_seq', 0)
+            for user_key, user_pending in pending.items():
+                if not user_pending:
+                    continue
+                questions = [user_pending['current']] if user_pending.get('current') else []
+                self._add(user_key, questions + user_pending.get('queue', []))
+
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Dernière opération incomplète (crash pendant l'écriture) → ignorée
+                        break
+                    if entry[0] <= self._seq:
+                        continue  # Déjà incluse dans le snapshot
+                    self._apply(entry[1:])
+                    self._seq = entry[0]
+                    replayed += 1
+
+        if replayed:
+            # Repartir d'un journal vide
+            self.compact()
+
+    def _apply(self, entry):
+        """Applique une opération du journal"""
+        if entry[0] == 'add':
+            self._add(entry[1], entry[2])
+        elif entry[0] == 'done':
+            self._complete(entry[1])
+
+    def _add(self, user_key, questions):
+        """Ajoute des questions en fin de file (doublons ignorés), retourne celles ajoutées"""
+        queue = self._queues.setdefault(user_key, deque())
+        ids = self._ids.setdefault(user_key, set())
+        added = []
+        for question in questions:
+            if question['id'] in ids:
+                continue
+            ids.add(question['id'])
+            queue.append(question)
+            added.append(question)
+        self._count += len(added)
+
+        if not queue:
+            del self._queues[user_key]
+            del self._ids[user_key]
+        return added
+
+    def _complete(self, user_key):
+        """Retire la question courante, retourne la suivante ou None"""
+        queue = self._queues.get(user_key)
+        if not queue:
+            return None
+
+        done = queue.popleft()
+        self._ids[user_key].discard(done['id'])
+        self._count -= 1
+
+        if not queue:
+            del self._queues[user_key]
+            del self._ids[user_key]
+            return None
+        return queue[0]
+
+    # ==================== LECTURE ====================
+
+    def current(self, user_id):
+        """Question courante de l'utilisateur ou None"""
+        queue = self._queues.get(str(user_id))
+        return queue[0] if queue else None
+
+    def waiting(self, user_id) -> int:
+        """Nombre de questions en file derrière la question courante"""
+        queue = self._queues.get(str(user_id))
+        return len(queue) - 1 if queue else 0
+
+    def __len__(self):
+        return self._count
+
+    # ==================== ÉCRITURE ====================
+
+    def add(self, user_id, questions) -> bool:
+        """
+        Ajoute des questions à la file de l'utilisateur
+
+        Returns:
+            bool: True si la première question ajoutée devient la question courante
+        """
+        user_key = str(user_id)
+        with self._lock:
+            was_empty = not self._queues.get(user_key)
+            added = self._add(user_key, questions)
+            if not added:
+                return False
+
+            self._append(['add', user_key, added])
+            return was_empty
+
+    def complete(self, user_id):
+        """Marque la question courante comme répondue et retourne la suivante (ou None)"""
+        user_key = str(user_id)
+        with self._lock:
+            if not self._queues.get(user_key):
+                return None
+            next_question = self._complete(user_key)
+            self._append(['done', user_key])
+            return next_question
+
+    def _append(self, entry):
+        """Ajoute une opération au journal (compaction amortie)"""
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+        self._seq += 1
+        self._journal.write(json.dumps([self._seq] + entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+        self._journal_entries += 1
+        if self._journal_entries >= max(self.compact_every, self._count):
+            self.compact()
+
+    # ==================== COMPACTION ====================
+
+    def compact(self):
+        """Écrit un snapshot atomique (format pending_questions.json) puis vide le journal"""
+        with self._lock:
+            pending = {
+                user_key: {'current': queue[0], 'queue': list(queue)[1:]}
+                for user_key, queue in self._queues.items()
+            }
+            pending['_seq'] = self._seq
+
+            directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.pending-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(pending, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            if self._journal is not None:
+                self._journal.close()
+            self._journal = open(self.journal_path, 'w', encoding='utf-8')
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._journal_entries = 0
+
+    def close(self):
+        """Ferme le journal"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
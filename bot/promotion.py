@@ -11,9 +11,14 @@ Gère :
 import discord
 from discord import PermissionOverwrite
 from datetime import datetime
+from sqlalchemy import select, update
 from db_connection import SessionLocal
 from models import Utilisateur, ExamResult
 from onboarding import OnboardingManager
+from notification_dispatcher import NotificationDispatcher, get_dispatcher
+from guild_index import get_guild_index
+from db_executor import run_db
+from web_sync import invalidate_web_cache
 
 
 class PromotionManager:
@@ -22,6 +27,7 @@ class PromotionManager:
     def __init__(self, bot):
         self.bot = bot
         self.onboarding = OnboardingManager(bot)
+        self.dispatcher = get_dispatcher(bot)
     
     async def check_and_notify_results(self, guild: discord.Guild):
         """
@@ -29,132 +35,203 @@ class PromotionManager:
         et effectue les promotions/notifications nécessaires
         
         Appelé par la commande /check_exam_results (admin)
+
+        Lecture et écriture en base dans des unités de travail (run_db) qui ouvrent et
+        ferment leur session : la boucle ne manipule que des valeurs simples.
         """
-        db = SessionLocal()
         try:
-            # Récupérer tous les résultats non notifiés
-            results = db.query(ExamResult).filter(
-                ExamResult.notified == False
-            ).all()
+            # Récupérer tous les résultats non notifiés, avec leur utilisateur (une requête)
+            results = await run_db(self._load_pending_results)
             
             if not results:
                 return "✅ Aucun nouveau résultat à notifier."
             
             notifications_sent = 0
             promotions_done = 0
+            notified_ids = []  # Résultats à marquer notifiés
+            promotions = []    # Mises à jour des utilisateurs promus
+            outbox = []        # [(user_id, kind, embed)] ajoutés à l'outbox, envoyés après le commit
             
             for result in results:
                 try:
                     # Récupérer l'utilisateur Discord
-                    member = guild.get_member(result.user_id)
+                    member = guild.get_member(result['user_id'])
                     
                     if member is None:
                         # Utilisateur n'est plus sur le serveur
-                        result.notified = True
+                        notified_ids.append(result['id'])
                         continue
                     
-                    # Récupérer les infos utilisateur de la DB
-                    user_db = db.query(Utilisateur).filter(
-                        Utilisateur.user_id == result.user_id
-                    ).first()
-                    
-                    if user_db is None:
-                        result.notified = True
+                    if result['user'] is None:
+                        notified_ids.append(result['id'])
                         continue
                     
-                    if result.passed:
+                    if result['passed']:
                         # ✅ RÉUSSITE - Promotion
-                        await self._promote_user(member, user_db, result, db, guild)
+                        promotion, embed = await self._promote_user(member, result, guild)
+                        promotions.append(promotion)
+                        outbox.append((member.id, 'promotion', embed))
                         promotions_done += 1
                     else:
                         # ❌ ÉCHEC - Reste dans le même groupe
-                        await self._notify_failure(member, user_db, result)
+                        outbox.append((member.id, 'exam_failure', self._failure_embed(member, result)))
                     
                     # Marquer comme notifié
-                    result.notified = True
+                    notified_ids.append(result['id'])
                     notifications_sent += 1
                     
                 except Exception as e:
-                    print(f"❌ Erreur traitement résultat {result.id}: {e}")
+                    print(f"❌ Erreur traitement résultat {result['id']}: {e}")
                     continue
             
-            db.commit()
-            
+            # Promotions, résultats marqués notifiés et MP dans l'outbox : même transaction
+            # (un crash avant ce commit ne laisse aucun utilisateur promu sans résultat notifié)
+            notification_ids = await run_db(
+                self._save_results, notified_ids, promotions,
+                [notification for notification in outbox if notification[2] is not None]
+            )
+            if promotions:
+                await invalidate_web_cache(user_ids=[promotion['user_id'] for promotion in promotions])
+
+            # Envoi des MP en parallèle (limités par route Discord, renvoyés plus tard en cas d'erreur)
+            await self.dispatcher.dispatch(notification_ids)
+
             return (f"✅ **Résultats traités**\n"
                    f"📧 Notifications envoyées : {notifications_sent}\n"
                    f"🎉 Promotions effectuées : {promotions_done}")
             
         except Exception as e:
-            db.rollback()
             print(f"❌ Erreur check_and_notify_results: {e}")
             return f"❌ Erreur lors de la vérification : {e}"
+
+    @staticmethod
+    def _load_pending_results() -> list:
+        """
+        Résultats non notifiés avec leur utilisateur, en dicts (à appeler via run_db)
+
+        Returns:
+            [{'id', 'user_id', 'passed', 'percentage', 'score', 'total', 'passing_score', 'date',
+              'user': {'niveau_actuel', 'groupe', 'examens_reussis'} ou None}]
+        """
+        db = SessionLocal()
+        try:
+            rows = db.execute(select(
+                ExamResult.id, ExamResult.user_id, ExamResult.passed, ExamResult.percentage,
+                ExamResult.score, ExamResult.total, ExamResult.passing_score, ExamResult.date,
+                Utilisateur.user_id.label('registered'), Utilisateur.niveau_actuel,
+                Utilisateur.groupe, Utilisateur.examens_reussis
+            ).outerjoin(
+                Utilisateur, Utilisateur.user_id == ExamResult.user_id
+            ).where(
+                ExamResult.notified == False
+            )).all()
+        finally:
+            db.close()
+
+        return [{
+            'id': row.id, 'user_id': row.user_id, 'passed': row.passed, 'percentage': row.percentage,
+            'score': row.score, 'total': row.total, 'passing_score': row.passing_score, 'date': row.date,
+            'user': None if row.registered is None else {
+                'niveau_actuel': row.niveau_actuel, 'groupe': row.groupe, 'examens_reussis': row.examens_reussis
+            }
+        } for row in rows]
+
+    @staticmethod
+    def _save_results(notified_ids: list, promotions: list, outbox: list) -> list:
+        """
+        Promotions, résultats notifiés et MP de l'outbox en une transaction (à appeler via run_db)
+
+        Args:
+            notified_ids: id des ExamResult à marquer notifiés
+            promotions: [{'user_id', 'niveau_actuel', 'groupe', 'examens_reussis'}]
+            outbox: [(user_id, kind, embed)]
+
+        Returns:
+            Les id des MP ajoutés
+        """
+        db = SessionLocal()
+        try:
+            if promotions:
+                db.execute(update(Utilisateur), promotions)
+            if notified_ids:
+                db.execute(update(ExamResult).where(ExamResult.id.in_(notified_ids)).values(notified=True))
+            notifications = [
+                NotificationDispatcher.enqueue(user_id, kind, embed=embed, db=db) for user_id, kind, embed in outbox
+            ]
+            db.flush()
+            notification_ids = [notification.id for notification in notifications]
+            db.commit()
+            return notification_ids
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
     
-    async def _promote_user(
-        self, 
-        member: discord.Member, 
-        user_db: Utilisateur, 
-        result: ExamResult,
-        db,
-        guild: discord.Guild
-    ):
+    async def _promote_user(self, member: discord.Member, result: dict, guild: discord.Guild):
         """
         Promeut un utilisateur au niveau supérieur
-        1. Change niveau_actuel en DB
+        1. Calcule le nouveau niveau et groupe
         2. Retire ancien rôle Discord
         3. Attribue nouveau rôle
         4. Crée salons si nécessaire
-        5. Envoie notification de félicitations
+        5. Prépare la mise à jour en base et la notification de félicitations
+
+        Rien n'est écrit ici : la promotion est enregistrée par l'appelant (_save_results),
+        dans la transaction qui marque le résultat notifié.
+
+        Returns:
+            Tuple(mise à jour de l'utilisateur pour _save_results, embed de félicitations ou None)
         """
         try:
             # 1. Calculer le nouveau niveau
-            old_niveau = user_db.niveau_actuel
+            user = result['user']
+            old_niveau = user['niveau_actuel']
             new_niveau = old_niveau + 1
-            old_groupe = user_db.groupe
+            old_groupe = user['groupe']
             
             # Trouver un groupe disponible au nouveau niveau
             new_groupe = await self.onboarding._get_available_group(guild, new_niveau)
             
-            # 2. Mettre à jour la base de données
-            user_db.niveau_actuel = new_niveau
-            user_db.groupe = new_groupe
-            user_db.examens_reussis += 1
-            db.commit()
-            
-            # 3. Retirer l'ancien rôle Discord
-            old_role = discord.utils.get(guild.roles, name=f"Groupe {old_groupe}")
+            # 2. Retirer l'ancien rôle Discord
+            old_role = get_guild_index(guild).role(f"Groupe {old_groupe}")
             if old_role and old_role in member.roles:
                 await member.remove_roles(old_role)
                 print(f"✅ Rôle {old_role.name} retiré de {member.name}")
             
-            # 4. Créer/Récupérer le nouveau rôle
+            # 3. Créer/Récupérer le nouveau rôle
             new_role = await self.onboarding._get_or_create_role(guild, new_groupe)
             await member.add_roles(new_role)
             print(f"✅ Rôle {new_role.name} attribué à {member.name}")
             
-            # 5. Créer les salons si nécessaire
+            # 4. Créer les salons si nécessaire
             await self.onboarding._create_group_channels(guild, new_groupe, new_role)
             
-            # 6. Envoyer notification de félicitations
-            await self._send_promotion_message(member, old_groupe, new_groupe, result)
-            
+            # 5. Mise à jour de la base (enregistrée par l'appelant) et notification
+            promotion = {
+                'user_id': member.id,
+                'niveau_actuel': new_niveau,
+                'groupe': new_groupe,
+                'examens_reussis': user['examens_reussis'] + 1
+            }
+            embed = self._promotion_embed(member, old_groupe, new_groupe, result)
+
             print(f"🎉 {member.name} promu de {old_groupe} à {new_groupe}")
+            return promotion, embed
             
         except Exception as e:
             print(f"❌ Erreur promotion utilisateur {member.name}: {e}")
-            db.rollback()
             raise
     
-    async def _send_promotion_message(
+    def _promotion_embed(
         self,
         member: discord.Member,
         old_groupe: str,
         new_groupe: str,
-        result: ExamResult
+        result: dict
     ):
         """
-        Envoie un message de félicitations pour la promotion
+        Message de félicitations pour la promotion (None en cas d'erreur)
         """
         try:
             embed = discord.Embed(
@@ -166,8 +243,8 @@ class PromotionManager:
             
             embed.add_field(
                 name="📊 Résultat",
-                value=f"**{result.percentage:.1f}%** ({result.score}/{result.total})\n"
-                      f"Seuil requis : {result.passing_score}%",
+                value=f"**{result['percentage']:.1f}%** ({result['score']}/{result['total']})\n"
+                      f"Seuil requis : {result['passing_score']}%",
                 inline=False
             )
             
@@ -206,24 +283,21 @@ class PromotionManager:
                 inline=False
             )
             
-            embed.set_footer(text=f"Examen passé le {result.date.strftime('%d/%m/%Y à %H:%M')}")
-            
-            await member.send(embed=embed)
-            print(f"✅ Message de promotion envoyé à {member.name}")
+            embed.set_footer(text=f"Examen passé le {result['date'].strftime('%d/%m/%Y à %H:%M')}")
             
-        except discord.Forbidden:
-            print(f"⚠️ Impossible d'envoyer un MP à {member.name} (MPs désactivés)")
+            return embed
+
         except Exception as e:
-            print(f"❌ Erreur envoi message promotion: {e}")
+            print(f"❌ Erreur préparation message promotion: {e}")
+            return None
     
-    async def _notify_failure(
+    def _failure_embed(
         self,
         member: discord.Member,
-        user_db: Utilisateur,
-        result: ExamResult
+        result: dict
     ):
         """
-        Notifie l'utilisateur qu'il n'a pas réussi l'examen
+        Message indiquant à l'utilisateur qu'il n'a pas réussi l'examen (None en cas d'erreur)
         Il reste dans son groupe actuel
         """
         try:
@@ -236,17 +310,17 @@ class PromotionManager:
             
             embed.add_field(
                 name="📊 Score Obtenu",
-                value=f"**{result.percentage:.1f}%** ({result.score}/{result.total})",
+                value=f"**{result['percentage']:.1f}%** ({result['score']}/{result['total']})",
                 inline=True
             )
             
             embed.add_field(
                 name="🎯 Score Requis",
-                value=f"**{result.passing_score}%**",
+                value=f"**{result['passing_score']}%**",
                 inline=True
             )
             
-            points_needed = result.passing_score - result.percentage
+            points_needed = result['passing_score'] - result['percentage']
             embed.add_field(
                 name="📈 Progression",
                 value=f"Il te manque **{points_needed:.1f}%** pour réussir.",
@@ -255,10 +329,10 @@ class PromotionManager:
             
             embed.add_field(
                 name="🔄 Prochaines Étapes",
-                value=f"• Tu restes dans le **Groupe {user_db.groupe}**\n"
+                value=f"• Tu restes dans le **Groupe {result['user']['groupe']}**\n"
                       f"• Révise les points difficiles\n"
                       f"• Consulte les ressources dans ton salon\n"
-                      f"• Demande de l'aide dans `#groupe-{user_db.groupe.lower()}-entraide`\n"
+                      f"• Demande de l'aide dans `#groupe-{result['user']['groupe'].lower()}-entraide`\n"
                       f"• Tu pourras retenter l'examen bientôt !",
                 inline=False
             )
@@ -270,12 +344,10 @@ class PromotionManager:
                 inline=False
             )
             
-            embed.set_footer(text=f"Examen passé le {result.date.strftime('%d/%m/%Y à %H:%M')}")
+            embed.set_footer(text=f"Examen passé le {result['date'].strftime('%d/%m/%Y à %H:%M')}")
             
-            await member.send(embed=embed)
-            print(f"✅ Notification d'échec envoyée à {member.name}")
-            
-        except discord.Forbidden:
-            print(f"⚠️ Impossible d'envoyer un MP à {member.name} (MPs désactivés)")
+            return embed
+
         except Exception as e:
-            print(f"❌ Erreur envoi notification échec: {e}")
+            print(f"❌ Erreur préparation notification échec: {e}")
+            return None
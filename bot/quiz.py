@@ -3,6 +3,7 @@ import asyncio
 from datetime import datetime, timedelta
 from spaced_rep import SpacedRepetition
 from database_sql import ReviewDatabaseSQL
+from db_executor import run_db
 
 class QuizAnswerView(discord.ui.View):
     """Vue avec boutons dynamiques pour les réponses du quiz"""
@@ -142,9 +143,14 @@ class QuizSession:
         self.current_index = 0
         self.score = 0
         self.timeout = None if is_review else 60.0 
+        self.reviews = {}          # {question_id: révision} chargées en une requête
+        self.pending_reviews = []  # Révisions à sauvegarder en un seul lot à la fin
     
     async def start(self):
         """Démarre la session et envoie la première question"""
+        self.reviews = {
+            r['question_id']: r for r in await run_db(self.manager.db.get_user_reviews, self.user.id)
+        }
         await self.send_question()
     
     async def send_question(self):
@@ -202,7 +208,7 @@ class QuizSession:
             quality = 0
     
     # Mise à jour de l'algorithme de révision espacée
-        review_data = self.manager.db.get_review(self.user.id, question['id'])
+        review_data = self.reviews.get(question['id'])
     
         if review_data:
             updated_review = self.manager.sr.update_review(review_data, quality)
@@ -211,7 +217,9 @@ class QuizSession:
             self.user.id, question['id'], quality
         )
     
-        self.manager.db.save_review(updated_review)
+        # Sauvegarde différée : tout le quiz est écrit en une transaction dans finish()
+        self.reviews[question['id']] = updated_review
+        self.pending_reviews.append(updated_review)
     
     # Information sur la prochaine révision
         next_time = updated_review['next_review']
@@ -224,6 +232,8 @@ class QuizSession:
 
     async def finish(self):
         """Termine la session de quiz"""
+        await self.flush_reviews()
+
         if not self.is_review:
             embed = discord.Embed(
                 title="🎉 QCM terminé !",
@@ -236,3 +246,9 @@ class QuizSession:
         
         # Suppression de la session
         self.manager.remove_session(self.user.id)
+
+    async def flush_reviews(self):
+        """Sauvegarde toutes les révisions du quiz en un seul upsert (thread base de données)"""
+        if self.pending_reviews:
+            reviews, self.pending_reviews = self.pending_reviews, []
+            await run_db(self.manager.db.save_reviews, reviews)
@@ -1,28 +1,37 @@
 """
 Gestionnaire de révisions SM-2 avec stockage JSON
 Pas besoin de SQL pour cette fonctionnalité simple !
+
+Le fichier JSON n'est plus relu à chaque appel : voir review_store.py
+(index en mémoire + journal d'écriture + snapshots atomiques)
 """
 
-import json
-import os
 from datetime import datetime, timedelta
-from pathlib import Path
+from review_store import ReviewStore
+import sm2_engine
+from sm2_engine import QUIZ_REVIEW_PARAMS
 
 REVIEWS_FILE = "quiz_reviews.json"
 
+_store = None
+
+
+def get_store() -> ReviewStore:
+    """Retourne le store des révisions (chargé une seule fois)"""
+    global _store
+    if _store is None:
+        _store = ReviewStore(REVIEWS_FILE)
+    return _store
+
 
 def load_reviews():
-    """Charge les révisions depuis le fichier JSON"""
-    if os.path.exists(REVIEWS_FILE):
-        with open(REVIEWS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    """Retourne toutes les révisions {user_id: {question_id: révision}}"""
+    return get_store().snapshot()
 
 
 def save_reviews(reviews):
-    """Sauvegarde les révisions dans le fichier JSON"""
-    with open(REVIEWS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(reviews, f, indent=2, ensure_ascii=False)
+    """Remplace toutes les révisions (snapshot atomique)"""
+    get_store().replace_all(reviews)
 
 
 def get_user_review(user_id: int, question_id: str):
@@ -37,24 +46,21 @@ def get_user_review(user_id: int, question_id: str):
             'easiness_factor': float
         }
     """
-    reviews = load_reviews()
-    user_key = str(user_id)
-
-    if user_key in reviews and question_id in reviews[user_key]:
-        return reviews[user_key][question_id]
-    return None
+    return get_store().get(user_id, question_id)
 
 
-def should_review(user_id: int, question_id: str):
-    """Vérifie si une question doit être révisée maintenant"""
-    review = get_user_review(user_id, question_id)
-
+def _is_due(review, now):
+    """Vérifie si une révision est due à l'instant now"""
     if not review:
         # Nouvelle question = toujours à réviser
         return True
 
-    next_review = datetime.fromisoformat(review['next_review'])
-    return datetime.now() >= next_review
+    return now >= datetime.fromisoformat(review['next_review'])
+
+
+def should_review(user_id: int, question_id: str):
+    """Vérifie si une question doit être révisée maintenant"""
+    return _is_due(get_user_review(user_id, question_id), datetime.now())
 
 
 def update_review_sm2(user_id: int, question_id: str, quality: int, schedule_callback=None):
@@ -70,59 +76,72 @@ def update_review_sm2(user_id: int, question_id: str, quality: int, schedule_cal
     Returns:
         dict: Données de révision mises à jour avec next_review_date (datetime)
     """
-    reviews = load_reviews()
-    user_key = str(user_id)
+    review = _apply_sm2(get_user_review(user_id, question_id), quality)
 
-    # Créer l'entrée utilisateur si elle n'existe pas
-    if user_key not in reviews:
-        reviews[user_key] = {}
+    # Sauvegarder (ajout au journal, O(1))
+    get_store().put(user_id, question_id, review)
 
-    # Récupérer la révision actuelle ou créer une nouvelle
-    if question_id in reviews[user_key]:
-        review = reviews[user_key][question_id]
-    else:
+    # Retourner les données avec la date comme datetime
+    return {
+        **review,
+        'next_review_date': datetime.fromisoformat(review['next_review'])
+    }
+
+
+def update_reviews_sm2(user_id: int, outcomes: list):
+    """
+    Met à jour plusieurs révisions d'un quiz en une seule transaction
+
+    Args:
+        user_id: ID Discord de l'utilisateur
+        outcomes: Liste de (question_id, quality) dans l'ordre des réponses
+
+    Returns:
+        list: Données de révision mises à jour (avec next_review_date), dans le même ordre
+    """
+    user_reviews = get_store().get_user_reviews(user_id)
+    results = []
+
+    for question_id, quality in outcomes:
+        review = _apply_sm2(user_reviews.get(question_id), quality)
+        user_reviews[question_id] = review
+        results.append((question_id, review))
+
+    # Une seule ligne dans le journal pour tout le quiz
+    get_store().put_many((user_id, question_id, review) for question_id, review in results)
+
+    return [{
+        **review,
+        'next_review_date': datetime.fromisoformat(review['next_review'])
+    } for question_id, review in results]
+
+
+def _apply_sm2(review, quality: int) -> dict:
+    """Applique SM-2 à une révision (None = nouvelle question) et retourne la nouvelle révision"""
+    if review is None:
         review = {
             'interval_days': 1.0,
             'repetitions': 0,
             'easiness_factor': 2.5,
             'next_review': datetime.now().isoformat()
         }
-
-    # Algorithme SM-2
-    if quality >= 3:
-        # Bonne réponse
-        if review['repetitions'] == 0:
-            review['interval_days'] = 1
-        elif review['repetitions'] == 1:
-            review['interval_days'] = 6
-        else:
-            review['interval_days'] = review['interval_days'] * review['easiness_factor']
-
-        review['repetitions'] += 1
     else:
-        # Mauvaise réponse - recommencer
-        review['repetitions'] = 0
-        review['interval_days'] = 1
-
-    # Ajuster le facteur de facilité
-    review['easiness_factor'] = max(
-        1.3,
-        review['easiness_factor'] + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        review = dict(review)
+
+    # Algorithme SM-2 : 1 jour, 6 jours, puis intervalle × EF ; 1 jour si erreur
+    review['easiness_factor'], review['repetitions'], review['interval_days'] = sm2_engine.update(
+        review['easiness_factor'],
+        review['repetitions'],
+        review['interval_days'],
+        quality,
+        QUIZ_REVIEW_PARAMS
     )
 
     # Calculer la prochaine révision
     next_review_date = datetime.now() + timedelta(days=review['interval_days'])
     review['next_review'] = next_review_date.isoformat()
 
-    # Sauvegarder
-    reviews[user_key][question_id] = review
-    save_reviews(reviews)
-
-    # Retourner les données avec la date comme datetime
-    return {
-        **review,
-        'next_review_date': next_review_date
-    }
+    return review
 
 
 def get_questions_to_review(user_id: int, all_questions: list):
@@ -136,10 +155,10 @@ def get_questions_to_review(user_id: int, all_questions: list):
     Returns:
         list: Questions à réviser
     """
-    questions_to_review = []
-
-    for question in all_questions:
-        if should_review(user_id, question['id']):
-            questions_to_review.append(question)
+    user_reviews = get_store().get_user_reviews(user_id)
+    now = datetime.now()
 
-    return questions_to_review
+    return [
+        question for question in all_questions
+        if _is_due(user_reviews.get(question['id']), now)
+    ]
@@ -0,0 +1,45 @@
+"""
+Limiteur de débit pour les appels à l'API Discord (seau à jetons)
+
+Discord limite le nombre de requêtes par route : au lieu de subir des 429,
+les envois attendent qu'un jeton soit disponible.
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Seau à jetons asynchrone : `rate` jetons par seconde, au plus `capacity` d'avance"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        Args:
+            rate: Jetons ajoutés par seconde (débit moyen autorisé)
+            capacity: Taille du seau (rafale maximale)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        """Ajoute les jetons accumulés depuis la dernière mise à jour"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Prend des jetons sans attendre (False si le seau est vide)"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: int = 1):
+        """Attend puis prend des jetons (les appelants sont servis dans l'ordre)"""
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
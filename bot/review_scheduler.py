@@ -1,95 +1,306 @@
 """
 Planificateur de révisions automatiques avec rappels par MP
 Utilise APScheduler pour envoyer les questions aux dates/heures exactes
+
+Les tâches sont persistées dans la table review_jobs (même base que le reste) :
+au démarrage, seules les différences avec quiz_reviews.json sont corrigées.
+
+Les accès à review_jobs ne tournent jamais dans la boucle asyncio :
+- ajout / remplacement / suppression de tâches : via run_db (schedule_review,
+  schedule_reviews, load_scheduled_reviews)
+- lecture et suppression des tâches dues à chaque réveil : ReviewJobScheduler
 """
 
 import asyncio
+import apscheduler
 import discord
 from datetime import datetime
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.executors.asyncio import AsyncIOExecutor
+from apscheduler.schedulers.asyncio import AsyncIOScheduler, run_in_event_loop
+from apscheduler.schedulers.base import STATE_STOPPED
+from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.util import convert_to_datetime, datetime_to_utc_timestamp
+import pickle
+from sqlalchemy import select
+from db_connection import engine
+from db_executor import run_db
 from quiz_reviews_manager import get_user_review, load_reviews
-import json
+from rate_limiter import TokenBucket
+from pending_store import PendingQuestionStore
+from loop_monitor import instrument_scheduler
 import os
 
 PENDING_QUESTIONS_FILE = "pending_questions.json"
+REVIEW_JOBS_TABLE = "review_jobs"
+
+# Les révisions dues dans cette fenêtre sont regroupées en un seul MP
+DIGEST_WINDOW_SECONDS = float(os.getenv('REVIEW_DIGEST_WINDOW', 60))
+
+# Débit global des appels Discord du pipeline (fetch_user + MP)
+dm_limiter = TokenBucket(
+    rate=float(os.getenv('DISCORD_DM_RATE', 4)),
+    capacity=int(os.getenv('DISCORD_DM_BURST', 5))
+)
+
+
+
+class _LoopExecutor(AsyncIOExecutor):
+    """Tâches soumises depuis le thread de _process_jobs : lancées dans la boucle (create_task n'est pas thread-safe)"""
+
+    def _do_submit_job(self, job, run_times):
+        self._eventloop.call_soon_threadsafe(super()._do_submit_job, job, run_times)
+
+
+class ReviewJobScheduler(AsyncIOScheduler):
+    """
+    AsyncIOScheduler dont le traitement des tâches dues ne bloque pas la boucle
+
+    À chaque réveil, _process_jobs lit les tâches dues dans review_jobs puis les
+    supprime (ou les met à jour) : il tourne dans un thread base de données.
+    Les tâches elles-mêmes (coroutines) sont lancées dans la boucle.
+    """
+
+    _processing = False        # Un passage de _process_jobs est en cours
+    _wakeup_requested = False  # Réveil demandé pendant ce passage
+
+    @run_in_event_loop
+    def wakeup(self):
+        self._stop_timer()
+        if self._processing:
+            self._wakeup_requested = True
+            return
+        self._processing = True
+        task = self._eventloop.create_task(run_db(self._process_jobs))
+        task.add_done_callback(self._jobs_processed)
+
+    def _jobs_processed(self, task):
+        self._processing = False
+        if task.cancelled() or self.state == STATE_STOPPED:
+            return
+
+        if task.exception() is not None:
+            print(f"❌ Erreur du planificateur de révisions: {task.exception()}")
+            wait_seconds = self.jobstore_retry_interval
+        else:
+            wait_seconds = task.result()
+
+        if self._wakeup_requested:
+            self._wakeup_requested = False
+            wait_seconds = 0
+        self._start_timer(wait_seconds)
+
+    def _create_default_executor(self):
+        return _LoopExecutor()
+
+
+review_jobstore = SQLAlchemyJobStore(engine=engine, tablename=REVIEW_JOBS_TABLE)
+scheduler = ReviewJobScheduler(jobstores={'default': review_jobstore})
+
+# La réconciliation lit et écrit directement la table du store (jobs_t et
+# Job.__getstate__ sont internes à APScheduler) : seulement pour les versions dont
+# le format est vérifié par `python bench_review_jobs.py --check`. Sinon, API
+# publique (une requête par tâche).
+DIRECT_JOBSTORE_VERSIONS = ('3.10.',)
 
-scheduler = AsyncIOScheduler()
 
+def _direct_jobstore_supported() -> bool:
+    jobs_t = getattr(review_jobstore, 'jobs_t', None)
+    return (
+        apscheduler.__version__.startswith(DIRECT_JOBSTORE_VERSIONS)
+        and jobs_t is not None
+        and set(jobs_t.c.keys()) == {'id', 'next_run_time', 'job_state'}
+    )
+
+
+DIRECT_JOBSTORE = _direct_jobstore_supported()
+if not DIRECT_JOBSTORE:
+    print(f"⚠️ APScheduler {apscheduler.__version__} non vérifié : réconciliation des révisions par l'API publique")
+
+# Les tâches persistées ne contiennent que (user_id, question_id) :
+# le bot et les questions sont résolus au moment de l'exécution
+_bot = None
+QUESTION_INDEX = {}  # {question_id: question_data}
 
-def load_pending_questions():
-    """Charge les questions en attente de réponse"""
-    if os.path.exists(PENDING_QUESTIONS_FILE):
-        with open(PENDING_QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
 
+def build_question_index(quizzes_data):
+    """Construit l'index id → question à partir de quizzes.json"""
+    QUESTION_INDEX.clear()
+    for course in quizzes_data['courses']:
+        for question in course['questions']:
+            QUESTION_INDEX[question['id']] = question
+    return QUESTION_INDEX
 
-def save_pending_questions(pending):
-    """Sauvegarde les questions en attente"""
-    with open(PENDING_QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(pending, f, indent=2, ensure_ascii=False)
 
+_pending_store = None
+_pending_lock = asyncio.Lock()
 
-def has_pending_question(user_id: int):
+
+def get_pending_store() -> PendingQuestionStore:
+    """Retourne les files en attente (snapshot + journal rejoués une seule fois)"""
+    global _pending_store
+    if _pending_store is None:
+        _pending_store = PendingQuestionStore(PENDING_QUESTIONS_FILE)
+    return _pending_store
+
+
+async def has_pending_question(user_id: int):
     """Vérifie si l'utilisateur a une question en attente de réponse"""
-    pending = load_pending_questions()
-    user_key = str(user_id)
-    return user_key in pending and pending[user_key] is not None
+    async with _pending_lock:
+        return get_pending_store().current(user_id) is not None
+
 
+async def add_to_queue(user_id: int, question_data: dict):
+    """
+    Ajoute une question à la file d'attente de l'utilisateur
 
-def add_to_queue(user_id: int, question_data: dict):
-    """Ajoute une question à la file d'attente de l'utilisateur"""
-    pending = load_pending_questions()
-    user_key = str(user_id)
+    Returns:
+        bool: True si elle devient la question courante
+    """
+    return await add_questions_to_queue(user_id, [question_data])
 
-    if user_key not in pending:
-        pending[user_key] = {
-            'current': None,
-            'queue': []
-        }
 
-    # Si pas de question en cours, elle devient la question courante
-    if pending[user_key]['current'] is None:
-        pending[user_key]['current'] = question_data
-    else:
-        # Sinon, ajout à la file d'attente
-        pending[user_key]['queue'].append(question_data)
+async def add_questions_to_queue(user_id: int, questions: list):
+    """
+    Ajoute plusieurs questions en une seule opération journalisée
+    S'il n'y a pas de question en cours, la première devient la question courante
 
-    save_pending_questions(pending)
+    Returns:
+        bool: True si la première question ajoutée devient la question courante
+    """
+    async with _pending_lock:
+        return get_pending_store().add(user_id, questions)
 
 
-def get_pending_question(user_id: int):
+async def get_pending_question(user_id: int):
     """Récupère la question en attente pour un utilisateur"""
-    pending = load_pending_questions()
-    user_key = str(user_id)
+    async with _pending_lock:
+        return get_pending_store().current(user_id)
 
-    if user_key in pending and pending[user_key]['current']:
-        return pending[user_key]['current']
-    return None
 
-
-def complete_question(user_id: int):
+async def complete_question(user_id: int):
     """Marque la question courante comme répondue et passe à la suivante"""
-    pending = load_pending_questions()
-    user_key = str(user_id)
+    async with _pending_lock:
+        return get_pending_store().complete(user_id)
 
-    if user_key not in pending:
-        return None
 
-    # Retirer la question courante
-    pending[user_key]['current'] = None
+async def pending_count(user_id: int):
+    """Nombre de questions dans la file d'attente (hors question courante)"""
+    async with _pending_lock:
+        return get_pending_store().waiting(user_id)
 
-    # S'il y a des questions en attente, prendre la première
-    if pending[user_key]['queue']:
-        next_question = pending[user_key]['queue'].pop(0)
-        pending[user_key]['current'] = next_question
-        save_pending_questions(pending)
-        return next_question
-    else:
-        # Plus de questions en attente
-        save_pending_questions(pending)
-        return None
+
+# ==================== ENVOI GROUPÉ DES RAPPELS ====================
+
+_digest_buffers = {}  # {user_id: [question_data]} en attente d'envoi
+_user_cache = {}      # {user_id: discord.User} récupérés via l'API
+_flush_tasks = set()  # Références vers les envois programmés
+
+
+def build_review_embed(question_data: dict, position: int = 1, total: int = 1, title: str = "🔔 Révision programmée"):
+    """Crée l'embed d'une question de révision (position/total pour les envois groupés)"""
+    if total > 1 and position == 1:
+        title = f"🔔 {total} révisions programmées"
+
+    embed = discord.Embed(
+        title=title,
+        description=question_data['question'],
+        color=discord.Color.blue()
+    )
+
+    # Ajouter les options
+    options_text = ""
+    for idx, option in enumerate(question_data['options']):
+        letter = chr(65 + idx)  # A, B, C, D
+        options_text += f"**{letter}.** {option}\n"
+
+    embed.add_field(
+        name="Options",
+        value=options_text,
+        inline=False
+    )
+
+    footer = "Réponds avec les boutons ci-dessous quand tu es prêt !"
+    if total > 1:
+        footer = f"Question {position}/{total} • {footer}"
+    embed.set_footer(text=footer)
+
+    return embed
+
+
+async def get_user_cached(bot, user_id: int):
+    """Retourne l'utilisateur depuis le cache du bot ou le cache local (API appelée une seule fois)"""
+    user = bot.get_user(user_id) or _user_cache.get(user_id)
+    if user is None:
+        await dm_limiter.acquire()
+        user = await bot.fetch_user(user_id)
+        _user_cache[user_id] = user
+    return user
+
+
+def enqueue_review(bot, user_id: int, question_data: dict):
+    """
+    Ajoute une révision due au tampon de l'utilisateur
+    Le premier ajout déclenche l'envoi groupé après DIGEST_WINDOW_SECONDS
+    """
+    buffer = _digest_buffers.get(user_id)
+    if buffer is None:
+        _digest_buffers[user_id] = [question_data]
+        task = asyncio.create_task(flush_review_digest(bot, user_id, delay=DIGEST_WINDOW_SECONDS))
+        _flush_tasks.add(task)
+        task.add_done_callback(_flush_tasks.discard)
+    elif all(q['id'] != question_data['id'] for q in buffer):
+        buffer.append(question_data)
+
+
+async def flush_review_digest(bot, user_id: int, delay: float = 0):
+    """Envoie toutes les révisions en tampon pour un utilisateur (après `delay` secondes)"""
+    if delay:
+        await asyncio.sleep(delay)
+    questions = _digest_buffers.pop(user_id, None)
+    if questions:
+        await send_review_digest(bot, user_id, questions)
+
+
+async def send_review_digest(bot, user_id: int, questions: list):
+    """
+    Envoie un seul MP pour plusieurs questions de révision
+    La première question est affichée, les suivantes arrivent après chaque réponse
+
+    Args:
+        bot: Instance du bot Discord
+        user_id: ID Discord de l'utilisateur
+        questions: Liste de dicts de questions
+    """
+    try:
+        # Vérification et ajout en une seule opération (pas de course entre deux rappels)
+        async with _pending_lock:
+            store = get_pending_store()
+            if not store.add(user_id, questions):
+                # L'utilisateur a déjà une question en cours (ou questions déjà en file)
+                print(f"⏸️ {len(questions)} question(s) mise(s) en attente pour {user_id} (question en cours)")
+                return
+            # La première devient la question courante, les autres sont en file
+            current = store.current(user_id)
+            total = 1 + store.waiting(user_id)
+
+        user = await get_user_cached(bot, user_id)
+
+        # Créer la vue avec boutons
+        from bot import ReviewQuestionView
+        embed = build_review_embed(current, 1, total)
+        view = ReviewQuestionView(current, user_id, position=1, total=total)
+
+        await dm_limiter.acquire()
+        await user.send(embed=embed, view=view)
+        print(f"📬 {total} question(s) envoyée(s) à {user.name} (ID: {user_id})")
+
+    except discord.Forbidden:
+        print(f"❌ Impossible d'envoyer un MP à {user_id} (MPs désactivés)")
+    except Exception as e:
+        print(f"❌ Erreur lors de l'envoi des questions à {user_id}: {e}")
 
 
 async def send_review_question(bot, user_id: int, question_data: dict):
@@ -101,53 +312,92 @@ async def send_review_question(bot, user_id: int, question_data: dict):
         user_id: ID Discord de l'utilisateur
         question_data: Dict contenant les infos de la question
     """
-    try:
-        user = await bot.fetch_user(user_id)
+    await send_review_digest(bot, user_id, [question_data])
 
-        # Vérifier si l'utilisateur a déjà une question en attente
-        if has_pending_question(user_id):
-            print(f"⏸️ Question mise en attente pour {user_id} (question en cours)")
-            add_to_queue(user_id, question_data)
-            return
 
-        # Ajouter comme question courante
-        add_to_queue(user_id, question_data)
+async def run_review_job(user_id: int, question_id: str):
+    """Tâche persistée : retrouve le bot et la question puis met le rappel en tampon"""
+    question_data = QUESTION_INDEX.get(question_id)
+    if _bot is None or question_data is None:
+        print(f"⚠️ Révision ignorée pour {user_id} - Question {question_id} introuvable")
+        return
 
-        # Créer l'embed de la question
-        embed = discord.Embed(
-            title="🔔 Révision programmée",
-            description=question_data['question'],
-            color=discord.Color.blue()
-        )
+    enqueue_review(_bot, user_id, question_data)
 
-        # Ajouter les options
-        options_text = ""
-        for idx, option in enumerate(question_data['options']):
-            letter = chr(65 + idx)  # A, B, C, D
-            options_text += f"**{letter}.** {option}\n"
 
-        embed.add_field(
-            name="Options",
-            value=options_text,
-            inline=False
-        )
+def _job_id(user_id, question_id):
+    return f"review_{user_id}_{question_id}"
 
-        embed.set_footer(text="Réponds avec les boutons ci-dessous quand tu es prêt !")
 
-        # Créer la vue avec boutons
-        from bot import ReviewQuestionView
-        view = ReviewQuestionView(question_data, user_id)
+def _timestamp(date: datetime) -> float:
+    """Timestamp d'une date locale, comme enregistré dans review_jobs"""
+    return convert_to_datetime(date, scheduler.timezone, 'date').timestamp()
 
-        await user.send(embed=embed, view=view)
-        print(f"📬 Question envoyée à {user.name} (ID: {user_id})")
 
-    except discord.Forbidden:
-        print(f"❌ Impossible d'envoyer un MP à {user_id} (MPs désactivés)")
-    except Exception as e:
-        print(f"❌ Erreur lors de l'envoi de la question à {user_id}: {e}")
+def _add_review_job(user_id: int, question_id: str, run_date: datetime):
+    """Crée ou remplace la tâche de rappel d'une question (thread base de données : via run_db)"""
+    scheduler.add_job(
+        run_review_job,
+        trigger=DateTrigger(run_date=run_date),
+        args=[user_id, question_id],
+        id=_job_id(user_id, question_id),
+        replace_existing=True,
+        misfire_grace_time=None  # Envoyée au redémarrage même si le bot était éteint
+    )
 
 
-def schedule_review(bot, user_id: int, question_data: dict, next_review_date: datetime):
+def _bulk_add_review_jobs(items):
+    """
+    Crée ou remplace de nombreuses tâches en une seule transaction
+    (évite un aller-retour par tâche lors de la réconciliation)
+    Thread base de données : via run_db
+
+    Args:
+        items: liste de (user_id, question_id, run_date)
+    """
+    if not items:
+        return
+
+    if not DIRECT_JOBSTORE:
+        for user_id, question_id, run_date in items:
+            _add_review_job(user_id, question_id, run_date)
+        return
+
+    rows = []
+    for user_id, question_id, run_date in items:
+        trigger = DateTrigger(run_date=run_date, timezone=scheduler.timezone)
+        job = Job(
+            scheduler,
+            id=_job_id(user_id, question_id),
+            func=run_review_job,
+            trigger=trigger,
+            executor='default',
+            args=(user_id, question_id),
+            kwargs={},
+            name='run_review_job',
+            misfire_grace_time=None,
+            coalesce=True,  # Valeur par défaut de add_job (job_defaults)
+            max_instances=1,
+            next_run_time=trigger.run_date
+        )
+        rows.append({
+            'id': job.id,
+            'next_run_time': datetime_to_utc_timestamp(job.next_run_time),
+            'job_state': pickle.dumps(job.__getstate__(), review_jobstore.pickle_protocol)
+        })
+
+    jobs_t = review_jobstore.jobs_t
+    with engine.begin() as conn:
+        for i in range(0, len(rows), 1000):
+            chunk = rows[i:i + 1000]
+            conn.execute(jobs_t.delete().where(jobs_t.c.id.in_([row['id'] for row in chunk])))
+            conn.execute(jobs_t.insert(), chunk)
+
+    if scheduler.running:
+        scheduler.wakeup()
+
+
+async def schedule_review(bot, user_id: int, question_data: dict, next_review_date: datetime):
     """
     Planifie l'envoi d'une question de révision à une date précise
 
@@ -157,59 +407,123 @@ def schedule_review(bot, user_id: int, question_data: dict, next_review_date: da
         question_data: Dict avec les infos de la question
         next_review_date: datetime de la prochaine révision
     """
-    # Créer une tâche planifiée
-    trigger = DateTrigger(run_date=next_review_date)
+    global _bot
+    if _bot is None:
+        _bot = bot
+    QUESTION_INDEX.setdefault(question_data['id'], question_data)
 
-    scheduler.add_job(
-        send_review_question,
-        trigger=trigger,
-        args=[bot, user_id, question_data],
-        id=f"review_{user_id}_{question_data['id']}",
-        replace_existing=True,
-        misfire_grace_time=3600  # 1h de tolérance si le bot était éteint
-    )
+    await run_db(_add_review_job, user_id, question_data['id'], next_review_date)
 
     print(f"⏰ Révision planifiée pour {user_id} - Question {question_data['id']} à {next_review_date}")
 
 
+async def schedule_reviews(bot, user_id: int, reviews: list):
+    """
+    Planifie les rappels de plusieurs questions en une seule transaction (fin d'un quiz)
+
+    Args:
+        bot: Instance du bot Discord
+        user_id: ID Discord de l'utilisateur
+        reviews: liste de (question_data, next_review_date)
+    """
+    if not reviews:
+        return
+
+    global _bot
+    if _bot is None:
+        _bot = bot
+    for question_data, _ in reviews:
+        QUESTION_INDEX.setdefault(question_data['id'], question_data)
+
+    await run_db(_bulk_add_review_jobs, [
+        (user_id, question_data['id'], next_review_date) for question_data, next_review_date in reviews
+    ])
+
+    print(f"⏰ {len(reviews)} révision(s) planifiée(s) pour {user_id}")
+
+
 def start_scheduler():
     """Démarre le planificateur"""
     if not scheduler.running:
+        instrument_scheduler(scheduler, 'revisions')
         scheduler.start()
         print("✅ Planificateur de révisions démarré")
 
 
-def load_scheduled_reviews(bot, quizzes_data):
+async def load_scheduled_reviews(bot, quizzes_data):
     """
-    Charge toutes les révisions planifiées depuis quiz_reviews.json
-    À appeler au démarrage du bot
+    Réconcilie les tâches persistées avec quiz_reviews.json
+    À appeler au démarrage du bot, après start_scheduler()
+
+    Les tâches déjà enregistrées à la bonne date ne sont pas touchées :
+    seules les tâches manquantes, décalées ou orphelines sont corrigées.
     """
-    reviews = load_reviews()
+    global _bot
+    _bot = bot
+    build_question_index(quizzes_data)
+
+    # Rejoue le journal des questions en attente avant les premiers rappels
+    print(f"📥 {len(get_pending_store())} question(s) en attente de réponse")
+
+    count, scheduled, removed = await run_db(_reconcile_review_jobs)
+    print(f"📅 {count} révisions planifiées ({scheduled} (re)planifiées, {removed} supprimées au démarrage)")
+
+
+def _reconcile_review_jobs():
+    """
+    Corrige review_jobs d'après quiz_reviews.json (thread base de données)
+
+    Returns:
+        Tuple(révisions, tâches (re)planifiées, tâches orphelines supprimées)
+    """
+    # Tâches existantes {job_id: timestamp}, sans désérialiser les tâches
+    if DIRECT_JOBSTORE:
+        jobs_t = review_jobstore.jobs_t
+        jobs_t.create(engine, checkfirst=True)
+        with engine.connect() as conn:
+            existing = dict(conn.execute(select(jobs_t.c.id, jobs_t.c.next_run_time)).all())
+    else:
+        existing = {
+            job.id: datetime_to_utc_timestamp(job.next_run_time) for job in review_jobstore.get_all_jobs()
+        }
+
+    now = datetime.now()
+    now_ts = _timestamp(now)
+    expected = set()
     count = 0
+    to_schedule = []
 
-    for user_id_str, user_reviews in reviews.items():
+    for user_id_str, user_reviews in load_reviews().items():
         user_id = int(user_id_str)
 
         for question_id, review_data in user_reviews.items():
-            # Récupérer la date de prochaine révision
+            if question_id not in QUESTION_INDEX:
+                continue
+
+            job_id = _job_id(user_id, question_id)
+            expected.add(job_id)
+            count += 1
+
             next_review = datetime.fromisoformat(review_data['next_review'])
+            run_time = existing.get(job_id)
+            if run_time is not None:
+                if next_review < now:
+                    if run_time <= now_ts:
+                        continue  # Déjà due : sera envoyée au démarrage
+                elif abs(run_time - _timestamp(next_review)) < 1:
+                    continue  # Déjà planifiée à la bonne date
 
             # Si la date est passée, planifier pour maintenant
-            if next_review < datetime.now():
-                next_review = datetime.now()
-
-            # Trouver la question dans quizzes_data
-            question_data = None
-            for course in quizzes_data['courses']:
-                for q in course['questions']:
-                    if q['id'] == question_id:
-                        question_data = q
-                        break
-                if question_data:
-                    break
-
-            if question_data:
-                schedule_review(bot, user_id, question_data, next_review)
-                count += 1
-
-    print(f"📅 {count} révisions planifiées chargées au démarrage")
+            to_schedule.append((user_id, question_id, max(next_review, now)))
+
+    _bulk_add_review_jobs(to_schedule)
+
+    # Tâches sans révision ni question correspondante
+    orphans = [job_id for job_id in existing if job_id not in expected]
+    for job_id in orphans:
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass  # Déjà exécutée entre-temps
+
+    return count, len(to_schedule), len(orphans)
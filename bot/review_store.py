@@ -0,0 +1,176 @@
+"""
+Moteur de stockage des révisions SM-2 (remplace les relectures complètes de quiz_reviews.json)
+
+- Index en mémoire {user_id: {question_id: révision}} → lectures sans accès disque
+- Journal d'écriture append-only (WAL) → écritures en O(1)
+- Snapshots atomiques (fichier temporaire + os.replace) → pas de fichier corrompu en cas de crash
+- Compaction périodique : le WAL est fusionné dans le snapshot puis vidé
+
+Le snapshot garde exactement le format de l'ancien quiz_reviews.json.
+Chaque ligne du WAL est une transaction : [[user_key, question_id, révision], ...]
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+
+class ReviewStore:
+    """Stockage transactionnel des révisions avec index mémoire"""
+
+    def __init__(self, snapshot_path: str, wal_path: str = None, compact_every: int = 10000, fsync: bool = True):
+        """
+        Args:
+            snapshot_path: Fichier snapshot (ex: quiz_reviews.json)
+            wal_path: Fichier journal (défaut: snapshot_path + '.wal')
+            compact_every: Nombre minimum d'entrées WAL avant compaction
+            fsync: Forcer l'écriture physique de chaque transaction
+        """
+        self.snapshot_path = snapshot_path
+        self.wal_path = wal_path or f"{snapshot_path}.wal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+
+        self._reviews = {}  # {user_key: {question_id: review}}
+        self._count = 0
+        self._wal = None
+        self._wal_entries = 0
+        self._lock = threading.RLock()
+
+        self._load()
+
+    # ==================== CHARGEMENT ====================
+
+    def _load(self):
+        """Charge le snapshot puis rejoue le WAL"""
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                self._reviews = json.load(f)
+
+        replayed = 0
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Dernière transaction incomplète (crash pendant l'écriture) → ignorée
+                        break
+                    self._apply(entries)
+                    replayed += len(entries)
+
+        self._count = sum(len(user_reviews) for user_reviews in self._reviews.values())
+
+        if replayed:
+            # Repartir d'un WAL vide
+            self.compact()
+
+    def _apply(self, entries):
+        """Applique une transaction à l'index mémoire"""
+        for user_key, question_id, review in entries:
+            self._reviews.setdefault(user_key, {})[question_id] = review
+
+    # ==================== LECTURE ====================
+
+    def get(self, user_id, question_id):
+        """Retourne une copie de la révision ou None"""
+        user_reviews = self._reviews.get(str(user_id))
+        if not user_reviews:
+            return None
+        review = user_reviews.get(question_id)
+        return dict(review) if review is not None else None
+
+    def get_user_reviews(self, user_id) -> dict:
+        """Retourne {question_id: révision} pour un utilisateur (copie superficielle)"""
+        return dict(self._reviews.get(str(user_id), {}))
+
+    def snapshot(self) -> dict:
+        """Retourne une copie de toutes les révisions {user_key: {question_id: révision}}"""
+        with self._lock:
+            return {user_key: dict(user_reviews) for user_key, user_reviews in self._reviews.items()}
+
+    def __len__(self):
+        return self._count
+
+    # ==================== ÉCRITURE ====================
+
+    def put(self, user_id, question_id, review: dict):
+        """Enregistre une révision (une transaction)"""
+        self.put_many([(user_id, question_id, review)])
+
+    def put_many(self, items):
+        """
+        Enregistre plusieurs révisions dans une seule transaction
+
+        Args:
+            items: itérable de (user_id, question_id, review)
+        """
+        entries = [[str(user_id), question_id, dict(review)] for user_id, question_id, review in items]
+        if not entries:
+            return
+
+        with self._lock:
+            self._append(entries)
+
+            for user_key, question_id, review in entries:
+                user_reviews = self._reviews.setdefault(user_key, {})
+                if question_id not in user_reviews:
+                    self._count += 1
+                user_reviews[question_id] = review
+
+            self._wal_entries += len(entries)
+
+            # Compaction amortie : le coût O(n) du snapshot est payé au plus toutes les n écritures
+            if self._wal_entries >= max(self.compact_every, self._count):
+                self.compact()
+
+    def replace_all(self, reviews: dict):
+        """Remplace tout le contenu (compatibilité avec l'ancien save_reviews)"""
+        with self._lock:
+            self._reviews = {str(user_key): dict(user_reviews) for user_key, user_reviews in reviews.items()}
+            self._count = sum(len(user_reviews) for user_reviews in self._reviews.values())
+            self.compact()
+
+    def _append(self, entries):
+        """Ajoute une transaction au WAL"""
+        if self._wal is None:
+            self._wal = open(self.wal_path, 'a', encoding='utf-8')
+
+        self._wal.write(json.dumps(entries, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+
+    # ==================== COMPACTION ====================
+
+    def compact(self):
+        """Écrit un snapshot atomique puis vide le WAL"""
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.reviews-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self._reviews, f, ensure_ascii=False, separators=(',', ':'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            # Un crash ici est sans danger : rejouer le WAL sur le nouveau snapshot est idempotent
+            if self._wal is not None:
+                self._wal.close()
+            self._wal = open(self.wal_path, 'w', encoding='utf-8')
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            self._wal_entries = 0
+
+    def close(self):
+        """Ferme le WAL"""
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
@@ -0,0 +1,238 @@
+"""
+Réconciliation des rôles de groupe Discord avec la base de données (/actualiser_exams)
+
+1. État voulu : le groupe de chaque utilisateur en base. Par défaut, seuls les
+   utilisateurs dont le groupe a changé depuis la dernière réconciliation
+   (table role_reconciliations) sont relus.
+2. Diff en mémoire avec l'état du serveur (cache discord.py, aucun appel API).
+3. Changements minimaux : rôles et salons manquants créés une fois par groupe,
+   puis un seul member.edit(roles=...) par membre à corriger, en parallèle sous
+   un limiteur de débit.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+import discord
+from sqlalchemy import delete, insert, or_, select
+from db_connection import SessionLocal
+from models import Utilisateur, RoleReconciliation
+from rate_limiter import TokenBucket
+from guild_index import get_guild_index
+from db_executor import run_db
+
+GROUP_ROLE_PREFIX = "Groupe "
+
+# PATCH /guilds/{id}/members/{id} : limite partagée par tout le serveur
+ROLE_EDIT_RATE = float(os.getenv('DISCORD_ROLE_EDIT_RATE', 5))
+ROLE_EDIT_BURST = int(os.getenv('DISCORD_ROLE_EDIT_BURST', 10))
+ROLE_EDIT_CONCURRENCY = int(os.getenv('DISCORD_ROLE_EDIT_CONCURRENCY', 5))
+
+
+class RoleChange:
+    """Correction à appliquer à un membre"""
+
+    def __init__(self, member: discord.Member, user_id: int, username: str, groupe: str, niveau: int,
+                 keep: list, removed: list):
+        self.member = member
+        self.user_id = user_id
+        self.username = username
+        self.groupe = groupe
+        self.niveau = niveau
+        self.keep = keep          # Rôles hors groupe conservés
+        self.removed = removed    # Anciens rôles de groupe retirés
+        self.error = None
+
+    @property
+    def role_name(self) -> str:
+        return f"{GROUP_ROLE_PREFIX}{self.groupe}"
+
+
+class RoleReconciler:
+    """Calcule et applique les corrections de rôles de groupe d'un serveur"""
+
+    def __init__(self, guild: discord.Guild, ensure_channels=None,
+                 rate: float = ROLE_EDIT_RATE, burst: int = ROLE_EDIT_BURST,
+                 concurrency: int = ROLE_EDIT_CONCURRENCY):
+        """
+        Args:
+            guild: Le serveur Discord
+            ensure_channels: Coroutine (guild, groupe, role) qui crée les salons d'un groupe s'ils manquent
+        """
+        self.guild = guild
+        self.ensure_channels = ensure_channels
+        self.limiter = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+
+    # ==================== ÉTAT VOULU ====================
+
+    @staticmethod
+    def load_desired(full: bool = False, user_ids: list = None) -> list:
+        """
+        Retourne [(user_id, username, groupe, niveau_actuel)]
+
+        Args:
+            full: Tous les utilisateurs (sinon seulement ceux dont le groupe a changé
+                  depuis la dernière réconciliation)
+            user_ids: Limiter aux utilisateurs donnés (événements de changement de groupe)
+        """
+        db = SessionLocal()
+        try:
+            query = select(
+                Utilisateur.user_id, Utilisateur.username, Utilisateur.groupe, Utilisateur.niveau_actuel
+            ).outerjoin(
+                RoleReconciliation, RoleReconciliation.user_id == Utilisateur.user_id
+            )
+            if user_ids is not None:
+                query = query.where(Utilisateur.user_id.in_(user_ids))
+            if not full:
+                query = query.where(or_(
+                    RoleReconciliation.groupe.is_(None),
+                    RoleReconciliation.groupe != Utilisateur.groupe
+                ))
+            return db.execute(query).all()
+        finally:
+            db.close()
+
+    # ==================== DIFF ====================
+
+    def plan(self, desired: list):
+        """
+        Compare l'état voulu avec les rôles actuels des membres (en mémoire)
+
+        Returns:
+            Tuple(changes, in_sync, missing) :
+            - changes : RoleChange à appliquer
+            - in_sync : [(user_id, groupe)] déjà corrects
+            - missing : [(user_id, username)] absents du serveur
+        """
+        index = get_guild_index(self.guild)
+        changes, in_sync, missing = [], [], []
+
+        for user_id, username, groupe, niveau in desired:
+            member = self.guild.get_member(user_id)
+            if member is None:
+                missing.append((user_id, username))
+                continue
+
+            expected = index.role(f"{GROUP_ROLE_PREFIX}{groupe}")
+            group_roles = [role for role in member.roles if role.name.startswith(GROUP_ROLE_PREFIX)]
+
+            if expected is not None and group_roles == [expected]:
+                in_sync.append((user_id, groupe))
+                continue
+
+            keep = self._kept_roles(member)
+            removed = [role for role in group_roles if role != expected]
+            changes.append(RoleChange(member, user_id, username, groupe, niveau, keep, removed))
+
+        return changes, in_sync, missing
+
+    @staticmethod
+    def _kept_roles(member: discord.Member) -> list:
+        """Rôles du membre conservés par la réconciliation (hors @everyone et rôles de groupe)"""
+        return [role for role in member.roles
+                if not role.is_default() and not role.name.startswith(GROUP_ROLE_PREFIX)]
+
+    # ==================== APPLICATION ====================
+
+    async def _ensure_group_roles(self, changes: list) -> dict:
+        """Crée une seule fois chaque rôle (et ses salons) nécessaire au change set"""
+        index = get_guild_index(self.guild)
+        roles = {}
+
+        for groupe in sorted({change.groupe for change in changes}):
+            role_name = f"{GROUP_ROLE_PREFIX}{groupe}"
+            role = index.role(role_name)
+
+            if role is None:
+                role = await self.guild.create_role(
+                    name=role_name,
+                    color=discord.Color.blue(),
+                    mentionable=True,
+                    hoist=True  # Afficher séparément à gauche sur Discord
+                )
+                index.role_created(role)
+                print(f"   ✅ Rôle créé : {role_name}")
+
+            if self.ensure_channels:
+                await self.ensure_channels(self.guild, groupe, role)
+            roles[groupe] = role
+
+        return roles
+
+    async def _edit_member(self, change: RoleChange, role: discord.Role, semaphore: asyncio.Semaphore):
+        """Remplace les rôles de groupe du membre en un seul appel"""
+        async with semaphore:
+            await self.limiter.acquire()
+            # Rôles relus après l'attente : un rôle ajouté entre-temps (autre commande, modérateur) est conservé
+            change.keep = self._kept_roles(change.member)
+            try:
+                await change.member.edit(roles=change.keep + [role], reason="Actualisation des rôles (base de données)")
+                removed = ', '.join(r.name for r in change.removed) or 'aucun'
+                print(f"   🔄 {change.username} : {removed} → {role.name}")
+            except discord.HTTPException as e:
+                change.error = str(e)
+                print(f"❌ Erreur pour {change.username}: {e}")
+
+    async def apply(self, changes: list) -> list:
+        """
+        Applique le change set
+
+        Returns:
+            Les RoleChange appliqués avec succès
+        """
+        if not changes:
+            return []
+
+        roles = await self._ensure_group_roles(changes)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._edit_member(change, roles[change.groupe], semaphore) for change in changes))
+        return [change for change in changes if change.error is None]
+
+    # ==================== SUIVI ====================
+
+    @staticmethod
+    def record(reconciled: list):
+        """Mémorise le groupe appliqué pour chaque utilisateur [(user_id, groupe)] (une transaction)"""
+        if not reconciled:
+            return
+
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            user_ids = [user_id for user_id, _ in reconciled]
+            for i in range(0, len(user_ids), 500):
+                db.execute(delete(RoleReconciliation).where(RoleReconciliation.user_id.in_(user_ids[i:i + 500])))
+            db.execute(insert(RoleReconciliation), [
+                {'user_id': user_id, 'groupe': groupe, 'reconciled_at': now}
+                for user_id, groupe in reconciled
+            ])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Erreur enregistrement de la réconciliation: {e}")
+        finally:
+            db.close()
+
+    async def run(self, full: bool = False) -> dict:
+        """
+        Réconciliation complète : état voulu → diff → corrections → suivi
+
+        Returns:
+            dict {'checked', 'changes', 'updated', 'unchanged', 'missing', 'errors'}
+        """
+        desired = await run_db(self.load_desired, full)
+        changes, in_sync, missing = self.plan(desired)
+        applied = await self.apply(changes)
+
+        await run_db(self.record, in_sync + [(change.user_id, change.groupe) for change in applied])
+
+        return {
+            'checked': len(desired),
+            'changes': changes,
+            'updated': applied,
+            'unchanged': len(in_sync),
+            'missing': missing,
+            'errors': [change for change in changes if change.error is not None]
+        }
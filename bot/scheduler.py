@@ -1,41 +1,155 @@
 import asyncio
-from datetime import datetime
+import heapq
+import itertools
+from collections import deque
+from datetime import datetime, timedelta
 from discord.ext import tasks
 from database_sql import ReviewDatabaseSQL
+from db_executor import run_db
+
+
+class DueQueue:
+    """
+    File de priorité des révisions à venir, triée sur next_review
+
+    Ne contient que les révisions dont next_review <= horizon.
+    Une révision mise à jour est simplement ré-empilée : l'ancienne entrée
+    est ignorée au moment du pop (suppression paresseuse).
+    """
+
+    def __init__(self):
+        self.horizon = None
+        self._heap = []      # [(next_review, user_id, seq, question_id, review)]
+        self._seq = itertools.count()  # Départage les doublons sans comparer les dicts
+        self._latest = {}    # {(user_id, question_id): next_review} = entrée valide
+
+    def __len__(self):
+        return len(self._latest)
+
+    def push(self, review: dict):
+        """Ajoute ou met à jour une révision"""
+        key = (review['user_id'], review['question_id'])
+
+        if self.horizon is None or review['next_review'] > self.horizon:
+            # Hors fenêtre : sera chargée lors de l'extension de l'horizon
+            self._latest.pop(key, None)
+            return
+
+        self._latest[key] = review['next_review']
+        heapq.heappush(self._heap, (review['next_review'], key[0], next(self._seq), key[1], review))
+
+    def requeue(self, review: dict):
+        """Remet une révision dans la file sauf si une version plus récente y est déjà"""
+        if (review['user_id'], review['question_id']) not in self._latest:
+            self.push(review)
+
+    def extend(self, reviews: list, horizon: datetime):
+        """Ajoute une fenêtre de révisions et recule l'horizon"""
+        self.horizon = horizon
+        for review in reviews:
+            self.push(review)
+
+    def pop_due(self, now: datetime) -> list:
+        """Retire et retourne les révisions dues (next_review <= now)"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_review, user_id, _, question_id, review = heapq.heappop(self._heap)
+            key = (user_id, question_id)
+            if self._latest.get(key) != next_review:
+                continue  # Entrée périmée (révision mise à jour depuis)
+            del self._latest[key]
+            due.append(review)
+        return due
+
+
 class ReviewScheduler:
     """Planificateur de révisions automatiques"""
+
+    # Fenêtre de révisions préchargées à l'avance
+    HORIZON = timedelta(hours=1)
     
     def __init__(self, bot, database, quiz_manager):
         self.bot = bot
         self.db = ReviewDatabaseSQL()
         self.quiz_manager = quiz_manager
+        self.queue = DueQueue()
+        self._saved_during_load = None  # Révisions sauvegardées pendant le chargement d'une fenêtre
     
     def start(self):
-        """Démarre le scheduler"""
+        """Démarre le scheduler (à appeler depuis la boucle, ex: on_ready)"""
+        self._loop = asyncio.get_running_loop()
+        # Les révisions sauvegardées mettent à jour la file directement
+        ReviewDatabaseSQL.add_listener(self._on_review_saved)
         if not self.check_reviews.is_running():
             self.check_reviews.start()
     
     def stop(self):
         """Arrête le scheduler"""
+        ReviewDatabaseSQL.remove_listener(self._on_review_saved)
         if self.check_reviews.is_running():
             self.check_reviews.cancel()
     
+    def _on_review_saved(self, review: dict):
+        """Sauvegarde faite dans un thread base de données (run_db) : la file n'est modifiée que dans la boucle"""
+        self._loop.call_soon_threadsafe(self._push_saved, review)
+
+    def _push_saved(self, review: dict):
+        if self._saved_during_load is not None:
+            # Peut être absente du chargement en cours et au-delà de l'horizon actuel
+            self._saved_during_load.append(review)
+        self.queue.push(review)
+
+    def _load_window(self, after, until: datetime) -> list:
+        """Révisions jusqu'au prochain horizon, toutes les dues au premier appel (à appeler via run_db)"""
+        return self.db.get_due_reviews(until=until, after=after)
+
     @tasks.loop(minutes=1)  # Vérifie toutes les minutes
     async def check_reviews(self):
-        """Vérifie les révisions dues et envoie les questions"""
+        """
+        Envoie les révisions dues (travail proportionnel au nombre de révisions dues)
+
+        pop_due retire toutes les révisions dues de la file : celles qui ne sont
+        pas envoyées (quiz actif, erreur d'envoi, tâche annulée pendant la pause)
+        y sont remises dans le finally pour être réessayées au prochain passage.
+        """
         try:
-            all_reviews = self.db.get_all_reviews()
+            now = datetime.now()
+            if self.queue.horizon is None or now >= self.queue.horizon:
+                new_horizon = now + self.HORIZON
+                self._saved_during_load = []
+                try:
+                    reviews = await run_db(self._load_window, self.queue.horizon, new_horizon)
+                    self.queue.extend(reviews, new_horizon)
+                finally:
+                    saved, self._saved_during_load = self._saved_during_load, None
+                for review in saved:
+                    self.queue.push(review)
             
-            for review in all_reviews:
-                # Vérifie si la révision est due
-                if self.db.is_review_due(review):
+            pending = deque(self.queue.pop_due(now))
+            unsent = []
+            try:
+                while pending:
+                    review = pending.popleft()
                     user_id = review['user_id']
                     
                     # Évite d'envoyer si l'utilisateur a déjà un quiz actif
-                    if user_id not in self.quiz_manager.active_quizzes:
+                    if user_id in self.quiz_manager.active_quizzes:
+                        unsent.append(review)
+                        continue
+
+                    try:
                         await self.quiz_manager.send_review_question(user_id, review)
-                        # Pause pour éviter le spam si plusieurs révisions
-                        await asyncio.sleep(2)
+                    except Exception as e:
+                        print(f"❌ Révision Q{review['question_id']} non envoyée à {user_id}: {e}")
+                        unsent.append(review)
+                        continue
+
+                    # Pause pour éviter le spam si plusieurs révisions
+                    await asyncio.sleep(2)
+            finally:
+                # Réessayer au prochain passage
+                for review in [*unsent, *pending]:
+                    self.queue.requeue(review)
         
         except Exception as e:
             print(f"❌ Erreur dans check_reviews: {e}")
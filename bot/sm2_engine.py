@@ -0,0 +1,119 @@
+"""
+Moteur SM-2 unique, utilisé par SpacedRepetition et quiz_reviews_manager
+
+Travaille sur des colonnes (ef, repetitions, interval, quality) :
+- update_batch : version vectorisée NumPy (reprogrammer une cohorte, recalculer
+  après un changement de paramètres, rejouer un historique)
+- update : une seule révision, en Python pur
+
+Sans NumPy, update_batch se rabat sur une boucle Python qui donne exactement
+les mêmes flottants (mêmes opérations dans le même ordre, arrondi à l'entier pair).
+"""
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+
+class SM2Params:
+    """Paramètres d'une variante de SM-2"""
+
+    def __init__(self, first_interval, failed_interval, second_interval=None, growth=None,
+                 min_ef=1.3, pass_quality=3, ef_digits=None):
+        """
+        Args:
+            first_interval: Intervalle (jours) après la première bonne réponse
+            failed_interval: Intervalle (jours) après une mauvaise réponse
+            second_interval: Intervalle après la deuxième bonne réponse (None = croissance normale)
+            growth: Multiplicateur fixe de l'intervalle (None = ancien easiness factor)
+            min_ef: Easiness factor minimum
+            pass_quality: Qualité minimale d'une bonne réponse
+            ef_digits: Nombre de décimales de l'EF (None = pas d'arrondi)
+        """
+        self.first_interval = first_interval
+        self.failed_interval = failed_interval
+        self.second_interval = second_interval
+        self.growth = growth
+        self.min_ef = min_ef
+        self.pass_quality = pass_quality
+        self.ef_scale = 10.0 ** ef_digits if ef_digits is not None else None
+
+
+# spaced_rep.SpacedRepetition : 2 jours, puis ×2.5 ; 10 minutes si erreur ; EF arrondi à 2 décimales
+SPACED_REP_PARAMS = SM2Params(first_interval=2, failed_interval=10 / (60 * 24), growth=2.5, ef_digits=2)
+
+# quiz_reviews_manager : 1 jour, 6 jours, puis × EF ; 1 jour si erreur
+QUIZ_REVIEW_PARAMS = SM2Params(first_interval=1, failed_interval=1, second_interval=6)
+
+
+def update(ef, repetitions, interval, quality, params: SM2Params):
+    """
+    Applique SM-2 à une révision
+
+    Returns:
+        tuple: (ef, repetitions, interval)
+    """
+    if quality >= params.pass_quality:
+        if repetitions == 0:
+            new_interval = params.first_interval
+        elif repetitions == 1 and params.second_interval is not None:
+            new_interval = params.second_interval
+        else:
+            new_interval = interval * (ef if params.growth is None else params.growth)
+        new_repetitions = repetitions + 1
+    else:
+        new_interval = params.failed_interval
+        new_repetitions = 0
+
+    # EF' = EF + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    d = 5 - quality
+    new_ef = ef + (0.1 - d * (0.08 + d * 0.02))
+    if new_ef < params.min_ef:
+        new_ef = params.min_ef
+    if params.ef_scale is not None:
+        # round() sans décimales = arrondi à l'entier pair, comme np.rint
+        new_ef = round(new_ef * params.ef_scale) / params.ef_scale
+
+    return float(new_ef), new_repetitions, float(new_interval)
+
+
+def update_batch(ef, repetitions, interval, quality, params: SM2Params):
+    """
+    Applique SM-2 à des colonnes de révisions
+
+    Args:
+        ef, repetitions, interval, quality: Séquences ou tableaux de même longueur
+
+    Returns:
+        tuple: (ef, repetitions, interval) en tableaux NumPy (listes sans NumPy)
+    """
+    if np is None:
+        columns = [update(*row, params) for row in zip(ef, repetitions, interval, quality)]
+        if not columns:
+            return [], [], []
+        new_ef, new_repetitions, new_interval = zip(*columns)
+        return list(new_ef), list(new_repetitions), list(new_interval)
+
+    ef = np.asarray(ef, dtype=np.float64)
+    repetitions = np.asarray(repetitions, dtype=np.int64)
+    interval = np.asarray(interval, dtype=np.float64)
+    quality = np.asarray(quality)
+
+    correct = quality >= params.pass_quality
+
+    grown = interval * (ef if params.growth is None else params.growth)
+    new_interval = np.where(repetitions == 0, float(params.first_interval), grown)
+    if params.second_interval is not None:
+        new_interval = np.where(repetitions == 1, float(params.second_interval), new_interval)
+    new_interval = np.where(correct, new_interval, float(params.failed_interval))
+
+    new_repetitions = np.where(correct, repetitions + 1, 0)
+
+    d = 5 - quality
+    new_ef = ef + (0.1 - d * (0.08 + d * 0.02))
+    new_ef = np.maximum(new_ef, params.min_ef)
+    if params.ef_scale is not None:
+        new_ef = np.rint(new_ef * params.ef_scale) / params.ef_scale
+
+    return new_ef, new_repetitions, new_interval
@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+import sm2_engine
+from sm2_engine import SPACED_REP_PARAMS
 
 class SpacedRepetition:
     """Implémentation de l'algorithme SM-2 pour la révision espacée"""
@@ -8,6 +10,7 @@ class SpacedRepetition:
         self.min_ef = 1.3      # EF minimum
         self.first_interval_correct = 2  # Jours si première réponse correcte
         self.first_interval_incorrect = 10 / (60 * 24)  # 10 minutes en jours
+        self.params = SPACED_REP_PARAMS
     
     def calculate_first_review(self, user_id, question_id, quality):
         """
@@ -40,24 +43,14 @@ class SpacedRepetition:
         review_data: dict contenant les données de révision actuelles
         quality: 0-5 (0 = oublié, 5 = parfait)
         """
-        ef = review_data['easiness_factor']
-        repetitions = review_data['repetitions']
-        interval = review_data['interval']
-        
-        # Mise à jour de l'Easiness Factor
-        new_ef = self._calculate_ef(ef, quality)
-        
-        if quality < 3:  # Réponse incorrecte - reset
-            new_repetitions = 0
-            new_interval = self.first_interval_incorrect  # 10 minutes
-        else:  # Réponse correcte
-            new_repetitions = repetitions + 1
-            
-            if new_repetitions == 1:
-                new_interval = self.first_interval_correct  # 2 jours
-            else:
-                # Intervalle suivant = intervalle précédent × 2.5 (comme spécifié)
-                new_interval = interval * 2.5
+        # Bonne réponse : 2 jours puis intervalle × 2.5 ; erreur : 10 minutes
+        new_ef, new_repetitions, new_interval = sm2_engine.update(
+            review_data['easiness_factor'],
+            review_data['repetitions'],
+            review_data['interval'],
+            quality,
+            self.params
+        )
         
         next_review = datetime.now() + timedelta(days=new_interval)
         
@@ -70,15 +63,41 @@ class SpacedRepetition:
             'easiness_factor': new_ef
         }
     
+    def update_reviews(self, reviews, qualities):
+        """
+        Met à jour plusieurs révisions en un seul calcul vectorisé
+        reviews: liste de dicts (même format que update_review)
+        qualities: liste de qualités 0-5, dans le même ordre
+        """
+        new_ef, new_repetitions, new_interval = sm2_engine.update_batch(
+            [review['easiness_factor'] for review in reviews],
+            [review['repetitions'] for review in reviews],
+            [review['interval'] for review in reviews],
+            qualities,
+            self.params
+        )
+        
+        now = datetime.now()
+        return [{
+            'user_id': review['user_id'],
+            'question_id': review['question_id'],
+            'next_review': now + timedelta(days=interval),
+            'interval': interval,
+            'repetitions': repetitions,
+            'easiness_factor': ef
+        } for review, ef, repetitions, interval in zip(
+            reviews, _tolist(new_ef), _tolist(new_repetitions), _tolist(new_interval)
+        )]
+    
     def _calculate_ef(self, current_ef, quality):
         """
         Calcule le nouvel Easiness Factor selon la formule SM-2
-        EF' = EF + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+        EF' = EF + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)), minimum 1.3
         """
-        new_ef = current_ef + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
-        
-        # L'EF ne peut pas descendre en dessous de 1.3
-        if new_ef < self.min_ef:
-            new_ef = self.min_ef
-        
-        return round(new_ef, 2)
+        new_ef, _, _ = sm2_engine.update(current_ef, 0, 0, quality, self.params)
+        return new_ef
+
+
+def _tolist(column):
+    """Convertit une colonne NumPy en liste de scalaires Python"""
+    return column.tolist() if hasattr(column, 'tolist') else column
@@ -1,7 +1,9 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from threading import Thread
 import json
 import os
+from metrics import render
+from loop_monitor import get_loop_monitor
 
 app = Flask('')
 
@@ -17,6 +19,16 @@ def set_bot(bot):
 def home():
     return "Le bot est en ligne"
 
+@app.route('/metrics')
+def metrics():
+    """Métriques du bot au format texte Prometheus (boucle, commandes, tâches planifiées)"""
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/stalls')
+def metrics_stalls():
+    """Derniers blocages de la boucle asyncio avec la pile de l'appel bloquant"""
+    return jsonify(list(get_loop_monitor().stalls))
+
 @app.route('/api/user/<user_id>')
 def get_user_cohort(user_id):
     """API pour récupérer la cohorte d'un utilisateur"""
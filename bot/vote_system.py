@@ -9,6 +9,8 @@ from datetime import datetime
 from sqlalchemy import func
 from db_connection import SessionLocal
 from models import Utilisateur, Vote, ExamPeriod
+from db_executor import run_db
+from web_sync import invalidate_web_cache
 import traceback
 
 class VoteSystem:
@@ -47,21 +49,60 @@ class VoteSystem:
         # On diffère la réponse car les opérations DB peuvent prendre > 3s
         await interaction.response.defer(ephemeral=True)
         
-        db = SessionLocal()
+        # Filtrer les utilisateurs valides (ignorer les None) et dédoublonner
+        potential_votes = [u for u in [user1, user2, user3] if u is not None]
+        voted_users_unique = list(set(potential_votes))
+
         try:
-            voter_id = interaction.user.id
+            # Vérifications et enregistrement dans un thread base de données
+            errors, voted_ids = await run_db(
+                self._record_votes, interaction.user.id, [(m.id, m.mention) for m in voted_users_unique]
+            )
+
+            if errors:
+                await interaction.followup.send("\n".join(errors), ephemeral=True)
+                return
+
+            # Le site relit has_voted avant d'ouvrir l'examen
+            await invalidate_web_cache(user_ids=[interaction.user.id])
             
+            # Réponse positive
+            mentions = " ".join([f"<@{user_id}>" for user_id in voted_ids])
+            embed = discord.Embed(
+                title="✅ Votes enregistrés",
+                description=f"Merci pour ton entraide ! Tes votes ont été comptabilisés pour :\n{mentions}",
+                color=discord.Color.green()
+            )
+            embed.set_footer(text="Tu peux maintenant accéder à l'examen.")
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            print(f"❌ Erreur critique dans vote_command: {e}")
+            traceback.print_exc()
+            await interaction.followup.send("Une erreur interne est survenue lors du vote.", ephemeral=True)
+
+    def _record_votes(self, voter_id: int, targets: list):
+        """
+        Vérifie et enregistre les votes (exécuté hors de la boucle asyncio)
+
+        Args:
+            targets: [(user_id, mention)] des personnes choisies (dédoublonnées)
+
+        Returns:
+            Tuple(errors, voted_ids) : messages d'erreur (rien n'est enregistré)
+            ou liste des user_id pour qui le vote a été enregistré
+        """
+        db = SessionLocal()
+        try:
             # 1. Vérifier que l'utilisateur est inscrit
             voter = db.query(Utilisateur).filter(Utilisateur.user_id == voter_id).first()
             if not voter:
-                await interaction.followup.send("❌ Tu dois d'abord t'inscrire avec `/register`", ephemeral=True)
-                return
+                return ["❌ Tu dois d'abord t'inscrire avec `/register`"], []
 
             # 2. Vérifier qu'il y a un examen en cours pour son groupe
             exam_period = self.get_active_exam_period(voter.niveau_actuel)
             if not exam_period:
-                await interaction.followup.send("❌ Aucune période de vote/examen active pour ton groupe actuellement.", ephemeral=True)
-                return
+                return ["❌ Aucune période de vote/examen active pour ton groupe actuellement."], []
 
             # 3. Vérifier s'il a déjà voté pour cet examen spécifique
             existing_votes = db.query(Vote).filter(
@@ -70,47 +111,43 @@ class VoteSystem:
             ).count()
             
             if existing_votes > 0:
-                await interaction.followup.send("❌ Tu as déjà voté pour cette session d'examen !", ephemeral=True)
-                return
-            
-            # 4. Filtrer les utilisateurs valides (ignorer les None)
-            potential_votes = [u for u in [user1, user2, user3] if u is not None]
-            
-            # Dédoublonner si l'utilisateur a mis 2 fois la même personne
-            voted_users_unique = list(set(potential_votes))
+                return ["❌ Tu as déjà voté pour cette session d'examen !"], []
 
-            # Minimum 1 vote requis (pour les tests)
-            if len(voted_users_unique) < 1:
-                await interaction.followup.send("❌ Tu dois voter pour au moins 1 personne.", ephemeral=True)
-                return
+            # 4. Minimum 1 vote requis (pour les tests)
+            if len(targets) < 1:
+                return ["❌ Tu dois voter pour au moins 1 personne."], []
 
-            # 5. Vérifications sur les candidats
+            # 5. Vérifications sur les candidats (une seule requête)
+            target_ids = [user_id for user_id, _ in targets]
+            registered = {
+                user.user_id: user
+                for user in db.query(Utilisateur).filter(Utilisateur.user_id.in_(target_ids))
+            }
             errors = []
             valid_targets = []
             
-            for target_member in voted_users_unique:
+            for target_id, mention in targets:
                 # A. Pas de vote pour soi-même
-                if target_member.id == voter_id:
-                    errors.append(f"❌ Tu ne peux pas voter pour toi-même ({target_member.mention}).")
+                if target_id == voter_id:
+                    errors.append(f"❌ Tu ne peux pas voter pour toi-même ({mention}).")
                     continue
                 
                 # B. Le candidat est-il inscrit dans la DB ?
-                target_db = db.query(Utilisateur).filter(Utilisateur.user_id == target_member.id).first()
+                target_db = registered.get(target_id)
                 if not target_db:
-                    errors.append(f"❌ {target_member.mention} n'est pas inscrit dans le système.")
+                    errors.append(f"❌ {mention} n'est pas inscrit dans le système.")
                     continue
                 
                 # C. Le candidat est-il dans le même groupe ?
                 if target_db.niveau_actuel != voter.niveau_actuel:
-                    errors.append(f"❌ {target_member.mention} n'est pas dans ton groupe (Groupe {voter.niveau_actuel}).")
+                    errors.append(f"❌ {mention} n'est pas dans ton groupe (Groupe {voter.niveau_actuel}).")
                     continue
                 
                 valid_targets.append(target_db)
             
             # Si erreurs, on arrête tout
             if errors:
-                await interaction.followup.send("\n".join(errors), ephemeral=True)
-                return
+                return errors, []
             
             # 6. Enregistrement des votes
             for target in valid_targets:
@@ -125,24 +162,14 @@ class VoteSystem:
             # 7. Marquer le votant comme ayant participé
             voter.has_voted = True
             voter.current_exam_period = exam_period.id
+            voted_ids = [target.user_id for target in valid_targets]
             
             db.commit()
-            
-            # 8. Réponse positive
-            mentions = " ".join([f"<@{u.user_id}>" for u in valid_targets])
-            embed = discord.Embed(
-                title="✅ Votes enregistrés",
-                description=f"Merci pour ton entraide ! Tes votes ont été comptabilisés pour :\n{mentions}",
-                color=discord.Color.green()
-            )
-            embed.set_footer(text="Tu peux maintenant accéder à l'examen.")
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            
-        except Exception as e:
+            return [], voted_ids
+
+        except Exception:
             db.rollback()
-            print(f"❌ Erreur critique dans vote_command: {e}")
-            traceback.print_exc()
-            await interaction.followup.send("Une erreur interne est survenue lors du vote.", ephemeral=True)
+            raise
         finally:
             db.close()
 
@@ -0,0 +1,63 @@
+"""
+Notifications du bot vers le site web (invalidation des caches)
+
+Le site met en cache des données Discord (rôles des membres, etc.) ainsi que
+les utilisateurs et les périodes d'examen : le bot le prévient quand elles
+changent au lieu d'attendre l'expiration des TTL.
+
+Variables d'environnement :
+- WEB_INTERNAL_URL : URL du site (ex: http://localhost:5000), désactivé si absente
+- INTERNAL_API_TOKEN : secret partagé avec le site
+"""
+
+import os
+import aiohttp
+
+WEB_INTERNAL_URL = os.getenv('WEB_INTERNAL_URL')
+INTERNAL_API_TOKEN = os.getenv('INTERNAL_API_TOKEN')
+
+_session = None
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Session HTTP partagée (connexions réutilisées)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+    return _session
+
+
+async def notify_web(path: str, payload: dict) -> bool:
+    """
+    Envoie une notification au site (ne lève jamais : le cache du site expire de toute façon)
+
+    Returns:
+        bool: True si le site a accepté la notification
+    """
+    if not WEB_INTERNAL_URL or not INTERNAL_API_TOKEN:
+        return False
+
+    try:
+        session = await _get_session()
+        async with session.post(
+            f"{WEB_INTERNAL_URL.rstrip('/')}{path}",
+            json=payload,
+            headers={'X-Internal-Token': INTERNAL_API_TOKEN}
+        ) as response:
+            if response.status != 200:
+                print(f"⚠️ Notification site {path} refusée ({response.status})")
+                return False
+            return True
+    except Exception as e:
+        print(f"⚠️ Notification site {path} impossible: {e}")
+        return False
+
+
+async def invalidate_discord_roles(user_id: int = None, guild_roles: bool = False) -> bool:
+    """Invalide le cache des rôles Discord du site (un membre et/ou la liste des rôles)"""
+    return await notify_web('/api/discord/invalidate', {'user_id': user_id, 'guild_roles': guild_roles})
+
+
+async def invalidate_web_cache(user_ids: list = None, exam_periods: bool = False) -> bool:
+    """Invalide le cache du site (utilisateurs modifiés par le bot et/ou périodes d'examen)"""
+    return await notify_web('/api/cache/invalidate', {'user_ids': user_ids or [], 'exam_periods': exam_periods})
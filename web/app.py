@@ -5,23 +5,42 @@ Site Web - Version Finale
 3. Cours d'arabe filtré par niveau
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 import json
 from datetime import datetime, timezone, timedelta
 import os
-from db_connection import SessionLocal
-from models import Utilisateur, ExamResult, ExamPeriod
+os.environ.setdefault('DB_PROFILE', 'web')  # Pool de connexions du site (voir db_connection.py)
+from db_connection import SessionLocal, engine
+from models import Utilisateur, ExamResult
 from sqlalchemy import func
-import exercise_types
-import requests
+from sqlalchemy.orm import scoped_session
+import hmac
 from group_manager import GroupManager
+from exam_catalog import get_catalog
+from discord_roles import get_resolver
+from metrics import render as render_metrics
+from route_metrics import init_app as init_route_metrics, query_budget
+from read_cache import ReadCache
 
 app = Flask(__name__)
 app.secret_key = 'secret'
 
-# Charger les examens
-with open('exam.json', 'r', encoding='utf-8') as f:
-    exams_data = json.load(f)
+# Durée, temps base de données et requêtes SQL par route (/metrics)
+init_route_metrics(app, engine)
+
+# Une session par requête HTTP, fermée à la fin de la requête (shutdown_session)
+db_session = scoped_session(SessionLocal)
+
+# Utilisateurs et périodes d'examen en cache (invalidés par le site et le bot)
+read_cache = ReadCache(db_session)
+
+
+@app.teardown_appcontext
+def shutdown_session(exception=None):
+    db_session.remove()
+
+# Charger les examens (index + plans de correction, rechargés si exam.json change)
+exam_catalog = get_catalog('exam.json')
 
 # Charger les cours d'arabe
 with open('arabic_courses.json', 'r', encoding='utf-8') as f:
@@ -113,41 +132,18 @@ def check_user_has_admin_role(user_id: int) -> bool:
         bool: True si l'utilisateur a un rôle contenant 'admin', False sinon
     """
     try:
-        discord_token = os.getenv('DISCORD_TOKEN')
-        guild_id = os.getenv('GUILD_ID')
+        resolver = get_resolver()
 
-        if not discord_token or not guild_id:
+        if not resolver:
             print("⚠️ DISCORD_TOKEN ou GUILD_ID manquant - impossible de vérifier le rôle admin")
             return False
 
-        # Récupérer les informations du membre via l'API Discord
-        url = f"https://discord.com/api/v10/guilds/{guild_id}/members/{user_id}"
-        headers = {"Authorization": f"Bot {discord_token}"}
-
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            print(f"❌ Erreur API Discord ({response.status_code}): {response.text}")
-            return False
-
-        member_data = response.json()
-        role_ids = member_data.get('roles', [])
-
-        # Récupérer tous les rôles du serveur
-        roles_url = f"https://discord.com/api/v10/guilds/{guild_id}/roles"
-        roles_response = requests.get(roles_url, headers=headers)
-
-        if roles_response.status_code != 200:
-            print(f"❌ Erreur API Discord roles ({roles_response.status_code})")
-            return False
-
-        all_roles = roles_response.json()
+        # Rôles du membre et du serveur mis en cache (voir discord_roles.py)
+        role_name = resolver.has_role_matching(user_id, 'admin')
 
-        # Vérifier si l'utilisateur a un rôle contenant 'admin' (insensible à la casse)
-        for role in all_roles:
-            if role['id'] in role_ids and 'admin' in role['name'].lower():
-                print(f"✅ Utilisateur {user_id} a le rôle admin: {role['name']}")
-                return True
+        if role_name:
+            print(f"✅ Utilisateur {user_id} a le rôle admin: {role_name}")
+            return True
 
         return False
 
@@ -162,16 +158,15 @@ def find_available_group(niveau: int, db) -> str:
     Retourne: "1-A", "2-B", etc.
     """
     letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']
+    groupes = [f"{niveau}-{letter}" for letter in letters]
 
-    for letter in letters:
-        groupe_name = f"{niveau}-{letter}"
-
-        # Compter combien d'utilisateurs sont dans ce groupe
-        count = db.query(func.count(Utilisateur.user_id)).filter(
-            Utilisateur.groupe == groupe_name
-        ).scalar()
+    # Compter les utilisateurs de tous les groupes en une seule requête
+    counts = dict(db.query(Utilisateur.groupe, func.count(Utilisateur.user_id)).filter(
+        Utilisateur.groupe.in_(groupes)
+    ).group_by(Utilisateur.groupe).all())
 
-        if count < 15:
+    for groupe_name in groupes:
+        if counts.get(groupe_name, 0) < 15:
             return groupe_name
 
     # Si tous les groupes A-J sont pleins, retourner K
@@ -273,7 +268,6 @@ def courses():
     if request.method == 'GET':
         return render_template('courses_id.html')
 
-    db = None
     try:
         user_id_str = request.form.get('user_id', '').strip()
 
@@ -283,8 +277,7 @@ def courses():
         user_id = int(user_id_str)
 
         # Chercher l'utilisateur
-        db = SessionLocal()
-        user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+        user = read_cache.get_user(user_id)
 
         if not user:
             return render_template('courses_id.html',
@@ -308,15 +301,11 @@ def courses():
     except Exception as e:
         print(f"Erreur /courses: {e}")
         return render_template('courses_id.html', error=f"Erreur: {e}")
-    finally:
-        if db:
-            db.close()
 
 
 @app.route('/courses/lesson/<int:lesson_id>')
 def course_lesson(lesson_id):
     """Page d'affichage d'une leçon spécifique"""
-    db = None
     try:
         user_id = request.args.get('user_id')
         if not user_id:
@@ -325,8 +314,7 @@ def course_lesson(lesson_id):
         user_id = int(user_id)
 
         # Vérifier l'utilisateur et son niveau
-        db = SessionLocal()
-        user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+        user = read_cache.get_user(user_id)
 
         if not user:
             return render_template('courses_id.html', error="Utilisateur non trouve")
@@ -358,15 +346,11 @@ def course_lesson(lesson_id):
     except Exception as e:
         print(f"Erreur /courses/lesson/{lesson_id}: {e}")
         return render_template('courses_id.html', error=f"Erreur: {e}")
-    finally:
-        if db:
-            db.close()
 
 
 @app.route('/courses/exercises/<int:sheet_id>')
 def course_exercises(sheet_id):
     """Page d'exercices pour une fiche donnée"""
-    db = None
     try:
         user_id = request.args.get('user_id')
         if not user_id:
@@ -375,8 +359,7 @@ def course_exercises(sheet_id):
         user_id = int(user_id)
 
         # Vérifier l'utilisateur et son niveau
-        db = SessionLocal()
-        user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+        user = read_cache.get_user(user_id)
 
         if not user:
             return render_template('courses_id.html', error="Utilisateur non trouve")
@@ -399,9 +382,6 @@ def course_exercises(sheet_id):
     except Exception as e:
         print(f"Erreur /courses/exercises/{sheet_id}: {e}")
         return render_template('courses_id.html', error=f"Erreur: {e}")
-    finally:
-        if db:
-            db.close()
 
 
 @app.route('/exam_secure')
@@ -416,16 +396,52 @@ def exam_secure():
     return render_template('exam_secure.html')
 
 
+@app.route('/api/discord/invalidate', methods=['POST'])
+def api_discord_invalidate():
+    """
+    Appelé par le bot quand des rôles changent (invalide le cache des rôles)
+    Protégé par le secret partagé INTERNAL_API_TOKEN (en-tête X-Internal-Token)
+    """
+    internal_token = os.getenv('INTERNAL_API_TOKEN')
+    if not internal_token or not hmac.compare_digest(request.headers.get('X-Internal-Token', ''), internal_token):
+        return jsonify({'error': 'Non autorisé'}), 403
+
+    resolver = get_resolver()
+    if resolver:
+        data = request.get_json(silent=True) or {}
+        user_id = data.get('user_id')
+        resolver.invalidate(
+            user_id=int(user_id) if user_id is not None else None,
+            guild_roles=bool(data.get('guild_roles'))
+        )
+
+    return jsonify({'success': True})
+
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def api_cache_invalidate():
+    """
+    Appelé par le bot après des écritures (votes, bonus, promotions, périodes d'examen)
+    Protégé par le secret partagé INTERNAL_API_TOKEN (en-tête X-Internal-Token)
+    """
+    internal_token = os.getenv('INTERNAL_API_TOKEN')
+    if not internal_token or not hmac.compare_digest(request.headers.get('X-Internal-Token', ''), internal_token):
+        return jsonify({'error': 'Non autorisé'}), 403
+
+    data = request.get_json(silent=True) or {}
+    read_cache.invalidate(
+        user_ids=[int(user_id) for user_id in data.get('user_ids') or []],
+        exam_periods=bool(data.get('exam_periods'))
+    )
+    return jsonify({'success': True})
+
+
 @app.route('/api/get_exam/<int:exam_id>')
 def api_get_exam(exam_id):
     """API pour récupérer les données d'un examen"""
     try:
-        # Chercher l'examen dans exam.json
-        exam = None
-        for e in exams_data:
-            if e['id'] == exam_id:
-                exam = e
-                break
+        # Chercher l'examen dans le catalogue
+        exam = exam_catalog.get(exam_id)
         
         if not exam:
             return jsonify({'error': 'Examen introuvable'}), 404
@@ -437,6 +453,7 @@ def api_get_exam(exam_id):
 
 
 @app.route('/api/submit_exam', methods=['POST'])
+@query_budget(7)  # Promotion : GroupManager.promote_user (groupes du niveau + group_change_events), NOTIFY read_cache
 def api_submit_exam():
     """API pour soumettre un examen"""
     try:
@@ -447,13 +464,10 @@ def api_submit_exam():
         
         if not user_id or not exam_id or answers is None:
             return jsonify({'error': 'Données manquantes'}), 400
+        user_id = int(data['user_id'])  # Clé int du cache (read_cache) et de la base
         
         # Charger l'examen
-        exam = None
-        for e in exams_data:
-            if e['id'] == exam_id:
-                exam = e
-                break
+        exam = exam_catalog.get(exam_id)
         
         if not exam:
             return jsonify({'error': 'Examen introuvable'}), 404
@@ -483,53 +497,47 @@ def api_submit_exam():
         passed = percentage >= passing_score
         
         # Sauvegarder en DB
-        db = SessionLocal()
-        try:
-            # Vérifier si l'utilisateur existe
-            user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
-            
-            if not user:
-                return jsonify({'error': 'Utilisateur introuvable'}), 404
-            
-            # Créer le résultat
-            exam_result = ExamResult(
-                user_id=user_id,
-                exam_id=exam_id,
-                exam_title=exam['title'],
-                score=score,
-                total=total,
-                percentage=percentage,
-                passed=passed,
-                passing_score=passing_score,
-                date=datetime.now(),
-                notified=False,
-                results=results
-            )
-            
-            db.add(exam_result)
-            
-            # Si réussi, promouvoir
-            if passed:
-                old_niveau = user.niveau_actuel
-                user.niveau_actuel += 1
-                user.examens_reussis += 1
-                
-                # Calculer le nouveau groupe
-                new_groupe = f"{user.niveau_actuel}-{user.groupe.split('-')[1]}"
-                user.groupe = new_groupe
-            
-            db.commit()
-            
-            return jsonify({
-                'success': True,
-                'score': score,
-                'total': total,
-                'percentage': percentage,
-                'passed': passed
-            })
+        db = db_session()
+
+        # Vérifier si l'utilisateur existe
+        user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+        
+        if not user:
+            return jsonify({'error': 'Utilisateur introuvable'}), 404
+        
+        # Créer le résultat
+        exam_result = ExamResult(
+            user_id=user_id,
+            exam_id=exam_id,
+            exam_title=exam['title'],
+            score=score,
+            total=total,
+            percentage=percentage,
+            passed=passed,
+            passing_score=passing_score,
+            date=datetime.now(),
+            notified=False,
+            results=results
+        )
         
-        finally:
-            db.close()
+        db.add(exam_result)
+        db.flush()
+        
+        # Si réussi, promouvoir comme /submit_exam (group_change_events : rôles Discord mis à jour par le bot)
+        if passed:
+            old_groupe, new_groupe = GroupManager(db).promote_user(user_id)
+            print(f"🎉 Promotion {user_id} : {old_groupe} → {new_groupe}")
+        
+        db.commit()
+        read_cache.invalidate(user_ids=[user_id])
+        
+        return jsonify({
+            'success': True,
+            'score': score,
+            'total': total,
+            'percentage': percentage,
+            'passed': passed
+        })
     
     except Exception as e:
         print(f"Erreur submit_exam: {e}")
@@ -539,54 +547,45 @@ def api_submit_exam():
 
 
 @app.route('/exams', methods=['GET', 'POST'])
+@query_budget(6)
 def exams():
     """Page d'examens avec vérification du vote"""
     if request.method == 'GET':
         # Vérifier si l'utilisateur a une session active
         if 'user_id' in session and 'exam_period_id' in session:
-            # Rediriger vers POST pour traiter la session
-            db = SessionLocal()
-            try:
-                user_id = session['user_id']
-                user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
-                now = datetime.utcnow()
-
-                if user:
-                    # Vérifier si la période d'examen est toujours active
-                    exam_period = db.query(ExamPeriod).filter(
-                        ExamPeriod.id == session['exam_period_id'],
-                        ExamPeriod.start_time <= now,
-                        ExamPeriod.end_time >= now
-                    ).first()
-
-                    if exam_period:
-                        # Trouver l'examen
-                        exam = None
-                        for e in exams_data['exams']:
-                            if e['group'] == user.niveau_actuel:
-                                exam = e
-                                break
-
-                        if exam:
-                            # Retourner directement à l'examen
-                            return render_template('exam_secure.html',
-                                exam=exam,
-                                user_id=user_id,
-                                exam_period=exam_period,
-                                user_info={
-                                    'username': user.username,
-                                    'niveau_actuel': user.niveau_actuel,
-                                    'groupe': user.groupe
-                                })
-                    else:
-                        # Période expirée, nettoyer la session
-                        session.clear()
-            finally:
-                db.close()
+            # Rediriger vers POST pour traiter la session (utilisateur et périodes en cache)
+            user_id = session['user_id']
+            user = read_cache.get_user(user_id)
+            now = datetime.utcnow()
+
+            if user:
+                # Vérifier si la période d'examen est toujours active
+                exam_period = next((
+                    p for p in read_cache.get_exam_periods(user.niveau_actuel)
+                    if p.id == session['exam_period_id'] and p.start_time <= now <= p.end_time
+                ), None)
+
+                if exam_period:
+                    # Trouver l'examen
+                    exam = exam_catalog.get_for_level(user.niveau_actuel)
+
+                    if exam:
+                        # Retourner directement à l'examen
+                        return render_template('exam_secure.html',
+                            exam=exam,
+                            user_id=user_id,
+                            exam_period=exam_period,
+                            user_info={
+                                'username': user.username,
+                                'niveau_actuel': user.niveau_actuel,
+                                'groupe': user.groupe
+                            })
+                else:
+                    # Période expirée, nettoyer la session
+                    session.clear()
 
         return render_template('exams_id.html')
     
-    db = None
     try:
         user_id_str = request.form.get('user_id', '').strip()
         
@@ -595,9 +594,8 @@ def exams():
         
         user_id = int(user_id_str)
         
-        # 1. Chercher l'utilisateur
-        db = SessionLocal()
-        user = db.query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+        # 1. Chercher l'utilisateur (en cache : les rafraîchissements de la salle d'attente ne touchent pas la base)
+        user = read_cache.get_user(user_id)
 
         if not user:
             return render_template('exams_id.html',
@@ -609,25 +607,16 @@ def exams():
         # Debug : afficher l'heure actuelle
         print(f"🕐 Heure serveur (UTC): {now.strftime('%d/%m/%Y %H:%M:%S')}")
 
-        exam_period = db.query(ExamPeriod).filter(
-            ExamPeriod.group_number == user.niveau_actuel,
-            ExamPeriod.start_time <= now,
-            ExamPeriod.end_time >= now
-        ).first()
+        # Périodes du niveau en cache (une requête au plus par EXAM_PERIODS_TTL)
+        exam_period = read_cache.get_active_period(user.niveau_actuel, now)
 
         # Debug : afficher les périodes trouvées
-        all_periods = db.query(ExamPeriod).filter(
-            ExamPeriod.group_number == user.niveau_actuel
-        ).all()
-        for p in all_periods:
+        for p in read_cache.get_exam_periods(user.niveau_actuel):
             print(f"📅 Période trouvée - Début: {p.start_time}, Fin: {p.end_time}, Active: {p.start_time <= now <= p.end_time}")
 
         if not exam_period:
             # Chercher la prochaine période d'examen
-            next_period = db.query(ExamPeriod).filter(
-                ExamPeriod.group_number == user.niveau_actuel,
-                ExamPeriod.start_time > now
-            ).order_by(ExamPeriod.start_time).first()
+            next_period = read_cache.get_next_period(user.niveau_actuel, now)
 
             if next_period:
                 # Calculer le temps restant jusqu'au début
@@ -696,15 +685,11 @@ def exams():
 
         # 3. Vérifier si l'utilisateur a déjà passé l'examen PENDANT CETTE PÉRIODE
         # Trouver l'examen correspondant au niveau
-        exam = None
-        for e in exams_data['exams']:
-            if e['group'] == user.niveau_actuel:
-                exam = e
-                break
+        exam = exam_catalog.get_for_level(user.niveau_actuel)
 
         if exam:
             # Vérifier s'il existe déjà un résultat pour cet examen PENDANT cette période
-            existing_result = db.query(ExamResult).filter(
+            existing_result = db_session.query(ExamResult).filter(
                 ExamResult.user_id == user_id,
                 ExamResult.exam_id == exam['id'],
                 ExamResult.date >= exam_period.start_time,
@@ -762,71 +747,31 @@ def exams():
     
     except Exception as e:
         return render_template('exams_id.html', error=f"Erreur: {e}")
-    
-    finally:
-        if db:
-            db.close()
+
 
 @app.route('/submit_exam', methods=['POST'])
+@query_budget(9)  # Dont NOTIFY read_cache (PostgreSQL) après la promotion ou l'échec
 def submit_exam():
     """
     Soumet un examen
     SI RÉUSSI (≥70%) → PROMOUVOIR automatiquement
     """
-    db = None
     try:
         data = request.get_json()
         user_id = int(data['user_id'])
         exam_id = int(data['exam_id'])
         answers = data['answers']
         
-        # Trouver l'examen
-        exam = None
-        for e in exams_data['exams']:
-            if e['id'] == exam_id:
-                exam = e
-                break
+        # Trouver l'examen et son plan de correction précalculé
+        plan = exam_catalog.get_plan(exam_id)
         
-        if not exam:
+        if not plan:
             return jsonify({'success': False, 'message': 'Examen introuvable'}), 404
         
-        # Calculer le score
-        score = 0
-        total_points = 0
-        results = []
+        exam = plan.exam
         
-        for question in exam['questions']:
-            q_id = question['id']
-            user_answer = answers.get(str(q_id))
-
-            # Utiliser le système de validation des exercices
-            correct = exercise_types.validate_question(question, user_answer)
-
-            points = question.get('points', 1)
-            total_points += points
-
-            if correct:
-                score += points
-
-            # Déterminer la réponse correcte à afficher (selon le type)
-            q_type = question.get('type', 'qcm')
-            if q_type == 'matching':
-                correct_answer = "Voir paires correctes"
-            elif q_type in ['text_input', 'translation']:
-                correct_answer = question.get('accept', [question.get('correct', question.get('correct_ar', ''))])
-            elif q_type == 'word_order':
-                correct_answer = ' '.join(question.get('correct_order', []))
-            else:
-                correct_answer = question.get('correct', '')
-
-            results.append({
-                'question_id': q_id,
-                'question_text': question['text'],
-                'user_answer': user_answer,
-                'correct_answer': correct_answer,
-                'is_correct': correct,
-                'points': points
-            })
+        # Calculer le score (réponses acceptées déjà normalisées)
+        score, total_points, results = plan.grade(answers)
         
         percentage = round((score / total_points) * 100, 2)
         passed = percentage >= exam.get('passing_score', 70)
@@ -838,7 +783,7 @@ def submit_exam():
         print(f"   Statut: {'✅ RÉUSSI' if passed else '❌ ÉCHOUÉ'}")
         
         # Sauvegarder le résultat
-        db = SessionLocal()
+        db = db_session()
         
         exam_result = ExamResult(
             user_id=user_id,
@@ -854,9 +799,10 @@ def submit_exam():
             results=results
         )
         
+        # Le résultat est validé dans la même transaction que le changement de groupe
+        # (et l'événement group_change_events que le bot applique sur Discord)
         db.add(exam_result)
-        db.commit()
-        print(f"✅ Résultat sauvegardé en base")
+        db.flush()
 
         # Utiliser GroupManager pour gérer la suite
         group_manager = GroupManager(db)
@@ -879,7 +825,7 @@ def submit_exam():
                     elif "Waiting List" in new_groupe:
                         print(f"📋 {user.username} en waiting list pour le niveau {user.niveau_actuel}")
                     else:
-                        print(f"💡 Utilise /actualiser_exams sur Discord pour appliquer les changements")
+                        print(f"🔔 Rôles Discord mis à jour par le bot (group_change_events)")
                 elif user.niveau_actuel == 5:
                     # Niveau 5 terminé → Alumni
                     user.is_alumni = True
@@ -907,8 +853,13 @@ def submit_exam():
                 elif result_info['action'] == 'waiting_list':
                     print(f"   En waiting list: {result_info['raison']}")
 
-                print(f"💡 Utilise /actualiser_exams sur Discord pour appliquer les changements")
+                if result_info['action'] != 'waiting_list':
+                    print(f"🔔 Rôles Discord mis à jour par le bot (group_change_events)")
 
+        db.commit()
+        # Niveau, groupe ou rattrapage modifiés par promote_user / handle_exam_failure
+        read_cache.invalidate(user_ids=[user_id])
+        print(f"✅ Résultat sauvegardé en base")
         print(f"{'='*50}\n")
 
         # Nettoyer la session une fois l'examen soumis
@@ -928,19 +879,19 @@ def submit_exam():
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'message': str(e)}), 500
-    
-    finally:
-        if db:
-            db.close()
+
+
+@app.route('/metrics')
+def metrics():
+    """Métriques du site au format texte Prometheus (durée, temps base de données, requêtes SQL par route)"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/debug/users')
 def debug_users():
     """DEBUG : Liste tous les utilisateurs"""
-    db = None
     try:
-        db = SessionLocal()
-        users = db.query(Utilisateur).all()
+        users = db_session.query(Utilisateur).all()
         
         users_list = []
         for user in users:
@@ -959,10 +910,6 @@ def debug_users():
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    
-    finally:
-        if db:
-            db.close()
 
 
 if __name__ == '__main__':
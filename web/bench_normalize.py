@@ -0,0 +1,98 @@
+"""
+Micro-benchmark : normalisation des réponses arabes (exercise_types)
+Compare l'ancienne version (15 str.replace) avec la passe unique (regex / str.translate),
+sur un corpus de réponses réalistes (mots des cours, tachkil et espaces aléatoires)
+
+Usage: python bench_normalize.py [--answers 100000]
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+import exercise_types
+
+DIACRITICS = exercise_types.DIACRITICS
+TRANSLATE_TABLE = str.maketrans({diacritic: None for diacritic in DIACRITICS})
+
+
+def legacy_normalize(text):
+    """Ancienne normalize_arabic_text (référence)"""
+    if not text:
+        return ""
+    text = text.strip()
+    text = ' '.join(text.split())
+    for diacritic in DIACRITICS:
+        text = text.replace(diacritic, '')
+    return text
+
+
+def load_words():
+    """Mots arabes de arabic_courses.json et des réponses acceptées de exam.json"""
+    words = set()
+    for path in ('arabic_courses.json', 'exam.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        words.update(re.findall(r'[؀-ۿ]{2,}', content))
+    return sorted(words)
+
+
+def make_answer(words):
+    """Réponse d'élève : 1 à 4 mots, tachkil partiel, espaces parasites"""
+    chosen = random.sample(words, random.randint(1, min(4, len(words))))
+    letters = []
+    for char in ' '.join(chosen):
+        letters.append(char)
+        if char != ' ' and random.random() < 0.3:
+            letters.append(random.choice(DIACRITICS))
+        if char == ' ' and random.random() < 0.2:
+            letters.append('  ')
+    return random.choice(['', ' ', '  ']) + ''.join(letters) + random.choice(['', ' ', '\n'])
+
+
+def bench(label, func, corpus):
+    start = time.perf_counter()
+    for answer in corpus:
+        func(answer)
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<28} {elapsed * 1000:8.1f} ms  ({elapsed / len(corpus) * 1e6:.2f} µs/réponse)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--answers', type=int, default=100000)
+    args = parser.parse_args()
+
+    words = load_words()
+    corpus = [make_answer(words) for _ in range(args.answers)]
+    print(f"📦 {len(corpus)} réponses ({len(words)} mots arabes distincts)")
+
+    mismatches = sum(legacy_normalize(a) != exercise_types.normalize_arabic_text(a) for a in corpus)
+    print(f"{'✅' if not mismatches else '❌'} Résultats identiques à l'ancienne version : {len(corpus) - mismatches}/{len(corpus)}")
+
+    print("\n⏱️ Normalisation d'une réponse")
+    legacy = bench("15 × str.replace", legacy_normalize, corpus)
+    new = bench("regex (défaut)", exercise_types.normalize_arabic_text, corpus)
+    bench("str.translate seul", lambda a: ' '.join(a.split()).translate(TRANSLATE_TABLE), corpus)
+    bench("str.translate + pliage", lambda a: exercise_types.normalize_arabic_text(a, fold=True), corpus)
+    bench("NFKC + translate + pliage", lambda a: exercise_types.normalize_arabic_text(a, nfkc=True, fold=True), corpus)
+    print(f"   → ×{legacy / new:.1f}")
+
+    # Correction complète : les réponses acceptées étaient renormalisées à chaque soumission
+    with open('exam.json', 'r', encoding='utf-8') as f:
+        question = next(q for e in json.load(f)['exams'] for q in e['questions'] if 'accept' in q)
+
+    def legacy_validate(answer):
+        normalized = legacy_normalize(answer)
+        return any(normalized == legacy_normalize(accepted) for accepted in question['accept'])
+
+    print(f"\n⏱️ validate_translation ({len(question['accept'])} réponses acceptées)")
+    legacy = bench("ancienne version", legacy_validate, corpus)
+    new = bench("regex + lru_cache", lambda a: exercise_types.validate_translation(question, a), corpus)
+    print(f"   → ×{legacy / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
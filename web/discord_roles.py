@@ -0,0 +1,139 @@
+"""
+Résolution des rôles Discord pour le site (vérification admin sur /exams)
+
+- Une seule requests.Session (connexions réutilisées) avec timeouts
+- Snapshot des rôles du serveur avec TTL
+- Rôles de chaque membre avec TTL, et cache négatif (membre introuvable / API en erreur)
+- Invalidation poussée par le bot quand des rôles changent (POST /api/discord/invalidate)
+
+DISCORD_API_BASE permet de pointer vers un faux serveur Discord local (voir fake_discord_api.py).
+"""
+
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+DISCORD_API_BASE = os.getenv('DISCORD_API_BASE', 'https://discord.com/api/v10')
+
+ROLES_TTL = int(os.getenv('DISCORD_ROLES_TTL', 300))            # Rôles du serveur
+MEMBER_TTL = int(os.getenv('DISCORD_MEMBER_TTL', 120))          # Rôles d'un membre
+NEGATIVE_TTL = int(os.getenv('DISCORD_NEGATIVE_TTL', 30))       # Membre introuvable / erreur
+TIMEOUT = (3.05, float(os.getenv('DISCORD_API_TIMEOUT', 5)))    # (connexion, lecture)
+
+
+class DiscordRoleResolver:
+    """Cache des rôles Discord d'un serveur"""
+
+    def __init__(self, token: str, guild_id: str, api_base: str = DISCORD_API_BASE,
+                 roles_ttl: int = ROLES_TTL, member_ttl: int = MEMBER_TTL,
+                 negative_ttl: int = NEGATIVE_TTL, timeout=TIMEOUT):
+        self.guild_id = guild_id
+        self.api_base = api_base.rstrip('/')
+        self.roles_ttl = roles_ttl
+        self.member_ttl = member_ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bot {token}"
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=10))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=10))
+
+        self._roles = None          # {role_id: nom}
+        self._roles_expires = 0
+        self._members = {}          # {user_id: (expiration, frozenset(role_ids) ou None)}
+        self._lock = threading.Lock()
+
+    def _get(self, path: str):
+        """GET sur l'API Discord, retourne la réponse (lève en cas d'erreur réseau)"""
+        return self.session.get(f"{self.api_base}{path}", timeout=self.timeout)
+
+    # ==================== RÔLES DU SERVEUR ====================
+
+    def get_guild_roles(self) -> dict:
+        """Retourne {role_id: nom} (snapshot mis en cache, ancien snapshot conservé si l'API échoue)"""
+        now = time.monotonic()
+        if self._roles is not None and now < self._roles_expires:
+            return self._roles
+
+        try:
+            response = self._get(f"/guilds/{self.guild_id}/roles")
+            if response.status_code != 200:
+                raise requests.HTTPError(f"{response.status_code}: {response.text}")
+            roles = {role['id']: role['name'] for role in response.json()}
+        except requests.RequestException as e:
+            print(f"❌ Erreur API Discord roles ({e})")
+            if self._roles is None:
+                return {}
+            # Réessayer plus tard, avec l'ancien snapshot en attendant
+            self._roles_expires = now + self.negative_ttl
+            return self._roles
+
+        with self._lock:
+            self._roles = roles
+            self._roles_expires = now + self.roles_ttl
+        return roles
+
+    # ==================== RÔLES D'UN MEMBRE ====================
+
+    def get_member_roles(self, user_id: int):
+        """Retourne les IDs de rôles du membre, ou None s'il est introuvable (résultat mis en cache)"""
+        now = time.monotonic()
+        cached = self._members.get(user_id)
+        if cached and now < cached[0]:
+            return cached[1]
+
+        role_ids = None
+        ttl = self.negative_ttl
+        try:
+            response = self._get(f"/guilds/{self.guild_id}/members/{user_id}")
+            if response.status_code == 200:
+                role_ids = frozenset(response.json().get('roles', []))
+                ttl = self.member_ttl
+            else:
+                print(f"❌ Erreur API Discord ({response.status_code}): {response.text}")
+        except requests.RequestException as e:
+            print(f"❌ Erreur API Discord membre {user_id} ({e})")
+
+        with self._lock:
+            self._members[user_id] = (now + ttl, role_ids)
+        return role_ids
+
+    def has_role_matching(self, user_id: int, keyword: str) -> str:
+        """Retourne le nom du premier rôle du membre contenant `keyword` (insensible à la casse), sinon None"""
+        role_ids = self.get_member_roles(user_id)
+        if not role_ids:
+            return None
+
+        keyword = keyword.lower()
+        for role_id, name in self.get_guild_roles().items():
+            if role_id in role_ids and keyword in name.lower():
+                return name
+        return None
+
+    # ==================== INVALIDATION ====================
+
+    def invalidate(self, user_id: int = None, guild_roles: bool = False):
+        """Oublie les rôles d'un membre et/ou le snapshot des rôles du serveur"""
+        with self._lock:
+            if user_id is not None:
+                self._members.pop(user_id, None)
+            if guild_roles:
+                self._roles_expires = 0
+
+
+_resolver = None
+
+
+def get_resolver():
+    """Retourne le résolveur partagé (None si DISCORD_TOKEN ou GUILD_ID manque)"""
+    global _resolver
+    if _resolver is None:
+        discord_token = os.getenv('DISCORD_TOKEN')
+        guild_id = os.getenv('GUILD_ID')
+        if not discord_token or not guild_id:
+            return None
+        _resolver = DiscordRoleResolver(discord_token, guild_id)
+    return _resolver
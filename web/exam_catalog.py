@@ -0,0 +1,189 @@
+"""
+Catalogue des examens compilé au chargement de exam.json
+
+- Index par id et par niveau (group) → plus de parcours linéaire à chaque requête
+- Plans de correction précalculés : réponses acceptées normalisées, total des points,
+  réponse à afficher pour chaque question
+- Rechargement à chaud : exam.json est relu dès que sa date de modification change
+"""
+
+import json
+import os
+import threading
+import exercise_types
+
+# Types dont la réponse est comparée après normalisation du texte arabe
+TEXT_TYPES = ('text_input', 'translation')
+
+
+class GradingPlan:
+    """Plan de correction d'un examen (calculé une seule fois par version de exam.json)"""
+
+    def __init__(self, exam: dict):
+        self.exam = exam
+        self.passing_score = exam.get('passing_score', 70)
+        self.questions = [self._compile_question(question) for question in exam['questions']]
+        self.total_points = sum(q['points'] for q in self.questions)
+
+    @staticmethod
+    def _compile_question(question: dict) -> dict:
+        q_type = question.get('type', 'qcm')
+
+        # Réponse correcte à afficher (selon le type)
+        if q_type == 'matching':
+            display_answer = "Voir paires correctes"
+        elif q_type in TEXT_TYPES:
+            display_answer = question.get('accept', [question.get('correct', question.get('correct_ar', ''))])
+        elif q_type == 'word_order':
+            display_answer = ' '.join(question.get('correct_order', []))
+        else:
+            display_answer = question.get('correct', '')
+
+        # Réponses acceptées déjà normalisées (comparaison par appartenance)
+        accepted = None
+        if q_type in TEXT_TYPES:
+            if 'accept' in question:
+                canonical = question['accept']
+            else:
+                canonical = [question['correct'] if q_type == 'text_input' else question['correct_ar']]
+            accepted = frozenset(exercise_types.normalize_arabic_text(answer) for answer in canonical)
+
+        validator = exercise_types.VALIDATORS.get(q_type)
+        if not validator:
+            print(f"⚠️ Type de question inconnu: {q_type}")
+
+        return {
+            'id': question['id'],
+            'type': q_type,
+            'question': question,
+            'points': question.get('points', 1),
+            'display_answer': display_answer,
+            'accepted': accepted,
+            'validator': validator
+        }
+
+    def is_correct(self, compiled: dict, user_answer) -> bool:
+        """Valide une réponse avec le plan précalculé"""
+        if compiled['accepted'] is not None:
+            if not user_answer:
+                return False
+            return exercise_types.normalize_arabic_text(user_answer) in compiled['accepted']
+        if not compiled['validator']:
+            return False
+        return compiled['validator'](compiled['question'], user_answer)
+
+    def grade(self, answers: dict):
+        """
+        Corrige une soumission
+
+        Args:
+            answers: {str(question_id): réponse}
+
+        Returns:
+            Tuple(score, total_points, results) avec results au format de ExamResult.results
+        """
+        score = 0
+        results = []
+
+        for compiled in self.questions:
+            user_answer = answers.get(str(compiled['id']))
+            correct = self.is_correct(compiled, user_answer)
+
+            if correct:
+                score += compiled['points']
+
+            results.append({
+                'question_id': compiled['id'],
+                'question_text': compiled['question']['text'],
+                'user_answer': user_answer,
+                'correct_answer': compiled['display_answer'],
+                'is_correct': correct,
+                'points': compiled['points']
+            })
+
+        return score, self.total_points, results
+
+
+class ExamCatalog:
+    """Examens indexés + plans de correction, rechargés quand exam.json change"""
+
+    def __init__(self, path: str = 'exam.json'):
+        self.path = path
+        self._mtime = None
+        self._lock = threading.Lock()
+        # Remplacé d'un bloc à chaque rechargement (lecture sans verrou)
+        self._index = {'by_id': {}, 'by_level': {}, 'plans': {}, 'exams': []}
+        self._reload()
+
+    def _reload(self):
+        """Compile exam.json (garde l'ancienne version si le fichier est invalide)"""
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    exams = json.load(f)['exams']
+
+                by_id = {}
+                by_level = {}
+                plans = {}
+                for exam in exams:
+                    by_id.setdefault(exam['id'], exam)
+                    # Premier examen du niveau, comme l'ancien parcours linéaire
+                    by_level.setdefault(exam['group'], exam)
+                    plans.setdefault(exam['id'], GradingPlan(exam))
+            except (ValueError, KeyError) as e:
+                if self._mtime is None:
+                    raise
+                print(f"❌ exam.json invalide, ancienne version conservée : {e}")
+                self._mtime = mtime
+                return
+
+            self._index = {'by_id': by_id, 'by_level': by_level, 'plans': plans, 'exams': exams}
+            if self._mtime is not None:
+                print(f"🔄 exam.json rechargé ({len(exams)} examens)")
+            self._mtime = mtime
+
+    def _current(self) -> dict:
+        """Retourne l'index à jour (un stat du fichier par appel)"""
+        try:
+            if os.stat(self.path).st_mtime_ns != self._mtime:
+                self._reload()
+        except OSError as e:
+            print(f"⚠️ exam.json inaccessible, ancienne version conservée : {e}")
+        return self._index
+
+    @property
+    def exams(self) -> list:
+        return self._current()['exams']
+
+    def get(self, exam_id):
+        """Examen par id (None si introuvable)"""
+        try:
+            return self._current()['by_id'].get(int(exam_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_for_level(self, niveau: int):
+        """Examen du niveau (champ 'group' de exam.json)"""
+        return self._current()['by_level'].get(niveau)
+
+    def get_plan(self, exam_id):
+        """Plan de correction de l'examen (None si introuvable)"""
+        try:
+            return self._current()['plans'].get(int(exam_id))
+        except (TypeError, ValueError):
+            return None
+
+
+_catalog = None
+
+
+def get_catalog(path: str = 'exam.json') -> ExamCatalog:
+    """Retourne le catalogue partagé (compilé une seule fois par processus)"""
+    global _catalog
+    if _catalog is None:
+        _catalog = ExamCatalog(path)
+    return _catalog
@@ -3,33 +3,65 @@ Système de validation pour les différents types d'exercices
 Supporte : QCM, Texte à trous, Association, Écriture libre, Ordre de mots, Traduction
 """
 
-
-def normalize_arabic_text(text):
+import re
+import unicodedata
+from functools import lru_cache
+
+# Diacritiques arabes à ignorer pour la comparaison
+# Kasra, Fatha, Damma, Sukun, Shadda, Tanwin, etc.
+DIACRITICS = ['\u064B', '\u064C', '\u064D', '\u064E', '\u064F',
+              '\u0650', '\u0651', '\u0652', '\u0653', '\u0654',
+              '\u0655', '\u0656', '\u0657', '\u0658', '\u0670']
+
+# Pliage optionnel des variantes orthographiques courantes
+FOLDING = {
+    '\u0622': '\u0627',  # آ → ا
+    '\u0623': '\u0627',  # أ → ا
+    '\u0625': '\u0627',  # إ → ا
+    '\u0671': '\u0627',  # ٱ → ا
+    '\u0624': '\u0648',  # ؤ → و
+    '\u0626': '\u064A',  # ئ → ي
+    '\u0649': '\u064A',  # ى → ي
+    '\u0629': '\u0647',  # ة → ه
+    '\u0640': None,       # Tatweel
+}
+
+# Une seule passe au lieu d'un replace par diacritique :
+# classe de caractères compilée (plus rapide que str.translate sur des textes courts)
+# et table str.translate quand il faut aussi remplacer des lettres
+_DIACRITICS_RE = re.compile('[' + ''.join(DIACRITICS) + ']')
+_FOLD_TABLE = str.maketrans({**{diacritic: None for diacritic in DIACRITICS}, **FOLDING})
+
+
+def normalize_arabic_text(text, nfkc=False, fold=False):
     """
     Normalise le texte arabe pour la comparaison
     - Retire les espaces en début/fin
     - Normalise les espaces multiples
     - Retire les diacritiques optionnels (tachkil)
+
+    Args:
+        nfkc: Appliquer d'abord la normalisation Unicode NFKC (formes de présentation, ligatures)
+        fold: Confondre alef/hamza, alef maqsura/ya et ta marbuta/ha
     """
     if not text:
         return ""
 
-    # Retirer les espaces en début/fin
-    text = text.strip()
+    if nfkc:
+        text = unicodedata.normalize('NFKC', text)
 
-    # Normaliser les espaces multiples
+    # Retirer les espaces en début/fin et normaliser les espaces multiples
     text = ' '.join(text.split())
 
-    # Diacritiques arabes à ignorer pour la comparaison (optionnel)
-    # Kasra, Fatha, Damma, Sukun, Shadda, Tanwin, etc.
-    diacritics = ['\u064B', '\u064C', '\u064D', '\u064E', '\u064F',
-                  '\u0650', '\u0651', '\u0652', '\u0653', '\u0654',
-                  '\u0655', '\u0656', '\u0657', '\u0658', '\u0670']
+    if fold:
+        return text.translate(_FOLD_TABLE)
+    return _DIACRITICS_RE.sub('', text)
 
-    for diacritic in diacritics:
-        text = text.replace(diacritic, '')
 
-    return text
+@lru_cache(maxsize=4096)
+def normalize_canonical(text, nfkc=False, fold=False):
+    """Normalisation mémoïsée des réponses attendues (identiques d'une soumission à l'autre)"""
+    return normalize_arabic_text(text, nfkc=nfkc, fold=fold)
 
 
 def validate_qcm(question, user_answer):
@@ -125,12 +157,12 @@ def validate_text_input(question, user_answer):
     # Vérifier si 'accept' existe (plusieurs réponses possibles)
     if 'accept' in question:
         for accepted in question['accept']:
-            if normalized_answer == normalize_arabic_text(accepted):
+            if normalized_answer == normalize_canonical(accepted):
                 return True
         return False
 
     # Sinon, utiliser 'correct'
-    return normalized_answer == normalize_arabic_text(question['correct'])
+    return normalized_answer == normalize_canonical(question['correct'])
 
 
 def validate_word_order(question, user_answer):
@@ -181,12 +213,12 @@ def validate_translation(question, user_answer):
     # Vérifier si plusieurs réponses sont acceptées
     if 'accept' in question:
         for accepted in question['accept']:
-            if normalized_answer == normalize_arabic_text(accepted):
+            if normalized_answer == normalize_canonical(accepted):
                 return True
         return False
 
     # Sinon, utiliser 'correct_ar'
-    return normalized_answer == normalize_arabic_text(question['correct_ar'])
+    return normalized_answer == normalize_canonical(question['correct_ar'])
 
 
 def validate_question(question, user_answer):
@@ -202,19 +234,21 @@ def validate_question(question, user_answer):
     """
     question_type = question.get('type', 'qcm')
 
-    validators = {
-        'qcm': validate_qcm,
-        'fill_blank': validate_fill_blank,
-        'matching': validate_matching,
-        'text_input': validate_text_input,
-        'word_order': validate_word_order,
-        'translation': validate_translation
-    }
-
-    validator = validators.get(question_type)
+    validator = VALIDATORS.get(question_type)
 
     if not validator:
         print(f"⚠️ Type de question inconnu: {question_type}")
         return False
 
     return validator(question, user_answer)
+
+
+# Validateur par type de question (construit une seule fois)
+VALIDATORS = {
+    'qcm': validate_qcm,
+    'fill_blank': validate_fill_blank,
+    'matching': validate_matching,
+    'text_input': validate_text_input,
+    'word_order': validate_word_order,
+    'translation': validate_translation
+}
@@ -0,0 +1,127 @@
+"""
+Faux serveur de l'API Discord (rôles et membres d'un serveur) pour tester discord_roles.py
+sans appeler discord.com
+
+Utilisation avec le site :
+    python fake_discord_api.py --serve --port 8765
+    DISCORD_API_BASE=http://127.0.0.1:8765 DISCORD_TOKEN=x GUILD_ID=1 python app.py
+
+Sans --serve, lance une vérification du cache (nombre d'appels, timeouts, invalidation).
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GUILD_ROLES = [
+    {'id': '10', 'name': '@everyone'},
+    {'id': '11', 'name': 'Admin'},
+    {'id': '12', 'name': 'Groupe 1-A'},
+]
+GUILD_MEMBERS = {
+    '1001': ['11', '12'],  # Admin
+    '1002': ['12'],        # Élève
+}
+
+
+class FakeDiscordHandler(BaseHTTPRequestHandler):
+    """Répond à GET /guilds/<id>/roles et GET /guilds/<id>/members/<user_id>"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        if server.delay:
+            time.sleep(server.delay)
+
+        if re.fullmatch(r'/guilds/\d+/roles', self.path):
+            return self._send(200, server.roles)
+
+        match = re.fullmatch(r'/guilds/\d+/members/(\d+)', self.path)
+        if match and match.group(1) in server.members:
+            return self._send(200, {'user': {'id': match.group(1)}, 'roles': server.members[match.group(1)]})
+
+        self._send(404, {'message': 'Unknown Member', 'code': 10007})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port: int = 0, delay: float = 0):
+    """Démarre le faux serveur dans un thread et le retourne (server.requests = requêtes reçues)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeDiscordHandler)
+    server.requests = []
+    server.delay = delay
+    server.roles = [dict(role) for role in GUILD_ROLES]
+    server.members = {user_id: list(roles) for user_id, roles in GUILD_MEMBERS.items()}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check():
+    """Vérifie le comportement du cache contre le faux serveur"""
+    from discord_roles import DiscordRoleResolver
+
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_port}"
+    resolver = DiscordRoleResolver('token', '1', api_base=base)
+
+    start = time.perf_counter()
+    results = [resolver.has_role_matching(1001, 'admin') for _ in range(1000)]
+    elapsed = time.perf_counter() - start
+    print(f"✅ 1000 vérifications admin : {len(server.requests)} requêtes API, {elapsed * 1000:.1f} ms ({results[0]})")
+
+    server.requests.clear()
+    for _ in range(100):
+        resolver.has_role_matching(999, 'admin')
+    print(f"✅ Membre inconnu ×100 : {len(server.requests)} requête (cache négatif)")
+
+    server.requests.clear()
+    before = resolver.has_role_matching(1002, 'admin')
+    server.members['1002'].append('11')
+    stale = resolver.has_role_matching(1002, 'admin')
+    resolver.invalidate(user_id=1002)
+    fresh = resolver.has_role_matching(1002, 'admin')
+    print(f"✅ Rôle ajouté : {before} → {stale} (cache) → {fresh} après invalidation ({len(server.requests)} requêtes)")
+
+    slow = start_server(delay=2)
+    slow_resolver = DiscordRoleResolver('token', '1', api_base=f"http://127.0.0.1:{slow.server_port}", timeout=(1, 0.5))
+    start = time.perf_counter()
+    for _ in range(10):
+        slow_resolver.has_role_matching(1001, 'admin')
+    print(f"✅ API lente ×10 : {time.perf_counter() - start:.2f} s au total (timeout 0,5 s puis cache négatif)")
+
+    server.shutdown()
+    slow.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', action='store_true')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0)
+    args = parser.parse_args()
+
+    if args.serve:
+        server = start_server(args.port, args.delay)
+        print(f"🤖 Faux Discord sur http://127.0.0.1:{server.server_port} (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        check()
+
+
+if __name__ == "__main__":
+    main()
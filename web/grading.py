@@ -0,0 +1,108 @@
+"""
+Correction groupée des examens
+
+grade_batch corrige N soumissions d'un même examen en une passe par question :
+le type de question est résolu une seule fois, QCM et texte à trous sont comparés
+en tableaux NumPy. Sert à recorriger toute une période d'examen après une
+correction du barème, sans rejouer les requêtes HTTP.
+"""
+
+from exam_catalog import get_catalog
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+
+def _parse_index(answer):
+    """Index de texte à trous, ou None (même règle que validate_fill_blank)"""
+    if not answer:
+        return None
+    try:
+        return int(answer)
+    except (ValueError, TypeError):
+        return None
+
+
+def _grade_column(plan, compiled, answers):
+    """
+    Corrige une question pour toutes les soumissions
+
+    Returns:
+        Liste (ou tableau NumPy) de booléens, un par soumission
+    """
+    q_type = compiled['type']
+    question = compiled['question']
+
+    if np is not None and q_type == 'qcm':
+        values = np.array([answer if isinstance(answer, str) else '' for answer in answers], dtype=str)
+        return (np.char.lower(values) == question['correct'].lower()) & (values != '')
+
+    if np is not None and q_type == 'fill_blank':
+        indexes = [_parse_index(answer) for answer in answers]
+        valid = np.array([index is not None for index in indexes], dtype=bool)
+        values = np.array([index if index is not None else 0 for index in indexes], dtype=np.int64)
+        return valid & (values == question['correct'])
+
+    return [plan.is_correct(compiled, answer) for answer in answers]
+
+
+def grade_batch(exam_id, submissions, catalog=None):
+    """
+    Corrige plusieurs soumissions d'un examen
+
+    Args:
+        exam_id: ID de l'examen (exam.json)
+        submissions: Liste de réponses {str(question_id): réponse}, comme envoyées à /submit_exam
+        catalog: ExamCatalog à utiliser (défaut: catalogue partagé)
+
+    Returns:
+        dict: {
+            'exam_id', 'question_ids', 'points', 'total_points', 'passing_score',
+            'correct': matrice soumissions × questions (bool),
+            'scores', 'percentages', 'passed': une valeur par soumission
+        }
+        Tableaux NumPy si NumPy est installé, listes sinon.
+
+    Raises:
+        ValueError: si l'examen est introuvable
+    """
+    plan = (catalog or get_catalog()).get_plan(exam_id)
+    if not plan:
+        raise ValueError(f"Examen introuvable: {exam_id}")
+
+    question_ids = [compiled['id'] for compiled in plan.questions]
+    points = [compiled['points'] for compiled in plan.questions]
+
+    # Une colonne par question : toutes les réponses à cette question
+    columns = [
+        _grade_column(plan, compiled, [submission.get(str(compiled['id'])) for submission in submissions])
+        for compiled in plan.questions
+    ]
+
+    if np is not None:
+        correct = np.zeros((len(submissions), len(columns)), dtype=bool)
+        for j, column in enumerate(columns):
+            correct[:, j] = column
+        scores = correct @ np.array(points)
+        # Même arrondi que submit_exam (round Python) pour des décisions identiques
+        percentages = np.array([round((score / plan.total_points) * 100, 2) for score in scores.tolist()])
+        passed = percentages >= plan.passing_score
+    else:
+        correct = [list(row) for row in zip(*columns)] if columns else [[] for _ in submissions]
+        scores = [sum(p for p, ok in zip(points, row) if ok) for row in correct]
+        percentages = [round((score / plan.total_points) * 100, 2) for score in scores]
+        passed = [percentage >= plan.passing_score for percentage in percentages]
+
+    return {
+        'exam_id': plan.exam['id'],
+        'question_ids': question_ids,
+        'points': points,
+        'total_points': plan.total_points,
+        'passing_score': plan.passing_score,
+        'correct': correct,
+        'scores': scores,
+        'percentages': percentages,
+        'passed': passed
+    }
@@ -9,8 +9,9 @@ Ce système gère :
 """
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, List, Dict
+from sqlalchemy import DateTime, Integer, String, cast, delete, func, insert, literal, null, select, text, union_all, update
 from sqlalchemy.orm import Session
-from models import Utilisateur, ExamPeriod, WaitingList, RattrapageExam
+from models import Utilisateur, ExamPeriod, WaitingList, RattrapageExam, GroupChangeEvent
 from cohort_config import (
     TEMPS_FORMATION_MINIMUM,
     MAX_MEMBRES_PAR_GROUPE,
@@ -22,6 +23,9 @@ from cohort_config import (
     get_categorie_note
 )
 
+# Canal LISTEN/NOTIFY (PostgreSQL) qui réveille le bot à chaque changement de groupe
+GROUP_CHANGES_CHANNEL = 'group_changes'
+
 
 class GroupManager:
     """Gestionnaire de groupes (remplace CohorteManagerSQL)"""
@@ -29,6 +33,25 @@ class GroupManager:
     def __init__(self, db: Session):
         self.db = db
 
+    # ==================== ÉVÉNEMENTS ====================
+
+    def _record_group_changes(self, changes: List[Tuple[int, Optional[str], str]], reason: str):
+        """
+        Ajoute des changements de groupe [(user_id, old_groupe, new_groupe)] à la
+        transaction en cours : le bot les applique sur Discord après le commit
+        """
+        if not changes:
+            return
+
+        self.db.execute(insert(GroupChangeEvent), [
+            {'user_id': user_id, 'old_groupe': old_groupe, 'new_groupe': new_groupe, 'reason': reason}
+            for user_id, old_groupe, new_groupe in changes
+        ])
+
+        # NOTIFY est transactionnel : le bot n'est réveillé qu'au commit
+        if self.db.get_bind().dialect.name == 'postgresql':
+            self.db.execute(text("SELECT pg_notify(:channel, '')"), {'channel': GROUP_CHANGES_CHANNEL})
+
     # ==================== INSCRIPTION ====================
 
     def register_user(self, user_id: int, username: str, niveau: int = 1) -> Tuple[str, dict]:
@@ -132,25 +155,26 @@ class GroupManager:
             - 'waiting_list_type': type de waiting list (si waiting_list)
             - 'target_group': groupe cible (si waiting_list pour nouveau groupe)
         """
+        # Occupation et prochain examen de tous les groupes du niveau (une seule requête)
+        return self._choose_group(niveau, self._get_groups_status(niveau))
+
+    @staticmethod
+    def _choose_group(niveau: int, groupes_status: Dict[str, dict]) -> dict:
+        """Choisit le groupe à partir de l'état des groupes (voir _find_available_group)"""
         temps_minimum = TEMPS_FORMATION_MINIMUM.get(niveau, 3)
 
         # Parcourir toutes les lettres possibles
         for lettre in LETTRES_GROUPES:
             groupe = f"{niveau}-{lettre}"
+            status = groupes_status.get(groupe, {'membres': 0, 'prochain_examen': None})
 
-            # Compter les membres du groupe
-            count = self.db.query(Utilisateur).filter(
-                Utilisateur.groupe == groupe,
-                Utilisateur.in_rattrapage == False
-            ).count()
-
-            if count >= MAX_MEMBRES_PAR_GROUPE:
+            if status['membres'] >= MAX_MEMBRES_PAR_GROUPE:
                 continue  # Groupe plein
 
             # Groupe a de la place, vérifier le temps restant avant examen
-            exam_period = self._get_next_exam_for_group(groupe, niveau)
+            prochain_examen = status['prochain_examen']
 
-            if not exam_period:
+            if not prochain_examen:
                 # Pas d'examen programmé, inscription directe
                 return {
                     'status': 'direct',
@@ -159,7 +183,7 @@ class GroupManager:
 
             # Calculer le temps restant
             now = datetime.utcnow()
-            temps_restant = (exam_period.start_time - now).total_seconds() / 86400  # en jours
+            temps_restant = (prochain_examen - now).total_seconds() / 86400  # en jours
 
             if temps_restant >= temps_minimum:
                 # Temps suffisant, inscription directe
@@ -183,106 +207,194 @@ class GroupManager:
             'raison': f'Tous les groupes du niveau {niveau} sont pleins (A-Z)'
         }
 
-    def _get_next_exam_for_group(self, groupe: str, niveau: int) -> Optional[ExamPeriod]:
-        """Récupère le prochain examen programmé pour un groupe"""
+    def _get_groups_status(self, niveau: int) -> Dict[str, dict]:
+        """
+        Occupation et prochain examen de chaque groupe d'un niveau, en un aller-retour
+
+        Returns:
+            {groupe: {'membres': int, 'prochain_examen': datetime ou None}}
+            (les groupes sans membre ni examen sont absents)
+        """
+        groupes = [f"{niveau}-{lettre}" for lettre in LETTRES_GROUPES]
         now = datetime.utcnow()
 
-        return self.db.query(ExamPeriod).filter(
+        occupation = select(
+            Utilisateur.groupe.label('groupe'),
+            func.count().label('membres'),
+            cast(null(), DateTime).label('prochain_examen')
+        ).where(
+            Utilisateur.groupe.in_(groupes),
+            Utilisateur.in_rattrapage == False
+        ).group_by(Utilisateur.groupe)
+
+        examens = select(
+            cast(ExamPeriod.groupe, String).label('groupe'),
+            cast(literal(0), Integer).label('membres'),
+            func.min(ExamPeriod.start_time).label('prochain_examen')
+        ).where(
             ExamPeriod.group_number == niveau,
-            ExamPeriod.groupe == groupe,
+            ExamPeriod.groupe.in_(groupes),
             ExamPeriod.start_time > now
-        ).order_by(ExamPeriod.start_time).first()
+        ).group_by(ExamPeriod.groupe)
+
+        status = {}
+        for groupe, membres, prochain_examen in self.db.execute(union_all(occupation, examens)):
+            entry = status.setdefault(groupe, {'membres': 0, 'prochain_examen': None})
+            entry['membres'] += membres
+            if prochain_examen is not None:
+                entry['prochain_examen'] = prochain_examen
+        return status
 
     # ==================== WAITING LIST ====================
 
-    def check_and_process_waiting_lists(self, niveau: int):
+    def check_and_process_waiting_lists(self, niveau: int) -> List[Tuple[int, str]]:
         """
         Vérifie et traite les waiting lists pour un niveau donné
 
         - Si 7 personnes ou plus : créer un nouveau groupe
         - Sinon : assigner aux groupes qui se libèrent
-        """
-        # Type 1 : Waiting list pour nouveau groupe
-        waiting_nouveau = self.db.query(WaitingList).filter(
-            WaitingList.niveau == niveau,
-            WaitingList.type_waiting == 'nouveau_groupe'
-        ).order_by(WaitingList.date_ajout).all()
-
-        if len(waiting_nouveau) >= MIN_PERSONNES_NOUVEAU_GROUPE:
-            # Créer un nouveau groupe
-            nouveau_groupe = self._create_next_group(niveau)
-
-            # Assigner les 7 premières personnes
-            for i, waiting in enumerate(waiting_nouveau[:MIN_PERSONNES_NOUVEAU_GROUPE]):
-                user = self.db.query(Utilisateur).filter(
-                    Utilisateur.user_id == waiting.user_id
-                ).first()
-
-                if not user:
-                    # Créer l'utilisateur (était en waiting list avant inscription)
-                    user = Utilisateur(
-                        user_id=waiting.user_id,
-                        username=f"User{waiting.user_id}",  # À récupérer depuis Discord
-                        niveau_actuel=niveau,
-                        groupe=nouveau_groupe,
-                        examens_reussis=0,
-                        cohorte_id=None
-                    )
-                    self.db.add(user)
-                else:
-                    user.groupe = nouveau_groupe
-
-                # Supprimer de la waiting list
-                self.db.delete(waiting)
 
-            self.db.commit()
+        Toute la file est planifiée en mémoire à partir d'un seul état des groupes,
+        puis appliquée en une transaction (insert/update/delete groupés). Les entrées
+        sont verrouillées (FOR UPDATE SKIP LOCKED) : un autre worker (bot ou site)
+        qui traite la même file en parallèle les ignore au lieu de les réassigner.
 
-            print(f"✅ Nouveau groupe {nouveau_groupe} créé avec {MIN_PERSONNES_NOUVEAU_GROUPE} membres")
-
-        # Type 2 : Waiting list générale (groupes pleins)
-        waiting_general = self.db.query(WaitingList).filter(
-            WaitingList.niveau == niveau,
-            WaitingList.type_waiting == 'groupe_plein'
-        ).order_by(WaitingList.date_ajout).all()
-
-        # Assigner aux groupes qui ont de la place
-        for waiting in waiting_general:
-            groupe_info = self._find_available_group(niveau)
-
-            if groupe_info['status'] == 'direct':
-                user = self.db.query(Utilisateur).filter(
-                    Utilisateur.user_id == waiting.user_id
-                ).first()
-
-                if not user:
-                    user = Utilisateur(
-                        user_id=waiting.user_id,
-                        username=f"User{waiting.user_id}",
-                        niveau_actuel=niveau,
-                        groupe=groupe_info['groupe'],
-                        examens_reussis=0,
-                        cohorte_id=None
-                    )
-                    self.db.add(user)
-                else:
-                    user.groupe = groupe_info['groupe']
-
-                self.db.delete(waiting)
+        Returns:
+            Liste de (user_id, groupe) assignés, dans l'ordre de la file
+        """
+        try:
+            waiting_rows = self.db.execute(
+                select(WaitingList.id, WaitingList.user_id, WaitingList.type_waiting).where(
+                    WaitingList.niveau == niveau,
+                    WaitingList.type_waiting.in_(('nouveau_groupe', 'groupe_plein'))
+                ).order_by(WaitingList.date_ajout, WaitingList.id).with_for_update(skip_locked=True)
+            ).all()
+
+            if not waiting_rows:
                 self.db.commit()
+                return []
+
+            users = self._load_waiting_users({row.user_id for row in waiting_rows})
+            groupes_status = self._get_groups_status(niveau)
+            assignments = []
+
+            # Type 1 : Waiting list pour nouveau groupe
+            waiting_nouveau = [row for row in waiting_rows if row.type_waiting == 'nouveau_groupe']
+
+            if len(waiting_nouveau) >= MIN_PERSONNES_NOUVEAU_GROUPE:
+                # Créer un nouveau groupe et y assigner les 7 premières personnes
+                nouveau_groupe = self._create_next_group(niveau)
+                for waiting in waiting_nouveau[:MIN_PERSONNES_NOUVEAU_GROUPE]:
+                    self._plan_assignment(users, groupes_status, waiting.user_id, nouveau_groupe)
+                    assignments.append((waiting.id, waiting.user_id, nouveau_groupe))
 
+                print(f"✅ Nouveau groupe {nouveau_groupe} créé avec {MIN_PERSONNES_NOUVEAU_GROUPE} membres")
+
+            # Type 2 : Waiting list générale (groupes pleins), dans l'ordre d'arrivée
+            for waiting in waiting_rows:
+                if waiting.type_waiting != 'groupe_plein':
+                    continue
+
+                groupe_info = self._choose_group(niveau, groupes_status)
+                if groupe_info['status'] != 'direct':
+                    # L'état ne change plus : personne d'autre ne peut être placé
+                    break
+
+                self._plan_assignment(users, groupes_status, waiting.user_id, groupe_info['groupe'])
+                assignments.append((waiting.id, waiting.user_id, groupe_info['groupe']))
                 print(f"✅ Utilisateur {waiting.user_id} assigné depuis la waiting list au groupe {groupe_info['groupe']}")
 
+            self._apply_waiting_assignments(niveau, users, [waiting_id for waiting_id, _, _ in assignments])
+            self.db.commit()
+
+            return [(user_id, groupe) for _, user_id, groupe in assignments]
+
+        except Exception as e:
+            print(f"❌ Erreur traitement waiting list niveau {niveau}: {e}")
+            self.db.rollback()
+            raise
+
+    def _load_waiting_users(self, user_ids: set) -> Dict[int, dict]:
+        """
+        Charge (et verrouille) les utilisateurs déjà inscrits parmi ceux de la waiting list
+
+        Returns:
+            {user_id: {'groupe', 'in_rattrapage', 'new': False, 'changed': False}}
+        """
+        users = {}
+        user_ids = list(user_ids)
+        for i in range(0, len(user_ids), 500):
+            rows = self.db.execute(
+                select(Utilisateur.user_id, Utilisateur.groupe, Utilisateur.in_rattrapage).where(
+                    Utilisateur.user_id.in_(user_ids[i:i + 500])
+                ).with_for_update()
+            )
+            for user_id, groupe, in_rattrapage in rows:
+                users[user_id] = {'groupe': groupe, 'old_groupe': groupe, 'in_rattrapage': in_rattrapage,
+                                  'new': False, 'changed': False}
+        return users
+
+    @staticmethod
+    def _plan_assignment(users: Dict[int, dict], groupes_status: Dict[str, dict], user_id: int, groupe: str):
+        """Assigne un utilisateur en mémoire et met à jour l'occupation des groupes"""
+        user = users.get(user_id)
+        if user is None:
+            # L'utilisateur était en waiting list avant inscription
+            user = users[user_id] = {'groupe': None, 'old_groupe': None, 'in_rattrapage': False,
+                                     'new': True, 'changed': True}
+
+        # Seuls les membres hors rattrapage comptent dans l'occupation (comme _get_groups_status)
+        if not user['in_rattrapage']:
+            if user['groupe'] in groupes_status:
+                groupes_status[user['groupe']]['membres'] -= 1
+            groupes_status.setdefault(groupe, {'membres': 0, 'prochain_examen': None})['membres'] += 1
+
+        user['groupe'] = groupe
+        user['changed'] = True
+
+    def _apply_waiting_assignments(self, niveau: int, users: Dict[int, dict], waiting_ids: List[int]):
+        """Écrit le plan : insert des nouveaux, update des groupes, delete des entrées traitées"""
+        nouveaux = [
+            {
+                'user_id': user_id,
+                'username': f"User{user_id}",  # À récupérer depuis Discord
+                'niveau_actuel': niveau,
+                'groupe': user['groupe'],
+                'examens_reussis': 0,
+                'cohorte_id': None
+            }
+            for user_id, user in users.items() if user['new']
+        ]
+        modifies = [
+            {'user_id': user_id, 'groupe': user['groupe']}
+            for user_id, user in users.items() if user['changed'] and not user['new']
+        ]
+
+        if nouveaux:
+            self.db.execute(insert(Utilisateur), nouveaux)
+        if modifies:
+            self.db.execute(update(Utilisateur), modifies)
+        self._record_group_changes([
+            (user_id, user['old_groupe'], user['groupe'])
+            for user_id, user in users.items() if user['changed'] and user['groupe'] != user['old_groupe']
+        ], 'waiting_list')
+        for i in range(0, len(waiting_ids), 500):
+            self.db.execute(
+                delete(WaitingList).where(WaitingList.id.in_(waiting_ids[i:i + 500])),
+                execution_options={'synchronize_session': False}
+            )
+
     def _create_next_group(self, niveau: int) -> str:
         """Crée le prochain groupe disponible pour un niveau"""
-        for lettre in LETTRES_GROUPES:
-            groupe = f"{niveau}-{lettre}"
+        groupes = [f"{niveau}-{lettre}" for lettre in LETTRES_GROUPES]
 
-            # Vérifier si le groupe existe déjà
-            exists = self.db.query(Utilisateur).filter(
-                Utilisateur.groupe == groupe
-            ).first()
+        # Groupes déjà existants (une seule requête)
+        existants = set(self.db.scalars(
+            select(Utilisateur.groupe).where(Utilisateur.groupe.in_(groupes)).distinct()
+        ))
 
-            if not exists:
+        for groupe in groupes:
+            if groupe not in existants:
                 return groupe
 
         # Tous les groupes A-Z existent, créer Z+1 (ne devrait pas arriver)
@@ -325,6 +437,7 @@ class GroupManager:
             user.groupe = groupe_info['groupe']
             user.examens_reussis += 1
             user.in_rattrapage = False  # Sortir du rattrapage si nécessaire
+            self._record_group_changes([(user_id, old_groupe, groupe_info['groupe'])], 'promotion')
             self.db.commit()
 
             return old_groupe, groupe_info['groupe']
@@ -382,26 +495,23 @@ class GroupManager:
             temps_minimum = TEMPS_FORMATION_MINIMUM.get(niveau, 3)
             groupe_trouve = None
 
+            # Occupation et prochain examen de tous les groupes du niveau (une seule requête)
+            groupes_status = self._get_groups_status(niveau)
+            now = datetime.utcnow()
+
             for lettre in LETTRES_GROUPES:
                 groupe = f"{niveau}-{lettre}"
+                status = groupes_status.get(groupe, {'membres': 0, 'prochain_examen': None})
 
                 # Vérifier si le groupe a de la place
-                count = self.db.query(Utilisateur).filter(
-                    Utilisateur.groupe == groupe,
-                    Utilisateur.in_rattrapage == False
-                ).count()
-
-                if count >= MAX_MEMBRES_PAR_GROUPE:
+                if status['membres'] >= MAX_MEMBRES_PAR_GROUPE:
                     continue
 
                 # Vérifier le temps restant avant examen
-                exam_period = self._get_next_exam_for_group(groupe, niveau)
-
-                if not exam_period:
+                if not status['prochain_examen']:
                     continue
 
-                now = datetime.utcnow()
-                temps_restant_jours = (exam_period.start_time - now).total_seconds() / 86400
+                temps_restant_jours = (status['prochain_examen'] - now).total_seconds() / 86400
 
                 if temps_restant_jours >= temps_minimum:
                     groupe_trouve = groupe
@@ -409,8 +519,10 @@ class GroupManager:
 
             if groupe_trouve:
                 # Assigner au groupe trouvé
+                old_groupe = user.groupe
                 user.groupe = groupe_trouve
                 user.in_rattrapage = False
+                self._record_group_changes([(user_id, old_groupe, groupe_trouve)], 'assign_group')
                 self.db.commit()
 
                 return {
@@ -458,8 +570,10 @@ class GroupManager:
             self.db.add(rattrapage)
 
             # Mettre à jour l'utilisateur
+            old_groupe = user.groupe
             user.groupe = groupe_rattrapage
             user.in_rattrapage = True
+            self._record_group_changes([(user_id, old_groupe, groupe_rattrapage)], 'rattrapage')
             self.db.commit()
 
             return {
@@ -0,0 +1,214 @@
+"""
+Cache en lecture du site : utilisateurs et périodes d'examen
+
+Chaque page (/exams, /courses, rafraîchissement de la salle d'attente)
+relisait l'utilisateur et les périodes d'examen de son niveau en base.
+
+- Snapshots Utilisateur par user_id, avec TTL (USER_CACHE_TTL)
+- Périodes d'examen par niveau, avec TTL (EXAM_PERIODS_TTL)
+- Lecture à travers le cache : absent ou expiré → une requête, puis mis en cache
+- Invalidation après une écriture du site (promotion, échec d'examen) et poussée
+  par le bot (votes, bonus, périodes créées ou supprimées) via POST /api/cache/invalidate
+
+Plusieurs workers gunicorn : chaque processus a son propre cache, et une
+invalidation n'arrive qu'au worker qui traite la requête. Sur PostgreSQL,
+invalidate() la diffuse à tous les workers (NOTIFY read_cache) ; chacun l'écoute
+dans un thread (LISTEN, démarré au premier usage du cache dans le processus, donc
+après le fork). Sans PostgreSQL ou si l'écoute est perdue, seul le TTL borne
+l'obsolescence des autres workers : garder USER_CACHE_TTL et EXAM_PERIODS_TTL courts.
+
+Les snapshots sont des copies en lecture seule (pas d'objets ORM partagés entre
+requêtes). Pour modifier un utilisateur, le recharger dans la session de la requête.
+"""
+
+import json
+import os
+import select
+import threading
+import time
+from sqlalchemy import text
+from models import Utilisateur, ExamPeriod
+
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))
+EXAM_PERIODS_TTL = int(os.getenv('EXAM_PERIODS_TTL', 30))
+
+# Canal LISTEN/NOTIFY (PostgreSQL) des invalidations entre workers
+READ_CACHE_CHANNEL = 'read_cache'
+MAX_NOTIFY_USERS = 300   # Au-delà, tout le cache utilisateurs est vidé (payload NOTIFY < 8000 octets)
+LISTEN_RETRY = 30        # Secondes avant de rouvrir une écoute perdue
+
+
+class UserSnapshot:
+    """Colonnes d'un Utilisateur lues par les pages du site"""
+    __slots__ = ('user_id', 'username', 'niveau_actuel', 'groupe', 'examens_reussis',
+                 'has_voted', 'current_exam_period', 'is_alumni', 'in_rattrapage')
+
+    def __init__(self, user: Utilisateur):
+        for name in self.__slots__:
+            setattr(self, name, getattr(user, name))
+
+
+class ExamPeriodSnapshot:
+    """Colonnes d'une ExamPeriod lues par les pages du site"""
+    __slots__ = ('id', 'group_number', 'groupe', 'vote_start_time', 'start_time', 'end_time')
+
+    def __init__(self, period: ExamPeriod):
+        for name in self.__slots__:
+            setattr(self, name, getattr(period, name))
+
+
+class ReadCache:
+    """Cache des utilisateurs et des périodes d'examen (lecture à travers, TTL)"""
+
+    def __init__(self, session_factory, user_ttl: int = USER_CACHE_TTL, periods_ttl: int = EXAM_PERIODS_TTL):
+        self.session_factory = session_factory  # Session de la requête en cours (scoped_session)
+        self.user_ttl = user_ttl
+        self.periods_ttl = periods_ttl
+
+        self._users = {}      # {user_id: (expiration, UserSnapshot)}
+        self._periods = {}    # {niveau: (expiration, [ExamPeriodSnapshot] triées par début)}
+        self._generation = 0  # Incrémenté à chaque invalidation (ignore les lectures commencées avant)
+        self._lock = threading.Lock()
+        self._listener_pid = None  # Processus dont le thread LISTEN est démarré (None : pas encore)
+
+    # ==================== UTILISATEURS ====================
+
+    def get_user(self, user_id: int):
+        """Retourne le UserSnapshot de l'utilisateur, ou None s'il n'est pas inscrit (non mis en cache)"""
+        self._ensure_listener()
+        now = time.monotonic()
+        cached = self._users.get(user_id)
+        if cached and now < cached[0]:
+            return cached[1]
+
+        generation = self._generation
+        user = self.session_factory().query(Utilisateur).filter(Utilisateur.user_id == user_id).first()
+        if not user:
+            return None
+
+        snapshot = UserSnapshot(user)
+        with self._lock:
+            if generation == self._generation:
+                self._users[user_id] = (now + self.user_ttl, snapshot)
+        return snapshot
+
+    # ==================== PÉRIODES D'EXAMEN ====================
+
+    def get_exam_periods(self, niveau: int) -> list:
+        """Périodes d'examen d'un niveau, triées par date de début"""
+        self._ensure_listener()
+        now = time.monotonic()
+        cached = self._periods.get(niveau)
+        if cached and now < cached[0]:
+            return cached[1]
+
+        generation = self._generation
+        periods = [
+            ExamPeriodSnapshot(period)
+            for period in self.session_factory().query(ExamPeriod).filter(
+                ExamPeriod.group_number == niveau
+            ).order_by(ExamPeriod.start_time)
+        ]
+
+        with self._lock:
+            if generation == self._generation:
+                self._periods[niveau] = (now + self.periods_ttl, periods)
+        return periods
+
+    def get_active_period(self, niveau: int, now):
+        """Période d'examen en cours pour un niveau (ou None)"""
+        return next((p for p in self.get_exam_periods(niveau) if p.start_time <= now <= p.end_time), None)
+
+    def get_next_period(self, niveau: int, now):
+        """Prochaine période d'examen d'un niveau (ou None)"""
+        return next((p for p in self.get_exam_periods(niveau) if p.start_time > now), None)
+
+    # ==================== INVALIDATION ====================
+
+    def invalidate(self, user_ids=None, exam_periods: bool = False):
+        """Oublie des utilisateurs et/ou toutes les périodes d'examen, dans tous les workers"""
+        user_ids = list(user_ids or ())
+        self._invalidate_local(user_ids, exam_periods)
+        self._publish(user_ids, exam_periods)
+
+    def _invalidate_local(self, user_ids, exam_periods: bool, all_users: bool = False):
+        with self._lock:
+            self._generation += 1
+            if all_users:
+                self._users.clear()
+            for user_id in user_ids:
+                self._users.pop(user_id, None)
+            if exam_periods:
+                self._periods.clear()
+
+    # ==================== DIFFUSION ENTRE WORKERS (LISTEN/NOTIFY) ====================
+
+    def _engine(self):
+        return self.session_factory().get_bind()
+
+    def _publish(self, user_ids: list, exam_periods: bool):
+        """NOTIFY read_cache : les autres workers appliquent la même invalidation"""
+        if not user_ids and not exam_periods:
+            return
+        engine = self._engine()
+        if engine.dialect.name != 'postgresql':
+            return
+
+        if len(user_ids) > MAX_NOTIFY_USERS:
+            payload = {'all_users': True, 'exam_periods': exam_periods}
+        else:
+            payload = {'user_ids': user_ids, 'exam_periods': exam_periods}
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {'channel': READ_CACHE_CHANNEL, 'payload': json.dumps(payload)})
+        except Exception as e:
+            # Les autres workers se mettront à jour à l'expiration du TTL
+            print(f"⚠️ Invalidation non diffusée aux autres workers : {e}")
+
+    def _ensure_listener(self):
+        """Démarre le thread LISTEN du processus courant (un par worker, après le fork)"""
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+        if self._engine().dialect.name == 'postgresql':
+            threading.Thread(target=self._listen, name='read-cache-listen', daemon=True).start()
+
+    def _listen(self):
+        """Thread d'écoute : applique les invalidations des autres workers, rouvre l'écoute si elle est perdue"""
+        engine = self._engine()
+        while True:
+            connection = None
+            try:
+                raw = engine.raw_connection()
+                raw.detach()  # Connexion gardée ouverte : ne pas occuper une place du pool
+                connection = raw.driver_connection
+                connection.rollback()  # Transaction ouverte par le ping du checkout : autocommit impossible sinon
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {READ_CACHE_CHANNEL}")
+                # Invalidations manquées pendant la coupure : repartir d'un cache vide
+                self._invalidate_local((), exam_periods=True, all_users=True)
+
+                while True:
+                    select.select([connection], [], [])
+                    connection.poll()
+                    while connection.notifies:
+                        payload = json.loads(connection.notifies.pop(0).payload)
+                        self._invalidate_local(
+                            payload.get('user_ids') or (), bool(payload.get('exam_periods')),
+                            all_users=bool(payload.get('all_users'))
+                        )
+            except Exception as e:
+                print(f"⚠️ LISTEN {READ_CACHE_CHANNEL} perdu, nouvel essai dans {LISTEN_RETRY}s : {e}")
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            time.sleep(LISTEN_RETRY)
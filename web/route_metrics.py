@@ -0,0 +1,150 @@
+"""
+Mesure des routes du site : durée, temps base de données, nombre de requêtes SQL
+
+- Hooks Flask (before/after_request) : durée totale de chaque route
+- Hooks SQLAlchemy (before/after_cursor_execute) : temps et nombre de requêtes
+  SQL de la requête HTTP en cours
+- N+1 : la même requête SQL exécutée N_PLUS_ONE_THRESHOLD fois ou plus dans une
+  même requête HTTP (une requête par élément d'une boucle) est signalée
+- Requête lente (> SLOW_REQUEST_MS) : log avec le détail des requêtes SQL
+- Budget : @query_budget(n) sur une route ; en mode TESTING, dépasser le budget
+  lève QueryBudgetExceeded (le test échoue)
+
+Métriques exposées sur /metrics (format texte Prometheus, voir metrics.py).
+
+Usage:
+    init_app(app, engine)
+
+    @app.route('/exams')
+    @query_budget(6)
+    def exams(): ...
+"""
+
+import os
+import time
+from collections import Counter as CallCounter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from metrics import Counter, Histogram
+
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+MAX_LOGGED_STATEMENTS = 30  # Requêtes SQL gardées par requête HTTP pour le log
+
+REQUEST_DURATION = Histogram(
+    'web_request_duration_seconds', "Durée des routes", labelnames=('route', 'method', 'status')
+)
+REQUEST_DB_TIME = Histogram(
+    'web_request_db_seconds', "Temps passé en base de données par route", labelnames=('route',)
+)
+REQUEST_QUERIES = Histogram(
+    'web_request_queries', "Requêtes SQL par route", labelnames=('route',),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+N_PLUS_ONE = Counter('web_n_plus_one', "Requêtes SQL répétées (N+1) détectées", labelnames=('route',))
+SLOW_REQUESTS = Counter('web_slow_requests', "Requêtes au-delà de SLOW_REQUEST_MS", labelnames=('route',))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Une route a exécuté plus de requêtes SQL que son budget (mode TESTING)"""
+
+
+def query_budget(max_queries: int):
+    """Nombre maximum de requêtes SQL d'une route (vérifié en mode TESTING)"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+class _RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.statements = CallCounter()  # {sql: exécutions}
+        self.log = []  # [(durée, sql)] pour le log des requêtes lentes
+
+
+def _stats():
+    if not has_request_context():
+        return None
+    return g.get('_route_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _stats() is not None:
+        context._route_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(statement, context)
+
+
+def _handle_error(exception_context):
+    """Une requête SQL en erreur compte aussi (after_cursor_execute n'est pas appelé)"""
+    if exception_context.statement is not None:
+        _record_statement(exception_context.statement, exception_context.execution_context)
+
+
+def _record_statement(statement, context):
+    stats = _stats()
+    start = getattr(context, '_route_query_start', None)
+    if stats is None or start is None:
+        return
+
+    duration = time.perf_counter() - start
+    stats.db_time += duration
+    stats.queries += 1
+    stats.statements[statement] += 1
+    if len(stats.log) < MAX_LOGGED_STATEMENTS:
+        stats.log.append((duration, statement))
+
+
+def _before_request():
+    g._route_stats = _RequestStats()
+
+
+def _after_request(response):
+    stats = g.pop('_route_stats', None)
+    if stats is None:
+        return response
+
+    elapsed = time.perf_counter() - stats.start
+    route = request.url_rule.rule if request.url_rule else 'inconnue'
+    REQUEST_DURATION.observe(elapsed, route=route, method=request.method, status=response.status_code)
+    REQUEST_DB_TIME.observe(stats.db_time, route=route)
+    REQUEST_QUERIES.observe(stats.queries, route=route)
+
+    for statement, count in stats.statements.items():
+        if count >= N_PLUS_ONE_THRESHOLD:
+            N_PLUS_ONE.inc(route=route)
+            print(f"⚠️ N+1 sur {request.method} {route} : {count}× {' '.join(statement.split())[:200]}")
+
+    if elapsed * 1000 > SLOW_REQUEST_MS:
+        SLOW_REQUESTS.inc(route=route)
+        print(f"🐢 Requête lente {request.method} {route} : {elapsed * 1000:.0f} ms "
+              f"(base {stats.db_time * 1000:.0f} ms, {stats.queries} requête(s) SQL)")
+        for duration, statement in stats.log:
+            print(f"   {duration * 1000:7.1f} ms  {' '.join(statement.split())[:300]}")
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and stats.queries > budget:
+        message = f"{request.method} {route} : {stats.queries} requêtes SQL (budget {budget})"
+        if current_app.testing:
+            raise QueryBudgetExceeded(message + "\n" + "\n".join(
+                f"  {count}× {' '.join(statement.split())[:200]}" for statement, count in stats.statements.items()
+            ))
+        print(f"⚠️ Budget dépassé {message}")
+
+    return response
+
+
+def init_app(app, engine):
+    """Branche les hooks Flask et SQLAlchemy"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)